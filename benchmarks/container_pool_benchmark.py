@@ -0,0 +1,170 @@
+"""
+Measures what `CONTAINER_POOL_SIZE` saves. The pool only removes the docker
+container create/start/remove around each run: the tool itself (the ECPred
+JVM and models, the dbCAN databases) still starts on every `exec_run`. The
+script prints both sides:
+
+- container overhead: a no-op run in a new container versus a no-op
+  `exec_run` in a pooled one;
+- tool run: dbCAN and ECPred over a tiny proteome through
+  `run_tool_container`, without and with the pool.
+
+Run from the project root with `python -m benchmarks.container_pool_benchmark`.
+It needs a docker daemon and the tool images already pulled, and refuses to
+run while the host has a container pool, as it uses the same container names.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from plasticome.services.container_pool_service import (
+    POOL_LABEL,
+    get_pool_container,
+    remove_container,
+    run_tool_container,
+)
+from plasticome.services.dbcan_service import DBCAN_IMAGE, build_dbcan_command
+from plasticome.services.ecpred_service import (
+    ECPRED_IMAGE,
+    build_ecpred_command,
+    create_ecpred_temp_dir,
+)
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+PROTEOME_FILE = 'proteome.faa'
+
+
+def build_tool_commands(job_dir: str):
+    temp_dir = create_ecpred_temp_dir(job_dir, 'benchmark')
+    return {
+        'dbcan': (
+            DBCAN_IMAGE,
+            lambda docker_mount: build_dbcan_command(
+                f'{docker_mount}/{PROTEOME_FILE}', f'{docker_mount}/dbcan'
+            ),
+        ),
+        'ecpred': (
+            ECPRED_IMAGE,
+            lambda docker_mount: build_ecpred_command(
+                f'{docker_mount}/{PROTEOME_FILE}',
+                f'{docker_mount}/ec_pred_results.tsv',
+                f'{docker_mount}/{temp_dir}',
+            ),
+        ),
+    }
+
+
+def write_proteome(job_dir: str, proteins: int, length: int):
+    os.makedirs(job_dir, exist_ok=True)
+    with open(os.path.join(job_dir, PROTEOME_FILE), 'w') as proteome:
+        for index in range(proteins):
+            sequence = ''.join(
+                random.choice(AMINO_ACIDS) for _ in range(length)
+            )
+            proteome.write(f'>BENCH_{index}.1\nM{sequence}\n')
+
+
+def time_noop_runs(client, image: str, runs: int):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        client.containers.run(image, entrypoint=['true'], remove=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def time_noop_execs(client, image: str, runs: int, jobs_root: str):
+    container = get_pool_container(client, image, 0, jobs_root, {})
+    try:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            container.exec_run(['true'])
+            timings.append(time.perf_counter() - started)
+        return timings
+    finally:
+        remove_container(container)
+
+
+def time_tool_runs(
+    image: str, build_command, job_dir: str, runs: int, pool_size: int
+):
+    """
+    The function `time_tool_runs` times the tool through `run_tool_container`.
+    With the pool, one untimed run starts the pooled container first, so only
+    warm runs are measured.
+    """
+    os.environ['CONTAINER_POOL_SIZE'] = str(pool_size)
+    if pool_size:
+        run_tool_container(image, job_dir, build_command)
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_tool_container(image, job_dir, build_command)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def print_comparison(label: str, without_pool: list, with_pool: list):
+    without_median = statistics.median(without_pool)
+    with_median = statistics.median(with_pool)
+    print(f'{label}:')
+    print(f'  new container: {without_median:.3f}s median')
+    print(f'  pooled container: {with_median:.3f}s median')
+    print(
+        f'  saved per run: {without_median - with_median:.3f}s '
+        f'({1 - with_median / without_median:.0%})'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--proteins', type=int, default=5)
+    parser.add_argument('--length', type=int, default=300)
+    parser.add_argument(
+        '--tools', nargs='*', default=['dbcan', 'ecpred'], help='tools to run'
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    import docker
+
+    client = docker.from_env()
+    if client.containers.list(all=True, filters={'label': POOL_LABEL}):
+        sys.exit('Remove the container pool of this host before the benchmark')
+    random.seed(args.seed)
+    jobs_root = tempfile.mkdtemp(prefix='plasticome_pool_benchmark_')
+    job_dir = os.path.join(jobs_root, 'results_benchmark')
+    write_proteome(job_dir, args.proteins, args.length)
+    tool_commands = build_tool_commands(job_dir)
+    try:
+        for tool in args.tools:
+            image, build_command = tool_commands[tool]
+            print_comparison(
+                f'{tool} container overhead ({image})',
+                time_noop_runs(client, image, args.runs),
+                time_noop_execs(client, image, args.runs, jobs_root),
+            )
+            print_comparison(
+                f'{tool} run over {args.proteins} proteins',
+                time_tool_runs(image, build_command, job_dir, args.runs, 0),
+                time_tool_runs(image, build_command, job_dir, args.runs, 1),
+            )
+    finally:
+        for container in client.containers.list(
+            all=True, filters={'label': POOL_LABEL}
+        ):
+            mounts = [mount['Source'] for mount in container.attrs['Mounts']]
+            if jobs_root in mounts:
+                remove_container(container)
+        shutil.rmtree(jobs_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
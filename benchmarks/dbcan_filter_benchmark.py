@@ -0,0 +1,162 @@
+"""
+Compares the vectorized dbCAN overview filter with the previous cell by cell
+implementation (`DataFrame.map` with a regex per cell and a row-wise `apply`)
+on a synthetic `overview.txt`, and checks both write the same file.
+
+Run from the project root with `python -m benchmarks.dbcan_filter_benchmark`.
+"""
+import argparse
+import io
+import random
+import re
+import time
+
+import pandas as pd
+
+from plasticome.services.dbcan_result_filter_service import filter_overview
+
+CAZY_CLASSES = ['GH', 'GT', 'PL', 'CE', 'AA', 'CBM']
+
+
+def random_family():
+    return f'{random.choice(CAZY_CLASSES)}{random.randint(1, 120)}'
+
+
+def random_tool_cell(with_domains: bool):
+    if random.random() < 0.3:
+        return '-'
+    families = []
+    for _ in range(random.randint(1, 3)):
+        family = random_family()
+        if with_domains:
+            start = random.randint(1, 400)
+            family += f'({start}-{start + random.randint(50, 300)})'
+        families.append(family)
+    return '+'.join(families)
+
+
+def random_ec_cell():
+    if random.random() < 0.4:
+        return '-'
+    return '|'.join(
+        f'{random.randint(1, 7)}.{random.randint(1, 20)}.'
+        f'{random.randint(1, 5)}.{random.randint(1, 100)}'
+        for _ in range(random.randint(1, 3))
+    )
+
+
+def build_overview(rows: int):
+    return pd.DataFrame(
+        {
+            'Gene ID': [f'XP_{index:09d}.1' for index in range(rows)],
+            'EC#': [random_ec_cell() for _ in range(rows)],
+            'HMMER': [random_tool_cell(True) for _ in range(rows)],
+            'eCAMI': [random_tool_cell(False) for _ in range(rows)],
+            'DIAMOND': [random_tool_cell(False) for _ in range(rows)],
+            '#ofTools': [random.randint(0, 3) for _ in range(rows)],
+        }
+    )
+
+
+def build_reference_sets(size: int):
+    cazy_families = {random_family() for _ in range(size)}
+    ec_numbers = {
+        f'{random.randint(1, 7)}.{random.randint(1, 20)}.'
+        f'{random.randint(1, 5)}.{random.randint(1, 100)}'
+        for _ in range(size)
+    }
+    return cazy_families, ec_numbers
+
+
+def legacy_filter_overview(enzymes, cazy_families, ec_numbers):
+    def check_cazy(families):
+        for family in str(families).split('+'):
+            family = re.sub(r'\(.*\)', '', family)
+            if family in cazy_families:
+                return family
+        return False
+
+    def check_ec_numbers(numbers):
+        for number in str(numbers).split('|'):
+            if number in ec_numbers:
+                return number
+        return False
+
+    def get_first_non_false(row):
+        if row['HMMER'] != False:
+            return row['HMMER']
+        elif row['eCAMI'] != False:
+            return row['eCAMI']
+        elif row['DIAMOND'] != False:
+            return row['DIAMOND']
+        return False
+
+    enzymes = enzymes.copy()
+    enzymes[['HMMER', 'eCAMI', 'DIAMOND']] = enzymes[
+        ['HMMER', 'eCAMI', 'DIAMOND']
+    ].map(check_cazy)
+    enzymes['plasticome_cazyme'] = enzymes.apply(get_first_non_false, axis=1)
+    enzymes['in_db'] = enzymes['plasticome_cazyme'].apply(
+        lambda cazy: True if cazy else False
+    )
+    gene_ids_to_keep = enzymes.loc[enzymes['in_db'], 'Gene ID'].tolist()
+    enzymes['EC#'] = enzymes['EC#'].map(check_ec_numbers)
+    enzymes = enzymes.drop(
+        columns=['#ofTools', 'HMMER', 'eCAMI', 'DIAMOND', 'in_db']
+    )
+    return enzymes, gene_ids_to_keep
+
+
+def run_filter(filter_function, overview_text, cazy_families, ec_numbers):
+    enzymes = pd.read_csv(io.StringIO(overview_text), sep='\t')
+    started = time.perf_counter()
+    enzymes, gene_ids_to_keep = filter_function(
+        enzymes, cazy_families, ec_numbers
+    )
+    elapsed = time.perf_counter() - started
+    output = enzymes.to_csv(sep='\t', index=False)
+    return elapsed, output, gene_ids_to_keep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--references', type=int, default=150)
+    parser.add_argument(
+        '--distinct',
+        type=int,
+        default=0,
+        help='draw the rows from this many distinct rows, 0 for all distinct',
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    overview = build_overview(args.distinct or args.rows)
+    if args.distinct:
+        overview = overview.sample(args.rows, replace=True, random_state=1)
+        overview['Gene ID'] = [
+            f'XP_{index:09d}.1' for index in range(args.rows)
+        ]
+    overview_text = overview.to_csv(sep='\t', index=False)
+    cazy_families, ec_numbers = build_reference_sets(args.references)
+
+    legacy_time, legacy_output, legacy_ids = run_filter(
+        legacy_filter_overview, overview_text, cazy_families, ec_numbers
+    )
+    vector_time, vector_output, vector_ids = run_filter(
+        filter_overview, overview_text, cazy_families, ec_numbers
+    )
+
+    print(f'{args.rows} overview rows, {len(legacy_ids)} kept')
+    print(f'cell by cell filter: {legacy_time:.3f}s')
+    print(f'vectorized filter: {vector_time:.3f}s')
+    print(f'speedup: {legacy_time / vector_time:.1f}x')
+    print(
+        'identical output:',
+        legacy_output == vector_output and legacy_ids == vector_ids,
+    )
+
+
+if __name__ == '__main__':
+    main()
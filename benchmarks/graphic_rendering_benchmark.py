@@ -0,0 +1,122 @@
+"""
+Compares the paginated `Figure` rendering of the enzyme-plastic graphic with
+the previous pyplot implementation (one scatter call per enzyme on a single
+figure growing with the enzyme count), reporting rendering time and the size
+of the images written.
+
+Run from the project root with
+`python -m benchmarks.graphic_rendering_benchmark`.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+
+from plasticome.services.analysis_result_service import (
+    create_graphic_enzyme_plastic_relation,
+)
+
+PLASTICS = ['PET', 'PE', 'PP', 'PS', 'PVC', 'PU', 'PLA', 'PHB', 'PCL', 'Nylon']
+
+
+def build_enzymes(count: int):
+    return {
+        f'XP_{index:09d}.1': random.sample(PLASTICS, random.randint(1, 4))
+        for index in range(count)
+    }
+
+
+def legacy_create_graphic(result_dir, aimed_enzymes, all_plastics_set):
+    enzyme_names = list(aimed_enzymes.keys())
+    plastics_relations = [aimed_enzymes[enzyme] for enzyme in aimed_enzymes]
+
+    _, ax = plt.subplots(figsize=(12, int(len(enzyme_names) / 5 * 1.4) + 1.5))
+    colors = {
+        plastic: plt.cm.viridis(i / len(all_plastics_set))
+        for i, plastic in enumerate(all_plastics_set)
+    }
+    for i, plastics in enumerate(plastics_relations):
+        ax.scatter(
+            plastics,
+            [i] * len(plastics),
+            color=[colors[p] for p in plastics],
+            s=100,
+            label=enzyme_names[i],
+        )
+    ax.set_yticks(range(len(enzyme_names)))
+    ax.set_yticklabels(enzyme_names)
+    ax.set_xlabel('Plásticos com possibilidade de degradação')
+    handles = [
+        plt.Line2D(
+            [0],
+            [0],
+            marker='o',
+            color='w',
+            markerfacecolor=colors[p],
+            markersize=10,
+            label=p,
+        )
+        for p in all_plastics_set
+    ]
+    ax.legend(
+        handles=handles,
+        title='Tipos de plástico testados',
+        loc='center left',
+        bbox_to_anchor=(1, 0.5),
+    )
+    plt.title(
+        'Relação de enzimas que podem ser candidatas à degradação de plásticos.',
+        loc='right',
+        fontsize=20,
+    )
+    image_path = os.path.join(result_dir, 'plasticome_result.png')
+    plt.savefig(image_path, format='png', bbox_inches='tight', dpi=100)
+    plt.close()
+    return [image_path]
+
+
+def measure(create_graphic, aimed_enzymes):
+    with tempfile.TemporaryDirectory() as result_dir:
+        started = time.perf_counter()
+        image_paths = create_graphic(result_dir, aimed_enzymes, set(PLASTICS))
+        elapsed = time.perf_counter() - started
+        size = sum(os.path.getsize(image_path) for image_path in image_paths)
+    return elapsed, size, len(image_paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--enzymes', type=int, nargs='+', default=[20, 200, 1000]
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    for count in args.enzymes:
+        aimed_enzymes = build_enzymes(count)
+        results = {'pyplot, one scatter per enzyme': legacy_create_graphic}
+        for graphic_format in ('png', 'svg'):
+            results[f'paginated Figure, {graphic_format}'] = graphic_format
+
+        print(f'{count} enzymes')
+        for label, graphic in results.items():
+            if isinstance(graphic, str):
+                os.environ['GRAPHIC_FORMAT'] = graphic
+                graphic = create_graphic_enzyme_plastic_relation
+            elapsed, size, pages = measure(graphic, aimed_enzymes)
+            print(
+                f'  {label}: {elapsed:.3f}s, {size / 1024:.0f}KB '
+                f'in {pages} image(s)'
+            )
+
+
+if __name__ == '__main__':
+    main()
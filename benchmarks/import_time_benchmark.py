@@ -0,0 +1,90 @@
+"""
+Measures the cold import time of the Flask app and of a Celery worker (the
+Celery app with every task module it includes), each in a fresh interpreter
+with `python -X importtime`, and checks that the heavy scientific and docker
+libraries are only imported by the tasks that use them.
+
+Run from the project root with `python -m benchmarks.import_time_benchmark`.
+The exit status is 1 when a heavy library is imported at startup or a median
+import time is above `--max-app-seconds` / `--max-worker-seconds`, so the
+script can guard the cold start in CI.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['pandas', 'numpy', 'matplotlib', 'docker', 'Bio.SeqIO']
+
+TARGETS = {
+    'app': 'import plasticome.routes.app\n',
+    'worker': (
+        'from plasticome.config.celery_config import celery_app\n'
+        'celery_app.loader.import_default_modules()\n'
+    ),
+}
+
+
+def measure_import(code: str):
+    """
+    The function `measure_import` runs the import code in a new interpreter.
+
+    :return: a tuple with the total import time in seconds, the slowest
+    top-level imports and the heavy modules that were imported.
+    """
+    probe = (
+        f'{code}import json, sys\n'
+        f'print(json.dumps([module for module in {HEAVY_MODULES!r} '
+        'if module in sys.modules]))\n'
+    )
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    top_level = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, module = line.split('|')
+        if cumulative.strip().isdigit() and not module.startswith('  '):
+            top_level.append((int(cumulative) / 1e6, module.strip()))
+    heavy_modules = json.loads(process.stdout.strip().splitlines()[-1])
+    return (
+        sum(seconds for seconds, _ in top_level),
+        sorted(top_level, reverse=True)[:5],
+        heavy_modules,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-app-seconds', type=float, default=1.0)
+    parser.add_argument('--max-worker-seconds', type=float, default=1.5)
+    args = parser.parse_args()
+
+    limits = {'app': args.max_app_seconds, 'worker': args.max_worker_seconds}
+    failed = False
+    for target, code in TARGETS.items():
+        runs = [measure_import(code) for _ in range(args.runs)]
+        median = statistics.median(seconds for seconds, _, _ in runs)
+        _, slowest, heavy_modules = runs[-1]
+
+        print(f'{target}: {median:.3f}s median of {args.runs} cold imports')
+        for seconds, module in slowest:
+            print(f'  {seconds:.3f}s {module}')
+        if heavy_modules:
+            print(f'  heavy modules imported: {", ".join(heavy_modules)}')
+            failed = True
+        if median > limits[target]:
+            print(f'  slower than the {limits[target]:.1f}s limit')
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Load test of a running plasticome API: sends requests to `/fungi/<name>`
+and/or `/analyze` from concurrent clients for a fixed time and reports the
+requests per second and latency percentiles of each endpoint.
+
+Start the server first (`bash run_flask.sh`), then run from the project root
+with `python -m benchmarks.load_test --url http://127.0.0.1:5000`. Every
+`/analyze` request queues a real analysis, so point `--fungi-id` and
+`--email` at a test genome and mailbox, and use a disposable broker.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+
+import requests
+
+
+def percentile(latencies: list, fraction: float):
+    if not latencies:
+        return 0.0
+    latencies = sorted(latencies)
+    index = min(
+        int(round(fraction * (len(latencies) - 1))), len(latencies) - 1
+    )
+    return latencies[index]
+
+
+def build_request(endpoint: str, args):
+    if endpoint == 'fungi':
+        return 'GET', f'{args.url}/fungi/{args.fungi_name}', None
+    return (
+        'POST',
+        f'{args.url}/analyze',
+        {
+            'user_email': args.email,
+            'user_name': 'plasticome load test',
+            'fungi_id': args.fungi_id,
+        },
+    )
+
+
+def run_client(endpoint: str, args, deadline: float, results: list):
+    method, url, payload = build_request(endpoint, args)
+    session = requests.Session()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = session.request(
+                method, url, json=payload, timeout=args.timeout
+            ).status_code
+        except requests.RequestException as error:
+            status = type(error).__name__
+        results.append((time.perf_counter() - started, status))
+
+
+def load_endpoint(endpoint: str, args):
+    """
+    The function `load_endpoint` keeps `--concurrency` clients sending
+    requests to an endpoint for `--duration` seconds.
+
+    :return: a dictionary with the throughput, latency percentiles in
+    milliseconds and the count of each response status.
+    """
+    results = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    clients = [
+        threading.Thread(
+            target=run_client, args=(endpoint, args, deadline, results)
+        )
+        for _ in range(args.concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency, _ in results]
+    return {
+        'endpoint': endpoint,
+        'concurrency': args.concurrency,
+        'requests': len(results),
+        'requests_per_second': round(len(results) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(max(latencies, default=0), 2),
+        'statuses': dict(Counter(str(status) for _, status in results)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument(
+        '--endpoints',
+        nargs='+',
+        choices=['fungi', 'analyze'],
+        default=['fungi'],
+    )
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--fungi-name', default='Aspergillus niger')
+    parser.add_argument('--fungi-id', default='GCA_000002855.2')
+    parser.add_argument('--email', default='plasticome@example.com')
+    parser.add_argument(
+        '--output', help='also append the results to this JSON lines file'
+    )
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    for endpoint in args.endpoints:
+        result = load_endpoint(endpoint, args)
+        print(
+            f'{endpoint}: {result["requests"]} requests, '
+            f'{result["requests_per_second"]} req/s, '
+            f'p50 {result["p50_ms"]}ms, p99 {result["p99_ms"]}ms, '
+            f'statuses {result["statuses"]}'
+        )
+        if args.output:
+            with open(args.output, 'a') as output_file:
+                output_file.write(
+                    json.dumps({**result, 'recorded_at': time.time()}) + '\n'
+                )
+
+
+if __name__ == '__main__':
+    main()
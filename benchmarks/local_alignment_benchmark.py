@@ -0,0 +1,114 @@
+"""
+Compares the in-process Smith-Waterman engine with the external BLAST path
+(`makeblastdb` + `blastp`) for a tiny reference set.
+
+Run from the project root with `python -m benchmarks.local_alignment_benchmark`.
+The BLAST side is skipped when `BLAST_PATH` does not point to a BLAST
+installation.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from plasticome.services.blast_service import (
+    align_proteins_group,
+    make_blastdb,
+    protein_sequences_to_fasta,
+)
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def random_protein(length: int):
+    return ''.join(random.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def mutate(sequence: str, rate: float):
+    return ''.join(
+        random.choice(AMINO_ACIDS) if random.random() < rate else residue
+        for residue in sequence
+    )
+
+
+def build_dataset(queries_count: int, references_count: int, length: int):
+    references = [random_protein(length) for _ in range(references_count)]
+    reference_sequences = [
+        f'>REF_{index}.1 reference enzyme {sequence}'
+        for index, sequence in enumerate(references, start=1)
+    ]
+    proteins = [
+        (
+            position,
+            SeqRecord(
+                Seq(mutate(random.choice(references), 0.3)),
+                id=f'QUERY_{position}.1',
+                description='',
+            ),
+        )
+        for position in range(1, queries_count + 1)
+    ]
+    return proteins, reference_sequences
+
+
+def time_local(proteins: list, reference_sequences: list, work_dir: str):
+    started = time.perf_counter()
+    align_proteins_group(
+        'bench', proteins, reference_sequences, work_dir, work_dir
+    )
+    return time.perf_counter() - started
+
+
+def time_blast(proteins: list, reference_sequences: list, work_dir: str):
+    started = time.perf_counter()
+    fasta_to_db = protein_sequences_to_fasta(
+        reference_sequences, os.path.join(work_dir, 'reference.faa')
+    )
+    blastdb_path, error = make_blastdb(fasta_to_db)
+    if error:
+        return None
+    try:
+        align_proteins_group(
+            'bench', proteins, blastdb_path, work_dir, work_dir
+        )
+    except Exception:
+        return None
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--references', type=int, default=3)
+    parser.add_argument('--length', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    proteins, reference_sequences = build_dataset(
+        args.queries, args.references, args.length
+    )
+
+    with tempfile.TemporaryDirectory() as local_dir:
+        local_time = time_local(proteins, reference_sequences, local_dir)
+    with tempfile.TemporaryDirectory() as blast_dir:
+        blast_time = time_blast(proteins, reference_sequences, blast_dir)
+
+    print(
+        f'{args.queries} queries x {args.references} references '
+        f'({args.length} aa)'
+    )
+    print(f'in-process Smith-Waterman: {local_time:.3f}s')
+    if blast_time is None:
+        print('makeblastdb + blastp: skipped (BLAST not available)')
+    else:
+        print(f'makeblastdb + blastp: {blast_time:.3f}s')
+        print(f'speedup: {blast_time / local_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compares the streaming `blast_align.csv` writer with the previous
+implementation (one `pd.concat` per BLAST result file) on a synthetic
+`results_blast` directory, and checks both write the same file.
+
+Run from the project root with
+`python -m benchmarks.similarity_results_benchmark`. Protein names are served
+by a stub, so no request is sent to the NCBI.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from plasticome.services import analysis_result_service
+from plasticome.services.analysis_result_service import (
+    get_blast_result_files,
+    write_similarity_results,
+)
+
+
+def stub_protein_names(genbank_ids):
+    return {str(gene_id): f'protein {gene_id}' for gene_id in genbank_ids}
+
+
+def build_results_dir(results_dir: str, files: int, references: int):
+    reference_ids = [f'REF_{index:06d}.1' for index in range(references)]
+    for position in range(files):
+        hits = random.sample(reference_ids, random.randint(0, 5))
+        with open(
+            os.path.join(results_dir, f'enzyme_{position}_results.csv'), 'w'
+        ) as result_file:
+            result_file.write('QUERY ID,REF ID,IDENTITY\n')
+            for ref_id in hits:
+                result_file.write(
+                    f'XP_{position:09d}.1,{ref_id},'
+                    f'{round(random.uniform(20, 100), 3)}\n'
+                )
+
+
+def legacy_write_similarity_results(blast_output_dir, final_result_dir):
+    similarity_genes = pd.DataFrame(
+        {
+            'Enzima consultada': [],
+            'Enzima com atividade comprovada': [],
+            'Similaridade (%)': [],
+        }
+    )
+    blast_results = [
+        pd.read_csv(file_path)
+        for file_path in get_blast_result_files(blast_output_dir)
+    ]
+    protein_names = stub_protein_names(
+        gene_id
+        for blast_result in blast_results
+        for column in ('QUERY ID', 'REF ID')
+        for gene_id in blast_result[column]
+    )
+    for blast_result in blast_results:
+        for column in ('QUERY ID', 'REF ID'):
+            blast_result[column] = blast_result[column].apply(
+                lambda gene_id: f'{gene_id} {protein_names.get(gene_id, "")}'
+            )
+        blast_result = blast_result.rename(
+            columns={
+                'QUERY ID': 'Enzima consultada',
+                'REF ID': 'Enzima com atividade comprovada',
+                'IDENTITY': 'Similaridade (%)',
+            }
+        )
+        similarity_genes = pd.concat(
+            [similarity_genes, blast_result], ignore_index=True
+        )
+    output_path = os.path.join(final_result_dir, 'blast_align.csv')
+    similarity_genes.to_csv(output_path, index=False)
+    return output_path
+
+
+def measure(write_function, results_dir, output_dir):
+    tracemalloc.start()
+    started = time.perf_counter()
+    output_path = write_function(results_dir, output_dir)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(output_path) as output_file:
+        return elapsed, peak, output_file.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--references', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    warnings.simplefilter('ignore', FutureWarning)
+    analysis_result_service.get_protein_names = stub_protein_names
+    with tempfile.TemporaryDirectory() as work_dir:
+        results_dir = os.path.join(work_dir, 'results_blast')
+        legacy_dir = os.path.join(work_dir, 'legacy')
+        streaming_dir = os.path.join(work_dir, 'streaming')
+        for directory in (results_dir, legacy_dir, streaming_dir):
+            os.makedirs(directory)
+        build_results_dir(results_dir, args.files, args.references)
+
+        legacy_time, legacy_peak, legacy_output = measure(
+            legacy_write_similarity_results, results_dir, legacy_dir
+        )
+        streaming_time, streaming_peak, streaming_output = measure(
+            write_similarity_results, results_dir, streaming_dir
+        )
+
+    print(
+        f'{args.files} result files, {legacy_output.count(chr(10)) - 1} hits'
+    )
+    print(f'pd.concat per file: {legacy_time:.3f}s, {legacy_peak / 1e6:.1f}MB')
+    print(
+        f'streaming writer: {streaming_time:.3f}s, '
+        f'{streaming_peak / 1e6:.1f}MB'
+    )
+    print(f'speedup: {legacy_time / streaming_time:.1f}x')
+    print('identical output:', legacy_output == streaming_output)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,21 @@ import os
 
 from celery import Celery
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv(override=True)
 
+CONTAINERS_QUEUE = 'containers'
+BLAST_QUEUE = 'blast'
+IO_QUEUE = 'io'
+FILTERS_QUEUE = 'filters'
+
 celery_app = Celery(
     'celery_config',
     broker=os.getenv('RABBIT_MQ_URL'),
+    backend=os.getenv('CELERY_RESULT_BACKEND'),
     include=[
+        'plasticome.services.genbank_service',
         'plasticome.services.dbcan_service',
         'plasticome.services.ecpred_service',
         'plasticome.services.email_service',
@@ -16,5 +24,47 @@ celery_app = Celery(
         'plasticome.services.analysis_result_service',
         'plasticome.services.blast_service',
         'plasticome.services.ecpred_result_filter_service',
+        'plasticome.services.pipeline_cache_service',
+        'plasticome.services.analysis_pipeline_service',
     ],
 )
+celery_app.conf.task_track_started = True
+
+# Each stage goes to the queue of its bottleneck, so a long dbCAN or BLAST run
+# never holds the cheap filter and email tasks behind it. `start.sh` starts
+# one worker per queue, with its own pool, concurrency and prefetch.
+celery_app.conf.task_queues = [
+    Queue(CONTAINERS_QUEUE),
+    Queue(BLAST_QUEUE),
+    Queue(IO_QUEUE),
+    Queue(FILTERS_QUEUE),
+]
+celery_app.conf.task_default_queue = IO_QUEUE
+celery_app.conf.task_routes = {
+    'plasticome.services.dbcan_service.run_dbcan_container': {
+        'queue': CONTAINERS_QUEUE
+    },
+    'plasticome.services.ecpred_service.run_ecpred_container': {
+        'queue': CONTAINERS_QUEUE
+    },
+    'plasticome.services.blast_service.align_with_blastdb': {
+        'queue': BLAST_QUEUE
+    },
+    'plasticome.services.genbank_service.download_genome': {'queue': IO_QUEUE},
+    'plasticome.services.analysis_result_service.create_result': {
+        'queue': IO_QUEUE
+    },
+    'plasticome.services.pipeline_cache_service.*': {'queue': IO_QUEUE},
+    'plasticome.services.analysis_pipeline_service.start_analysis': {
+        'queue': IO_QUEUE
+    },
+    'plasticome.services.email_service.send_email_with_results': {
+        'queue': IO_QUEUE
+    },
+    'plasticome.services.dbcan_result_filter_service.dbcan_result_filter': {
+        'queue': FILTERS_QUEUE
+    },
+    'plasticome.services.ecpred_result_filter_service.ecpred_result_filter': {
+        'queue': FILTERS_QUEUE
+    },
+}
@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+from plasticome.services.Helpers import get_int_env
+
+load_dotenv(override=True)
+
+# Serve with `gunicorn -c plasticome/config/gunicorn_config.py
+# "plasticome.routes.app:create_app()"`, as `run_flask.sh` does. The routes
+# mostly wait on the NCBI, the plasticome metadata API and RabbitMQ, so each
+# worker process runs several threads.
+bind = os.getenv('GUNICORN_BIND') or '0.0.0.0:5000'
+workers = max(
+    get_int_env('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1), 1
+)
+worker_class = 'gthread'
+threads = max(get_int_env('GUNICORN_THREADS', 4), 1)
+timeout = get_int_env('GUNICORN_TIMEOUT', 120)
+keepalive = 5
+max_requests = get_int_env('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = 50
+accesslog = '-'
+errorlog = '-'
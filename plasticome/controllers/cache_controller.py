@@ -0,0 +1,73 @@
+import hmac
+import os
+
+from dotenv import load_dotenv
+
+from plasticome.services.fungi_search_cache_service import (
+    get_fungi_cache_stats,
+)
+from plasticome.services.Helpers import validate_accession
+from plasticome.services.pipeline_cache_service import (
+    get_cache_stats,
+    invalidate_pipeline_results,
+)
+
+load_dotenv(override=True)
+
+
+def get_result_cache_stats():
+    """
+    The function `get_result_cache_stats` returns the hit/miss metrics of the
+    pipeline result cache.
+
+    :return: a dictionary with the cache metrics and a status code of 200.
+    """
+    return get_cache_stats(), 200
+
+
+def get_fungi_search_cache_stats():
+    """
+    The function `get_fungi_search_cache_stats` returns the hit/miss metrics of
+    the fungi search cache of the server process answering the request.
+
+    :return: a dictionary with the cache metrics and a status code of 200.
+    """
+    return get_fungi_cache_stats(), 200
+
+
+def is_cache_admin(authorization: str):
+    """
+    The function `is_cache_admin` checks the `Authorization: Bearer <token>`
+    header against `CACHE_ADMIN_TOKEN`. Without the setting nobody is allowed.
+    """
+    admin_token = os.getenv('CACHE_ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    return hmac.compare_digest(
+        str(authorization or ''), f'Bearer {admin_token}'
+    )
+
+
+def invalidate_result_cache(authorization: str, accession: str = None):
+    """
+    The function `invalidate_result_cache` removes cached analysis results,
+    for a single assembly accession or for every genome, forcing the next
+    requests to run the whole pipeline again.
+
+    :param authorization: the `Authorization` header of the request, which
+    must carry `CACHE_ADMIN_TOKEN`
+    :type authorization: str
+    :param accession: the assembly accession whose results are removed, all
+    results are removed when it is not given
+    :type accession: str
+    :return: a dictionary with the number of removed results and a status code
+    of 200, or an error message with a status code of 401 without the admin
+    token or 422 for an invalid accession.
+    """
+    if not is_cache_admin(authorization):
+        return {'error': 'A valid cache admin token is required'}, 401
+    if accession and not validate_accession(accession):
+        return {
+            'ValidationError': f'Invalid assembly accession: {accession}'
+        }, 422
+    return {'invalidated': invalidate_pipeline_results(accession)}, 200
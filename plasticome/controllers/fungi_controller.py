@@ -1,4 +1,6 @@
-from plasticome.services.genbank_service import search_fungi_id_by_name
+from plasticome.services.fungi_search_cache_service import (
+    search_fungi_id_cached,
+)
 
 
 def search_fungi_by_name(fungi_name: str):
@@ -14,7 +16,7 @@ def search_fungi_by_name(fungi_name: str):
     is found. If the genome is not found, it returns a dictionary with a message
     indicating that the genome was not found, along with a status code of 404.
     """
-    genbank_accession, refseq_accession = search_fungi_id_by_name(fungi_name)
+    genbank_accession, refseq_accession = search_fungi_id_cached(fungi_name)
     if genbank_accession or refseq_accession:
         return {
             'genbank_assembly_accession': genbank_accession,
@@ -1,16 +1,151 @@
-from celery import chain
-
-from plasticome.services.analysis_result_service import create_result
-from plasticome.services.blast_service import align_with_blastdb
-from plasticome.services.dbcan_result_filter_service import dbcan_result_filter
-from plasticome.services.dbcan_service import run_dbcan_container
-from plasticome.services.ecpred_result_filter_service import (
-    ecpred_result_filter,
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+from celery.result import AsyncResult
+
+from plasticome.config.celery_config import celery_app
+from plasticome.services.analysis_pipeline_service import (
+    build_analysis_chain,
+    start_analysis,
 )
-from plasticome.services.ecpred_service import run_ecpred_container
-from plasticome.services.email_service import send_email_with_results
-from plasticome.services.genbank_service import download_fasta_sequence_by_id
-from plasticome.services.Helpers import validate_email
+from plasticome.services.checkpoint_service import (
+    PIPELINE_STAGES,
+    get_first_pending_stage,
+    is_job_active,
+    read_archived_manifest,
+    read_manifest,
+    record_job_resume,
+    start_job_manifest,
+)
+from plasticome.services.disk_cache_service import entry_lock
+from plasticome.services.genbank_service import find_job_dir, get_job_dir
+from plasticome.services.Helpers import validate_accession, validate_email
+
+
+def format_timestamp(timestamp):
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def get_celery_state(task_id: str):
+    if not task_id or not os.getenv('CELERY_RESULT_BACKEND'):
+        return None
+    try:
+        return AsyncResult(task_id, app=celery_app).state
+    except Exception:
+        return None
+
+
+def summarize_job(manifest: dict):
+    """
+    The function `summarize_job` turns a job manifest into its public status:
+    the overall state, the current stage and, for every stage, its state,
+    start and end times, duration, metrics and error.
+    """
+    stages = []
+    for stage in PIPELINE_STAGES:
+        checkpoint = manifest.get('stages', {}).get(stage, {})
+        stages.append(
+            {
+                'name': stage,
+                'status': checkpoint.get('status', 'pending'),
+                'started_at': format_timestamp(checkpoint.get('started_at')),
+                'finished_at': format_timestamp(checkpoint.get('finished_at')),
+                'duration_seconds': checkpoint.get('duration'),
+                'metrics': checkpoint.get('metrics', {}),
+                'error': checkpoint.get('error') or None,
+                'celery_state': get_celery_state(checkpoint.get('task_id')),
+            }
+        )
+
+    failed = [stage for stage in stages if stage['status'] == 'failed']
+    if failed:
+        status, current_stage = 'failed', failed[0]['name']
+    elif manifest.get('finished_at'):
+        status, current_stage = 'completed', None
+    elif manifest.get('cached_result'):
+        status, current_stage = 'running', 'restore_pipeline_result'
+    else:
+        pending = [stage for stage in stages if stage['status'] != 'completed']
+        current_stage = (
+            pending[0]['name'] if pending else 'send_email_with_results'
+        )
+        status = 'running' if manifest.get('stages') else 'queued'
+
+    return {
+        'job_id': manifest.get('job_id'),
+        'accession': manifest.get('accession'),
+        'organism_name': manifest.get('organism_name'),
+        'status': status,
+        'current_stage': current_stage,
+        'cached_result': bool(manifest.get('cached_result')),
+        'created_at': format_timestamp(manifest.get('created_at')),
+        'finished_at': format_timestamp(manifest.get('finished_at')),
+        'stages': [] if manifest.get('cached_result') else stages,
+    }
+
+
+def get_job_status(job_id: str):
+    """
+    The function `get_job_status` reports the progress of an analysis from its
+    checkpoint manifest, or from the archived copy once the result was sent.
+
+    :param job_id: the job identifier returned by `/analyze`
+    :type job_id: str
+    :return: the job status and a status code of 200, or an error message with
+    a status code of 404 when the job is unknown.
+    """
+    try:
+        job_dir = find_job_dir(job_id)
+        manifest = read_manifest(job_dir) if job_dir else {}
+        if not manifest.get('job_id') and re.fullmatch(r'[0-9a-f]+', job_id):
+            manifest = read_archived_manifest(job_id)
+        if not manifest.get('job_id'):
+            return {'error': f'Job {job_id} not found'}, 404
+        return summarize_job(manifest), 200
+    except Exception as e:
+        return {'error': f'[JOB STATUS] - {str(e)}'}, 400
+
+
+def resume_pipeline(job_id: str):
+    """
+    The function `resume_pipeline` resubmits an interrupted analysis from its
+    last completed stage, using the job checkpoint manifest.
+
+    :param job_id: the job identifier returned by `/analyze`
+    :type job_id: str
+    :return: a dictionary with the stage the job restarts from and a status
+    code of 200, or an error message with a status code of 404 when the job
+    has no checkpoint, or of 409 while the job is still running.
+    """
+    try:
+        job_dir = find_job_dir(job_id)
+        job_data = read_manifest(job_dir) if job_dir else {}
+        if not job_data.get('job_dir') or job_data.get('cached_result'):
+            return {'error': f'Job {job_id} not found'}, 404
+
+        with entry_lock(job_dir, 'resume'):
+            if is_job_active(job_dir):
+                return {
+                    'error': f'Job {job_id} is still running, it can only be resumed once it stops'
+                }, 409
+            record_job_resume(job_dir)
+            first_stage, previous_output = get_first_pending_stage(job_dir)
+            build_analysis_chain(job_data, first_stage, previous_output)()
+        restarted_stage = (
+            PIPELINE_STAGES[first_stage]
+            if first_stage < len(PIPELINE_STAGES)
+            else 'send_email_with_results'
+        )
+        return {
+            'message': f'Analysis resumed from {restarted_stage}',
+            'job_id': job_id,
+        }, 200
+    except Exception as e:
+        return {'error': f'[RESUME PIPELINE] - {str(e)}'}, 400
 
 
 def execute_main_pipeline(data: dict):
@@ -24,31 +159,31 @@ def execute_main_pipeline(data: dict):
                     'ValidationError': 'You must have to send a valid email'
                 }, 422
 
-            (
-                file_path,
-                organism_name,
-                file_error,
-            ) = download_fasta_sequence_by_id(data['fungi_id'])
-            if file_error:
-                return {'error': f'[FILE ERROR]: {file_error}'}, 500
-
+            accession = str(data['fungi_id']).strip()
+            if not validate_accession(accession):
+                return {
+                    'ValidationError': 'fungi_id must be an assembly accession, such as GCA_000002855.2'
+                }, 422
+            job_id = uuid.uuid4().hex[:12]
+            job_dir = get_job_dir(accession, job_id)
+            os.makedirs(job_dir, exist_ok=True)
             email_message_data = {
                 'user_email': user_email,
                 'user_name': data['user_name'],
-                'organism_name': organism_name,
-                'genbank_id': data['fungi_id'],
+                'genbank_id': accession,
+                'job_dir': job_dir,
+            }
+            job_data = {
+                'job_id': job_id,
+                'accession': accession,
+                'job_dir': job_dir,
+                'email_data': email_message_data,
             }
-            chain(
-                run_dbcan_container.si(file_path),
-                dbcan_result_filter.s(),
-                run_ecpred_container.s(),
-                ecpred_result_filter.s(),
-                align_with_blastdb.s(),
-                create_result.s(),
-                send_email_with_results.s(email_message_data),
-            )()
+            start_job_manifest(job_dir, job_data)
+            start_analysis.delay(job_data)
             return {
-                'message': 'Analysis is in progress, the result will be sent by email'
+                'message': 'Analysis is in progress, the result will be sent by email',
+                'job_id': job_id,
             }, 200
         else:
             missing_fields = [
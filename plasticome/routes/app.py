@@ -1,31 +1,86 @@
-from flask import Flask, request
+from flask import Blueprint, Flask, request
 from flask_cors import CORS
 from flask_pydantic_spec import FlaskPydanticSpec
 
+from plasticome.controllers.cache_controller import (
+    get_fungi_search_cache_stats,
+    get_result_cache_stats,
+    invalidate_result_cache,
+)
 from plasticome.controllers.fungi_controller import search_fungi_by_name
-from plasticome.controllers.pipeline_controller import execute_main_pipeline
-
-server = Flask(__name__)
-CORS(server)
-spec = FlaskPydanticSpec(
-    'flask', title='PLASTICOME DEMO', version='v1.0', path='docs'
+from plasticome.controllers.pipeline_controller import (
+    execute_main_pipeline,
+    get_job_status,
+    resume_pipeline,
 )
-spec.register(server)
+
+routes = Blueprint('plasticome', __name__)
 
 
-@server.get('/')
+@routes.get('/')
 def get_plasticome():
     return 'Plasticome server is running!'
 
 
-@server.get('/fungi/<fungi_name>')
+@routes.get('/fungi/<fungi_name>')
 def get_fungi_id_by_name(fungi_name):
     return search_fungi_by_name(fungi_name)
 
 
-@server.post('/analyze')
+@routes.post('/analyze')
 def execute_pipeline():
     return execute_main_pipeline(request.json)
 
 
-server.run()
+@routes.get('/jobs/<job_id>')
+def job_status(job_id):
+    return get_job_status(job_id)
+
+
+@routes.post('/jobs/<job_id>/resume')
+def resume_job(job_id):
+    return resume_pipeline(job_id)
+
+
+@routes.get('/cache/results/stats')
+def get_results_cache_stats():
+    return get_result_cache_stats()
+
+
+@routes.get('/cache/fungi/stats')
+def get_fungi_cache_stats():
+    return get_fungi_search_cache_stats()
+
+
+@routes.delete('/cache/results')
+def delete_results_cache():
+    return invalidate_result_cache(request.headers.get('Authorization'))
+
+
+@routes.delete('/cache/results/<accession>')
+def delete_results_cache_by_accession(accession):
+    return invalidate_result_cache(
+        request.headers.get('Authorization'), accession
+    )
+
+
+def create_app():
+    """
+    The function `create_app` builds the Flask application, so it can be
+    served by a WSGI server such as gunicorn, or by `flask run`, without
+    starting a server when the module is imported.
+
+    :return: the Flask application.
+    """
+    server = Flask(__name__)
+    CORS(server)
+    server.register_blueprint(routes)
+    spec = FlaskPydanticSpec(
+        'flask', title='PLASTICOME DEMO', version='v1.0', path='docs'
+    )
+    spec.register(server)
+    return server
+
+
+if __name__ == '__main__':
+    create_app().run()
@@ -1,5 +1,8 @@
+import os
 import re
 
+ASSEMBLY_ACCESSION_PATTERN = r'GC[AF]_\d{9}\.\d+'
+
 
 def validate_email(email: str):
     """
@@ -21,3 +24,26 @@ def validate_email(email: str):
     ):
         return False
     return True
+
+
+def validate_accession(accession: str):
+    """
+    The function `validate_accession` checks a GenBank or RefSeq assembly
+    accession, such as `GCA_000002855.2`, before it is used in a file path.
+
+    :return: `True` if the accession is valid and `False` otherwise.
+    """
+    return bool(
+        re.fullmatch(ASSEMBLY_ACCESSION_PATTERN, str(accession or '').strip())
+    )
+
+
+def get_int_env(env_var: str, default: int):
+    """
+    The function `get_int_env` reads an integer setting from an environment
+    variable, falling back to the default when it is unset or invalid.
+    """
+    try:
+        return int(os.getenv(env_var, default))
+    except ValueError:
+        return default
@@ -0,0 +1,116 @@
+from celery import chain
+
+from plasticome.config.celery_config import celery_app
+from plasticome.services.analysis_result_service import create_result
+from plasticome.services.blast_service import align_with_blastdb
+from plasticome.services.checkpoint_service import update_manifest
+from plasticome.services.dbcan_result_filter_service import dbcan_result_filter
+from plasticome.services.dbcan_service import run_dbcan_container
+from plasticome.services.ecpred_result_filter_service import (
+    ecpred_result_filter,
+)
+from plasticome.services.ecpred_service import run_ecpred_container
+from plasticome.services.email_service import send_email_with_results
+from plasticome.services.genbank_service import download_genome
+from plasticome.services.pipeline_cache_service import (
+    get_metadata_fingerprint,
+    get_pipeline_cache_key,
+    lookup_pipeline_result,
+    read_cached_organism_name,
+    restore_pipeline_result,
+    store_pipeline_result,
+)
+
+ANALYSIS_STAGES = [
+    download_genome,
+    run_dbcan_container,
+    dbcan_result_filter,
+    run_ecpred_container,
+    ecpred_result_filter,
+    align_with_blastdb,
+    create_result,
+]
+
+
+def build_analysis_chain(
+    job_data: dict, first_stage: int = 0, previous_output=None
+):
+    """
+    The function `build_analysis_chain` builds the Celery chain of an analysis,
+    starting from the given stage with the output of the stage before it, so a
+    resumed job skips every stage it already completed.
+
+    :param job_data: the job parameters stored in its checkpoint manifest
+    :type job_data: dict
+    :param first_stage: index of the first stage to run
+    :type first_stage: int
+    :param previous_output: output of the stage before `first_stage`
+    :return: the Celery chain, ready to be called.
+    """
+    store_result_args = (job_data.get('cache_key'), job_data['job_dir'])
+    if first_stage == 0:
+        tasks = [
+            ANALYSIS_STAGES[0].si(job_data['job_dir'], job_data['accession'])
+        ]
+    elif first_stage < len(ANALYSIS_STAGES):
+        tasks = [ANALYSIS_STAGES[first_stage].si(previous_output)]
+    else:
+        tasks = [store_pipeline_result.si(previous_output, *store_result_args)]
+
+    tasks.extend(stage.s() for stage in ANALYSIS_STAGES[first_stage + 1 :])
+    if first_stage < len(ANALYSIS_STAGES):
+        tasks.append(store_pipeline_result.s(*store_result_args))
+    tasks.append(send_email_with_results.s(job_data['email_data']))
+    return chain(*tasks)
+
+
+@celery_app.task
+def start_analysis(job_data: dict):
+    """
+    The function `start_analysis` is the first task of every analysis. It
+    reads the plasticome metadata fingerprint on the worker, so `/analyze`
+    never waits on the metadata API, and sends the cached result when the
+    same genome was already analyzed against the same metadata. Otherwise,
+    and also when the cached result is evicted before it is restored, it
+    queues the analysis chain.
+
+    :param job_data: the job parameters stored in its checkpoint manifest
+    :type job_data: dict
+    :return: the result cache key, `None` when the metadata could not be read
+    and the result cache is not used.
+    """
+    fingerprint = get_metadata_fingerprint()
+    cache_key = (
+        get_pipeline_cache_key(job_data['accession'], fingerprint)
+        if fingerprint
+        else None
+    )
+    cache_entry = lookup_pipeline_result(cache_key) if cache_key else None
+    job_data = {**job_data, 'cache_key': cache_key}
+
+    if cache_entry:
+        restored_result = restore_pipeline_result(
+            cache_key, job_data['job_dir']
+        )
+        if not restored_result[2]:
+            update_manifest(
+                job_data['job_dir'],
+                lambda manifest: manifest.update(
+                    cache_key=cache_key, cached_result=True
+                ),
+            )
+            email_data = {
+                **job_data['email_data'],
+                'organism_name': read_cached_organism_name(
+                    job_data['job_dir']
+                ),
+            }
+            send_email_with_results.delay(restored_result, email_data)
+            return cache_key
+
+    update_manifest(
+        job_data['job_dir'],
+        lambda manifest: manifest.update(cache_key=cache_key),
+    )
+    build_analysis_chain(job_data)()
+    return cache_key
@@ -1,83 +1,96 @@
 import csv
 import os
+import re
 
-import matplotlib.pyplot as plt
-import pandas as pd
 from dotenv import load_dotenv
 
 from plasticome.config.celery_config import celery_app
-from plasticome.services.genbank_service import get_protein_name
-from plasticome.services.plasticome_metadata_service import (
-    get_all_enzymes,
-    get_all_plastic_types_by_enzyme,
-    get_all_plastics_with_enzymes,
+from plasticome.services.checkpoint_service import (
+    checkpointed,
+    record_reference_fingerprint,
 )
+from plasticome.services.genbank_service import get_protein_names
+from plasticome.services.Helpers import get_int_env
+from plasticome.services.reference_data_service import get_reference_data
 
 load_dotenv(override=True)
 
 
-def get_enzymes_info():
-    enzymes_info, error = get_all_enzymes(
-        os.getenv('PLASTICOME_USER'), os.getenv('PLASTICOME_PASSWORD')
-    )
-    if error:
-        return {}
-    enzyme_dict = {}
-    for item in enzymes_info:
-        ec_number = item['ec_number']
-        if ec_number not in enzyme_dict:
-            enzyme_dict[ec_number] = item['id']
+GRAPHIC_FILE_NAME = 'plasticome_result'
+GRAPHIC_FORMATS = ('png', 'svg')
 
-    return enzyme_dict
 
+def get_graphic_format():
+    graphic_format = os.getenv('GRAPHIC_FORMAT', 'png').strip().lower()
+    return graphic_format if graphic_format in GRAPHIC_FORMATS else 'png'
 
-def get_plastics_info():
-    plastics_info, error = get_all_plastics_with_enzymes(
-        os.getenv('PLASTICOME_USER'), os.getenv('PLASTICOME_PASSWORD')
+
+def get_graphic_page_path(result_dir: str, page: int, graphic_format: str):
+    """
+    The function `get_graphic_page_path` names the image of a graphic page.
+    The first page keeps the `plasticome_result` name, the next ones are
+    suffixed with their number.
+    """
+    suffix = f'_{page + 1}' if page else ''
+    return os.path.join(
+        result_dir, f'{GRAPHIC_FILE_NAME}{suffix}.{graphic_format}'
     )
-    if error:
-        return set()
-    return set(item['plastic_name'] for item in plastics_info)
 
 
-def create_graphic_enzyme_plastic_relation(
-    result_dir: str, aimed_enzymes: dict, all_plastics_set: set
+def draw_enzyme_plastic_page(
+    enzymes: list, plastics: list, colors: dict, page_title: str
 ):
+    """
+    The function `draw_enzyme_plastic_page` draws the relation of a page of
+    enzymes with their plastics on a `Figure` of its own, with no pyplot
+    global state, and every point in a single scatter call.
+
+    :param enzymes: list of `(enzyme name, plastics)` tuples of the page
+    :param plastics: every plastic tested, in the order of the x axis
+    :param colors: the color of each plastic
+    :param page_title: the title of the figure
+    :return: the figure.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+
+    plastic_positions = {plastic: i for i, plastic in enumerate(plastics)}
+    points = [
+        (plastic_positions[plastic], row, colors[plastic])
+        for row, (_, enzyme_plastics) in enumerate(enzymes)
+        for plastic in enzyme_plastics
+    ]
 
-    enzyme_names = list(aimed_enzymes.keys())
-    plastics_relations = [aimed_enzymes[enzyme] for enzyme in aimed_enzymes]
-
-    _, ax = plt.subplots(figsize=(12, int(len(enzyme_names) / 5 * 1.4) + 1.5))
-    colors = {
-        plastic: plt.cm.viridis(i / len(all_plastics_set))
-        for i, plastic in enumerate(all_plastics_set)
-    }
-
-    for i, plastics in enumerate(plastics_relations):
-        y_pos = [i] * len(plastics)
-        ax.scatter(
-            plastics,
-            y_pos,
-            color=[colors[p] for p in plastics],
-            s=100,
-            label=enzyme_names[i],
-        )
+    figure = Figure(figsize=(12, int(len(enzymes) / 5 * 1.4) + 1.5))
+    FigureCanvasAgg(figure)
+    ax = figure.subplots()
+    ax.scatter(
+        [x for x, _, _ in points],
+        [y for _, y, _ in points],
+        color=[color for _, _, color in points],
+        s=100,
+    )
 
-    ax.set_yticks(range(len(enzyme_names)))
-    ax.set_yticklabels(enzyme_names)
+    ax.set_xticks(range(len(plastics)))
+    ax.set_xticklabels(plastics)
+    ax.set_xlim(-0.5, len(plastics) - 0.5)
+    ax.set_yticks(range(len(enzymes)))
+    ax.set_yticklabels([enzyme for enzyme, _ in enzymes])
+    ax.set_ylim(-0.5, len(enzymes) - 0.5)
     ax.set_xlabel('Plásticos com possibilidade de degradação')
 
     handles = [
-        plt.Line2D(
+        Line2D(
             [0],
             [0],
             marker='o',
             color='w',
-            markerfacecolor=colors[p],
+            markerfacecolor=colors[plastic],
             markersize=10,
-            label=p,
+            label=plastic,
         )
-        for p in all_plastics_set
+        for plastic in plastics
     ]
     ax.legend(
         handles=handles,
@@ -85,63 +98,168 @@ def create_graphic_enzyme_plastic_relation(
         loc='center left',
         bbox_to_anchor=(1, 0.5),
     )
+    ax.set_title(page_title, loc='right', fontsize=20)
+    return figure
 
-    plt.title(
-        'Relação de enzimas que podem ser candidatas à degradação de plásticos.',
-        loc='right',
-        fontsize=20,
-    )
-
-    image_path = os.path.join(result_dir, 'plasticome_result.png')
-    plt.savefig(image_path, format='png', bbox_inches='tight', dpi=100)
-    plt.close()
 
-    return image_path
+def create_graphic_enzyme_plastic_relation(
+    result_dir: str, aimed_enzymes: dict, all_plastics_set: set
+):
+    """
+    The function `create_graphic_enzyme_plastic_relation` draws which plastics
+    each enzyme may degrade. Enzymes are split in pages of
+    `GRAPHIC_ENZYMES_PER_PAGE`, so the images keep a bounded size, and saved as
+    PNG or, with `GRAPHIC_FORMAT=svg`, as compact vector images.
+
+    :param result_dir: the directory of the final results
+    :type result_dir: str
+    :param aimed_enzymes: the plastics related to each enzyme
+    :type aimed_enzymes: dict
+    :param all_plastics_set: every plastic tested
+    :type all_plastics_set: set
+    :return: the list of image paths, one per page.
+    """
+    from matplotlib import colormaps, rc_context
+
+    graphic_format = get_graphic_format()
+    per_page = max(get_int_env('GRAPHIC_ENZYMES_PER_PAGE', 60), 1)
+    plastics = sorted(set(all_plastics_set).union(*aimed_enzymes.values()))
+    colormap = colormaps['viridis']
+    colors = {
+        plastic: colormap(i / len(plastics))
+        for i, plastic in enumerate(plastics)
+    }
 
+    enzymes = list(aimed_enzymes.items())
+    pages = [
+        enzymes[start : start + per_page]
+        for start in range(0, len(enzymes), per_page)
+    ]
+    image_paths = []
+    for page, page_enzymes in enumerate(pages):
+        page_title = 'Relação de enzimas que podem ser candidatas à degradação de plásticos.'
+        if len(pages) > 1:
+            page_title = f'{page_title} ({page + 1}/{len(pages)})'
+
+        figure = draw_enzyme_plastic_page(
+            page_enzymes, plastics, colors, page_title
+        )
+        image_path = get_graphic_page_path(result_dir, page, graphic_format)
+        # SVG text is kept as text instead of glyph paths, about half the size
+        with rc_context({'svg.fonttype': 'none'}):
+            figure.savefig(
+                image_path,
+                format=graphic_format,
+                bbox_inches='tight',
+                dpi=100,
+            )
+        image_paths.append(image_path)
+
+    return image_paths
+
+
+SIMILARITY_COLUMNS = [
+    'Enzima consultada',
+    'Enzima com atividade comprovada',
+    'Similaridade (%)',
+]
+
+
+def get_blast_result_files(blast_output: str):
+    """
+    The function `get_blast_result_files` lists the BLAST result files of a
+    job, in the order of the proteins in the proteome.
+
+    :param blast_output: the `results_blast` directory with one
+    `enzyme_<position>_results.csv` per protein, or a single CSV file with the
+    hits of every protein
+    :type blast_output: str
+    :return: the list of file paths.
+    """
+    if os.path.isfile(blast_output):
+        return [blast_output]
+    return [
+        os.path.join(blast_output, file_name)
+        for file_name in sorted(
+            os.listdir(blast_output),
+            key=lambda file_name: [
+                int(part) if part.isdigit() else part
+                for part in re.split(r'(\d+)', file_name)
+            ],
+        )
+    ]
 
-def write_similarity_results(blast_output_dir: str, final_result_dir: str):
 
-    similarity_genes = pd.DataFrame(
-        {
-            'Enzima consultada': [],
-            'Enzima com atividade comprovada': [],
-            'Similaridade (%)': [],
-        }
+def iter_similarity_rows(blast_output: str):
+    """
+    The function `iter_similarity_rows` reads the BLAST hits one row at a
+    time, so only a single line of a single file is held in memory.
+
+    :return: a generator of `(query id, reference id, identity)` tuples.
+    """
+    for result_file_path in get_blast_result_files(blast_output):
+        with open(result_file_path, newline='') as result_file:
+            for row in csv.DictReader(result_file):
+                yield row['QUERY ID'], row['REF ID'], row['IDENTITY']
+
+
+def write_similarity_results(blast_output: str, final_result_dir: str):
+    """
+    The function `write_similarity_results` merges the BLAST hits into
+    `blast_align.csv`, naming every protein. The hits are streamed twice, the
+    first time to collect the ids to name and the second to write the rows,
+    so memory grows with the distinct proteins and not with the hits.
+
+    :param blast_output: the `results_blast` directory or a single CSV file
+    with the `QUERY ID`, `REF ID` and `IDENTITY` columns
+    :type blast_output: str
+    :param final_result_dir: the directory of the final results
+    :type final_result_dir: str
+    :return: the path of `blast_align.csv`.
+    """
+    protein_names = get_protein_names(
+        gene_id
+        for query_id, ref_id, _ in iter_similarity_rows(blast_output)
+        for gene_id in (query_id, ref_id)
     )
 
-    for file in os.listdir(blast_output_dir):
-        blast_result_path = os.path.join(blast_output_dir, file)
-        blast_result = pd.read_csv(blast_result_path)
-        blast_result['QUERY ID'] = blast_result['QUERY ID'].apply(
-            lambda gene_id: f'{gene_id} {get_protein_name(gene_id)}'
+    output_path = os.path.join(final_result_dir, 'blast_align.csv')
+    with open(output_path, 'w', newline='') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(SIMILARITY_COLUMNS)
+        writer.writerows(
+            (
+                f'{query_id} {protein_names.get(query_id, "")}'.rstrip(),
+                f'{ref_id} {protein_names.get(ref_id, "")}'.rstrip(),
+                identity,
+            )
+            for query_id, ref_id, identity in iter_similarity_rows(
+                blast_output
+            )
         )
-        blast_result['REF ID'] = blast_result['REF ID'].apply(
-            lambda gene_id: f'{gene_id} {get_protein_name(gene_id)}'
-        )
-        blast_result = blast_result.rename(
-            columns={
-                'QUERY ID': 'Enzima consultada',
-                'REF ID': 'Enzima com atividade comprovada',
-                'IDENTITY': 'Similaridade (%)',
-            }
-        )
-        similarity_genes = pd.concat(
-            [similarity_genes, blast_result], ignore_index=True
-        )
-
-    similarity_genes.to_csv(
-        os.path.join(final_result_dir, 'blast_align.csv'), index=False
-    )
+    return output_path
 
 
 @celery_app.task
+@checkpointed(
+    'create_result',
+    lambda blast_output: os.path.dirname(blast_output[1]),
+    lambda result: {'negative_result': bool(result[1])},
+)
 def create_result(blast_output: tuple):
     blast_results_dir, ec_pred_file_path, error = blast_output
     if error:
         return False, False, error
 
-    enzymes_info = get_enzymes_info()
-    all_plastics_set = get_plastics_info()
+    reference_data, error = get_reference_data()
+    if error:
+        return False, False, f'[RESULT] - plasticome metadata error: {error}'
+    record_reference_fingerprint(
+        os.path.dirname(ec_pred_file_path),
+        'create_result',
+        reference_data.get_fingerprint(),
+    )
+    all_plastics_set = reference_data.plastics
     aimed_enzymes = {}
 
     with open(
@@ -150,16 +268,17 @@ def create_result(blast_output: tuple):
         reader = csv.DictReader(file_ec_pred, delimiter='\t')
 
         for row in reader:
-            protein_id = row['Protein ID']
-            ec_number = row['EC Number']
-            aimed_enzymes[protein_id] = []
-            if ec_number in enzymes_info.keys():
-                plastic_types, _ = get_all_plastic_types_by_enzyme(
-                    os.getenv('PLASTICOME_USER'),
-                    os.getenv('PLASTICOME_PASSWORD'),
-                    enzymes_info[ec_number],
+            (
+                plastic_types,
+                error,
+            ) = reference_data.get_plastic_types_by_ec_number(row['EC Number'])
+            if error:
+                return (
+                    False,
+                    False,
+                    f'[RESULT] - plasticome metadata error: {error}',
                 )
-                aimed_enzymes[protein_id].extend(plastic_types)
+            aimed_enzymes[row['Protein ID']] = list(plastic_types)
 
     clean_enzymes_data = {
         key: value for key, value in aimed_enzymes.items() if value
@@ -6,12 +6,16 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 
 
-def authenticate_user(username: str, secret: str):
+def authenticate_user(
+    username: str, secret: str, session=requests, base_url: str = None
+):
 
     auth_data = {'username': username, 'secret': secret}
 
-    response = requests.post(
-        f"{os.getenv('PLASTICOME_METADATA_URL')}/auth", json=auth_data
+    response = session.post(
+        f"{base_url or os.getenv('PLASTICOME_METADATA_URL')}/auth",
+        json=auth_data,
+        timeout=30,
     )
 
     if response.status_code == 200:
@@ -1,22 +1,53 @@
+from __future__ import annotations
+
+import hashlib
 import os
 import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
-import pandas as pd
-from Bio import SeqIO
-from Bio.Blast.Applications import (
-    NcbiblastpCommandline,
-    NcbimakeblastdbCommandline,
-)
 from dotenv import load_dotenv
 
 from plasticome.config.celery_config import celery_app
-from plasticome.services.plasticome_metadata_service import (
-    get_all_enzymes_by_ec_number,
+from plasticome.services.checkpoint_service import (
+    checkpointed,
+    get_completed_work_units,
+    record_completed_work_unit,
 )
+from plasticome.services.disk_cache_service import (
+    entry_lock,
+    evict_lru_entries,
+    get_cache_max_bytes,
+    get_cache_root,
+    lookup_entry,
+    new_staging_dir,
+    publish_entry,
+)
+from plasticome.services.plasticome_metadata_service import get_metadata_client
+from plasticome.services.proteome_store_service import iter_proteome_records
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 load_dotenv(override=True)
 
+BLAST_COLUMNS = [
+    'QUERY ID',
+    'REF ID',
+    'IDENTITY',
+    'LENGTH',
+    'MISMATCHES',
+    'GAP OPENS',
+    'Q. START',
+    'Q. END',
+    'S. START',
+    'S. END',
+    'E-VALUE',
+    'BIT SCORE',
+]
+
 
 def get_protein_sequences_by_ec_number(ec_number: str):
     """
@@ -24,10 +55,9 @@ def get_protein_sequences_by_ec_number(ec_number: str):
     enzymes using credentials and returns all unique sequences.
     :return: a set of protein sequences.
     """
-    enzymes_info, error = get_all_enzymes_by_ec_number(
-        os.getenv('PLASTICOME_USER'),
-        os.getenv('PLASTICOME_PASSWORD'),
-        ec_number,
+    metadata_client = get_metadata_client()
+    enzymes_info, error = metadata_client.get_all_enzymes_by_ec_number(
+        ec_number
     )
     if error:
         return []
@@ -36,21 +66,37 @@ def get_protein_sequences_by_ec_number(ec_number: str):
     return [item['protein_sequence'] for item in enzymes_info]
 
 
+def parse_reference_sequences(protein_list: list):
+    """
+    The function `parse_reference_sequences` splits the protein sequences
+    stored in the plasticome metadata, which keep the FASTA header and the
+    residues in a single string, into header and sequence pairs.
+
+    :return: a list of `(header, sequence)` tuples.
+    """
+    references = []
+    for sequence in protein_list:
+        match = re.match(r'(>.*?)([A-Z ]{10,})$', sequence)
+        if match:
+            header, sequence = match.groups()
+            references.append((header, sequence.strip()))
+    return references
+
+
 def protein_sequences_to_fasta(protein_list: list, output_file_path: str):
 
     with open(output_file_path, 'w') as fasta_file:
-        for sequence in protein_list:
-            match = re.match(r'(>.*?)([A-Z ]{10,})$', sequence)
-            if match:
-                header, sequence = match.groups()
-                fasta_file.write(header + '\n')
-                fasta_file.write(sequence.strip() + '\n')
+        for header, sequence in parse_reference_sequences(protein_list):
+            fasta_file.write(header + '\n')
+            fasta_file.write(sequence + '\n')
         if os.path.exists(output_file_path):
             return output_file_path
         return None
 
 
 def make_blastdb(reference_fasta_path: str):
+    from Bio.Blast.Applications import NcbimakeblastdbCommandline
+
     try:
 
         blast_db_path = os.path.join(
@@ -69,58 +115,380 @@ def make_blastdb(reference_fasta_path: str):
         return None, f'CREATE BLASTDB ERROR: {str(error)}'
 
 
-def split_proteins_fasta(fasta_file: str):
-    output_dir = os.path.join(os.path.dirname(fasta_file), 'splited_fasta')
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+def ec_number_to_filename(ec_number: str):
+    return re.sub(r'[^\w.-]', '_', str(ec_number))
+
+
+def get_reference_fingerprint(protein_sequences: list):
+    """
+    The function `get_reference_fingerprint` hashes a reference set of protein
+    sequences, regardless of the order the metadata service returned them.
+
+    :param protein_sequences: the reference sequences of an EC number
+    :type protein_sequences: list
+    :return: a short hexadecimal digest identifying the reference set.
+    """
+    digest = hashlib.sha256()
+    for sequence in sorted(protein_sequences):
+        digest.update(sequence.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+def get_blastdb_cache_key(ec_number: str, protein_sequences: list):
+    return (
+        f'{ec_number_to_filename(ec_number)}_'
+        f'{get_reference_fingerprint(protein_sequences)}'
+    )
+
+
+def get_cached_blastdb(ec_number: str, protein_sequences: list = None):
+    """
+    The function `get_cached_blastdb` returns a BLAST database with the
+    reference enzymes of an EC number, building it only when the persistent
+    cache has no database for the current reference set. Cache entries are
+    keyed by the EC number and the fingerprint of its sequences, so a change in
+    the plasticome metadata enzymes produces a new entry, while the old one ages
+    out through the LRU size limit.
+
+    :param ec_number: the EC number predicted for the query proteins
+    :type ec_number: str
+    :param protein_sequences: the reference sequences of the EC number, fetched
+    from the plasticome metadata when not given
+    :type protein_sequences: list
+    :return: a tuple with the BLAST database path and an error message, or
+    `False` when there is no error.
+    """
+    if protein_sequences is None:
+        protein_sequences = get_protein_sequences_by_ec_number(ec_number)
+    if not protein_sequences:
+        return False, f'NO REFERENCE SEQUENCES FOR EC NUMBER {ec_number}'
+
+    cache_root = get_cache_root('BLASTDB_CACHE_DIR', 'blastdb_cache')
+    cache_key = get_blastdb_cache_key(ec_number, protein_sequences)
+
+    cached_entry = lookup_entry(cache_root, cache_key)
+    if cached_entry:
+        return os.path.join(cached_entry, 'plasticome_protein_db'), False
+
+    staging_dir = new_staging_dir(cache_root)
+    fasta_to_db = protein_sequences_to_fasta(
+        protein_sequences, os.path.join(staging_dir, 'reference.faa')
+    )
+    _, error = make_blastdb(fasta_to_db)
+    if error:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return False, error
+
+    cache_entry = publish_entry(staging_dir, cache_root, cache_key)
+    evict_lru_entries(
+        cache_root, get_cache_max_bytes('BLASTDB_CACHE_MAX_MB', 2048)
+    )
+    return os.path.join(cache_entry, 'plasticome_protein_db'), False
+
 
-    sequences = SeqIO.parse(fasta_file, 'fasta')
+@contextmanager
+def use_cached_blastdb(ec_number: str, protein_sequences: list):
+    """
+    The function `use_cached_blastdb` gets the cached BLAST database of a
+    reference set and holds a shared lock on its cache entry until the block
+    ends, so the eviction of another job never deletes a database while
+    blastp is reading it, however long the search takes.
 
-    for i, sequence in enumerate(sequences, start=1):
-        output_file = os.path.join(output_dir, f'enzyme_{i}.faa')
-        with open(output_file, 'w') as output_handle:
-            SeqIO.write(sequence, output_handle, 'fasta')
-    return output_dir
+    :return: a context manager yielding the `get_cached_blastdb` tuple.
+    """
+    cache_root = get_cache_root('BLASTDB_CACHE_DIR', 'blastdb_cache')
+    with entry_lock(
+        cache_root,
+        get_blastdb_cache_key(ec_number, protein_sequences),
+        shared=True,
+    ):
+        yield get_cached_blastdb(ec_number, protein_sequences)
 
 
-def identify_correspondent_ec_number(protein_file: str, ec_pred_file: str):
+def get_local_alignment_threshold():
     try:
-        sequence_record = SeqIO.read(protein_file, 'fasta')
-        protein_id = sequence_record.id
+        return int(os.getenv('LOCAL_ALIGNMENT_MAX_REFERENCES', 0))
+    except ValueError:
+        return 0
+
+
+def resolve_reference_set(ec_number: str):
+    """
+    The function `resolve_reference_set` fetches the reference enzymes of an
+    EC number. Sets with up to `LOCAL_ALIGNMENT_MAX_REFERENCES` enzymes are
+    aligned in-process, while for larger ones the cached BLAST database is
+    built ahead, so the alignments only look it up.
+
+    :param ec_number: the EC number predicted for the query proteins
+    :type ec_number: str
+    :return: a tuple with the reference sequences list and an error message,
+    or `False` when there is no error.
+    """
+    protein_sequences = get_protein_sequences_by_ec_number(ec_number)
+    if not protein_sequences:
+        return False, f'NO REFERENCE SEQUENCES FOR EC NUMBER {ec_number}'
+    if len(protein_sequences) > get_local_alignment_threshold():
+        _, error = get_cached_blastdb(ec_number, protein_sequences)
+        if error:
+            return False, error
+    return protein_sequences, False
+
+
+def load_predicted_ec_numbers(ec_pred_file: str):
+    """
+    The function `load_predicted_ec_numbers` reads the filtered ECPred result
+    table and maps each protein id to its predicted EC number.
+
+    :param ec_pred_file: path of the `ec_pred_results.tsv` file
+    :type ec_pred_file: str
+    :return: a dictionary with protein ids as keys and EC numbers as values.
+    """
+    import pandas as pd
+
+    ec_pred_out = pd.read_csv(ec_pred_file, sep='\t', dtype=str)
+    protein_ids = ec_pred_out['Protein ID'].str.split().str[0]
+    return dict(zip(protein_ids, ec_pred_out['EC Number']))
 
-        ec_pred_out = pd.read_csv(ec_pred_file, sep='\t')
-        ec_pred_out['Protein ID'] = (
-            ec_pred_out['Protein ID'].str.split().str[0]
+
+def group_proteins_by_ec_number(query_file: str, predicted_ec_numbers: dict):
+    """
+    The function `group_proteins_by_ec_number` groups the proteins kept in the
+    job proteome store by their predicted EC number, keeping each protein
+    position among the kept proteins, which names its result file.
+
+    :return: a dictionary with EC numbers as keys and lists of
+    `(position, SeqRecord)` tuples as values.
+    """
+    ec_groups = {}
+    for position, record in enumerate(
+        iter_proteome_records(query_file), start=1
+    ):
+        if record.id not in predicted_ec_numbers:
+            raise ValueError(f'No EC number predicted for {record.id}')
+        ec_groups.setdefault(predicted_ec_numbers[record.id], []).append(
+            (position, record)
         )
-        predicted_ec_number = ec_pred_out.loc[
-            ec_pred_out['Protein ID'] == protein_id, 'EC Number'
-        ].values[0]
-        protein_sequences = get_protein_sequences_by_ec_number(
-            predicted_ec_number
+    return ec_groups
+
+
+def get_blast_work_units(ec_groups: dict):
+    """
+    The function `get_blast_work_units` lists the blastp executions of the
+    stage. In the default `batched` mode there is one execution per EC number
+    with all of its query proteins, while the `single` mode (`BLAST_MODE`
+    environment variable) keeps one execution per protein.
+
+    :return: a list of `(ec_number, proteins)` tuples.
+    """
+    if os.getenv('BLAST_MODE', 'batched').lower() == 'single':
+        return [
+            (ec_number, [protein])
+            for ec_number, proteins in ec_groups.items()
+            for protein in proteins
+        ]
+    return list(ec_groups.items())
+
+
+def get_blast_concurrency(work_units_count: int):
+    """
+    The function `get_blast_concurrency` decides how many blastp executions run
+    at the same time and how many threads each one uses. `BLAST_MAX_WORKERS`
+    bounds the parallel executions and `BLAST_NUM_THREADS` the threads of each
+    one; by default the available cores are shared among the executions.
+
+    :param work_units_count: number of blastp executions of the stage
+    :type work_units_count: int
+    :return: a tuple with the number of workers and threads per blastp.
+    """
+    cpu_count = os.cpu_count() or 1
+    try:
+        max_workers = int(os.getenv('BLAST_MAX_WORKERS', cpu_count))
+    except ValueError:
+        max_workers = cpu_count
+    max_workers = max(1, min(max_workers, work_units_count))
+
+    try:
+        num_threads = int(
+            os.getenv('BLAST_NUM_THREADS', cpu_count // max_workers)
         )
-        blast_dir_path = os.path.join(os.path.dirname(protein_file), 'blastdb')
-        if not os.path.exists(blast_dir_path):
-            os.makedirs(blast_dir_path)
-
-        fasta_to_db = protein_sequences_to_fasta(
-            protein_sequences,
-            os.path.join(
-                blast_dir_path, f'compare_to_{os.path.basename(protein_file)}'
-            ),
+    except ValueError:
+        num_threads = cpu_count // max_workers
+    return max_workers, max(1, num_threads)
+
+
+def run_blastp(
+    query_path: str, blastdb_path: str, output_path: str, num_threads=1
+):
+    from Bio.Blast.Applications import NcbiblastpCommandline
+
+    blastp_cline = NcbiblastpCommandline(
+        cmd=f'{os.getenv("BLAST_PATH")}\\blastp',
+        query=query_path,
+        db=blastdb_path,
+        out=output_path,
+        outfmt=10,
+        num_threads=num_threads,
+    )
+    blastp_cline()
+    return output_path
+
+
+def read_blast_output(blast_output_path: str):
+    import pandas as pd
+
+    if os.path.getsize(blast_output_path) == 0:
+        return pd.DataFrame(columns=BLAST_COLUMNS)
+    result_frame = pd.read_csv(blast_output_path, header=None)
+    result_frame.columns = BLAST_COLUMNS
+    return result_frame
+
+
+def summarize_blast_hits(result_frame: pd.DataFrame):
+    """
+    The function `summarize_blast_hits` keeps, for each reference enzyme, only
+    the best scored hit of a query protein and drops the alignment details.
+
+    :param result_frame: the blastp tabular hits of a single query protein
+    :type result_frame: pd.DataFrame
+    :return: a dataframe with the `QUERY ID`, `REF ID` and `IDENTITY` columns.
+    """
+    if result_frame.shape[0] > 1:
+        result_frame = result_frame.sort_values(
+            by='BIT SCORE', ascending=False
         )
-        blastdb_path, error = make_blastdb(fasta_to_db)
-        if error:
-            return False, error
+        result_frame = result_frame.groupby('REF ID').first().reset_index()
+    return result_frame.drop(
+        columns=[
+            column
+            for column in BLAST_COLUMNS
+            if column not in ['QUERY ID', 'REF ID', 'IDENTITY']
+        ]
+    )
 
-        return blastdb_path, False
-    except Exception as error:
-        return (
-            False,
-            f'IDENTIFY EC NUMBERS {os.path.basename(protein_file)} ERROR: {str(error)}',
+
+def get_work_unit_name(ec_number: str, proteins: list):
+    """
+    The function `get_work_unit_name` names a group of proteins aligned
+    together after its EC number, first protein position and size. The name is
+    deterministic, so it also identifies the group when a job is resumed.
+    """
+    return (
+        f'{ec_number_to_filename(ec_number)}_{proteins[0][0]}_{len(proteins)}'
+    )
+
+
+def search_local_hits(proteins: list, protein_sequences: list):
+    """
+    The function `search_local_hits` aligns a group of query proteins to a
+    small reference set with the in-process Smith-Waterman engine.
+
+    :return: a dataframe with the blastp tabular output columns, or `None` when
+    the sequences are too long for the in-process alignment.
+    """
+    import pandas as pd
+
+    from plasticome.services.local_alignment_service import (
+        align_against_references,
+        fits_local_alignment,
+    )
+
+    queries = [(record.id, str(record.seq)) for _, record in proteins]
+    references = [
+        (header[1:].split()[0], sequence.replace(' ', ''))
+        for header, sequence in parse_reference_sequences(protein_sequences)
+    ]
+    if not fits_local_alignment(queries, references):
+        return None
+    return pd.DataFrame(
+        align_against_references(queries, references), columns=BLAST_COLUMNS
+    )
+
+
+def align_proteins_group(
+    ec_number: str,
+    proteins: list,
+    reference,
+    work_dir: str,
+    results_path: str,
+    num_threads=1,
+):
+    """
+    The function `align_proteins_group` aligns a group of proteins sharing the
+    same reference set, with a single multi-query blastp or in-process for tiny
+    reference sets, then splits the hits into one
+    `enzyme_<position>_results.csv` file per protein.
+
+    :param ec_number: the EC number predicted for the whole group
+    :param proteins: list of `(position, SeqRecord)` tuples
+    :param reference: the reference sequences returned by
+    `resolve_reference_set`
+    :param work_dir: directory for the group query and raw blastp output
+    :param results_path: directory of the per-protein result files
+    :return: the list of per-protein result files written.
+    """
+    import pandas as pd
+    from Bio import SeqIO
+
+    hits = None
+    group_name = get_work_unit_name(ec_number, proteins)
+    if len(reference) <= get_local_alignment_threshold():
+        hits = search_local_hits(proteins, reference)
+
+    if hits is None:
+        query_path = os.path.join(work_dir, f'{group_name}.faa')
+        SeqIO.write([record for _, record in proteins], query_path, 'fasta')
+
+        with use_cached_blastdb(ec_number, reference) as (blastdb_path, error):
+            if error:
+                raise RuntimeError(error)
+            blast_output_path = run_blastp(
+                query_path,
+                blastdb_path,
+                os.path.join(work_dir, f'{group_name}_blast.csv'),
+                num_threads,
+            )
+        hits = read_blast_output(blast_output_path)
+
+    hits_by_query = dict(list(hits.groupby('QUERY ID')))
+    result_files = []
+    for position, record in proteins:
+        result_frame = hits_by_query.get(
+            record.id, pd.DataFrame(columns=BLAST_COLUMNS)
+        )
+        result_file_path = os.path.join(
+            results_path, f'enzyme_{position}_results.csv'
         )
+        summarize_blast_hits(result_frame).to_csv(
+            result_file_path, index=False
+        )
+        result_files.append(result_file_path)
+    return result_files
+
+
+def align_and_record_work_unit(
+    job_dir: str, ec_number: str, proteins: list, reference, *args
+):
+    """
+    The function `align_and_record_work_unit` aligns a group of proteins and
+    records it as completed in the job checkpoint, so a resumed BLAST stage
+    only aligns the groups that did not finish.
+    """
+    result_files = align_proteins_group(ec_number, proteins, reference, *args)
+    record_completed_work_unit(
+        job_dir, 'align_with_blastdb', get_work_unit_name(ec_number, proteins)
+    )
+    return result_files
 
 
 @celery_app.task
+@checkpointed(
+    'align_with_blastdb',
+    lambda ec_pred_result: os.path.dirname(ec_pred_result[0]),
+    lambda blast_output: {
+        'aligned_proteins': len(os.listdir(blast_output[0]))
+    },
+)
 def align_with_blastdb(ec_pred_result: tuple):
     query_file, ec_pred_out, error = ec_pred_result
 
@@ -128,68 +496,54 @@ def align_with_blastdb(ec_pred_result: tuple):
         return False, False, error
 
     try:
-        splited_fasta = split_proteins_fasta(query_file)
+        job_dir = os.path.dirname(query_file)
+        work_dir = os.path.join(job_dir, 'blast_queries')
+        results_path = os.path.join(job_dir, 'results_blast')
+        for directory in (work_dir, results_path):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
 
-        for file in os.listdir(splited_fasta):
-            protein_file_path = os.path.join(splited_fasta, file)
-            query_blast_db, error = identify_correspondent_ec_number(
-                protein_file_path, ec_pred_out
-            )
-            results_path = os.path.join(
-                os.path.dirname(query_file), 'results_blast'
-            )
+        ec_groups = group_proteins_by_ec_number(
+            query_file, load_predicted_ec_numbers(ec_pred_out)
+        )
+        completed_work_units = get_completed_work_units(
+            job_dir, 'align_with_blastdb'
+        )
+        work_units = [
+            (ec_number, proteins)
+            for ec_number, proteins in get_blast_work_units(ec_groups)
+            if get_work_unit_name(ec_number, proteins)
+            not in completed_work_units
+        ]
+        ec_numbers = list(dict.fromkeys(ec for ec, _ in work_units))
+        max_workers, num_threads = get_blast_concurrency(len(work_units))
 
-            if not os.path.exists(results_path):
-                os.makedirs(results_path)
-            result_file_path = os.path.join(
-                results_path, f'{file.split(".")[0]}_results.csv'
-            )
-            blastp_cline = NcbiblastpCommandline(
-                cmd=f'{os.getenv("BLAST_PATH")}\\blastp',
-                query=os.path.join(splited_fasta, file),
-                db=query_blast_db,
-                out=result_file_path,
-                outfmt=10,
-            )
-            blastp_cline()
-            shutil.rmtree(os.path.dirname(query_blast_db))
-
-            result_frame = pd.read_csv(result_file_path, header=None)
-            result_frame.columns = [
-                'QUERY ID',
-                'REF ID',
-                'IDENTITY',
-                'LENGTH',
-                'MISMATCHES',
-                'GAP OPENS',
-                'Q. START',
-                'Q. END',
-                'S. START',
-                'S. END',
-                'E-VALUE',
-                'BIT SCORE',
-            ]
-            if result_frame.shape[0] > 1:
-                result_frame = result_frame.sort_values(
-                    by='BIT SCORE', ascending=False
-                )
-                result_frame = (
-                    result_frame.groupby('REF ID').first().reset_index()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            reference_sets = dict(
+                zip(
+                    ec_numbers,
+                    executor.map(resolve_reference_set, ec_numbers),
                 )
-            result_frame = result_frame.drop(
-                columns=[
-                    'LENGTH',
-                    'MISMATCHES',
-                    'GAP OPENS',
-                    'Q. START',
-                    'Q. END',
-                    'S. START',
-                    'S. END',
-                    'E-VALUE',
-                    'BIT SCORE',
-                ]
             )
-            result_frame.to_csv(result_file_path, index=False)
+            for _, error in reference_sets.values():
+                if error:
+                    return False, False, error
+
+            alignments = [
+                executor.submit(
+                    align_and_record_work_unit,
+                    job_dir,
+                    ec_number,
+                    proteins,
+                    reference_sets[ec_number][0],
+                    work_dir,
+                    results_path,
+                    num_threads,
+                )
+                for ec_number, proteins in work_units
+            ]
+            for alignment in alignments:
+                alignment.result()
 
         return results_path, ec_pred_out, False
     except Exception as error:
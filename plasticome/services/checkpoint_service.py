@@ -0,0 +1,402 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from celery import current_task
+
+from plasticome.services.disk_cache_service import entry_lock, get_cache_root
+from plasticome.services.Helpers import get_int_env
+from plasticome.services.proteome_store_service import get_kept_protein_ids
+
+CHECKPOINT_FILE = 'checkpoint.json'
+JOB_HISTORY_MAX_AGE = 30 * 24 * 60 * 60
+PIPELINE_STAGES = [
+    'download_genome',
+    'run_dbcan_container',
+    'dbcan_result_filter',
+    'run_ecpred_container',
+    'ecpred_result_filter',
+    'align_with_blastdb',
+    'create_result',
+]
+REFERENCE_DATA_STAGES = [
+    'dbcan_result_filter',
+    'ecpred_result_filter',
+    'create_result',
+]
+
+manifest_lock = threading.Lock()
+
+
+def get_manifest_path(job_dir: str):
+    return os.path.join(job_dir, CHECKPOINT_FILE)
+
+
+def read_manifest(job_dir: str):
+    """
+    The function `read_manifest` reads the checkpoint manifest of a job, which
+    records the job parameters and the output of every completed stage.
+
+    :return: the manifest dictionary, empty when the job has no checkpoint.
+    """
+    manifest_path = get_manifest_path(job_dir)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def update_manifest(job_dir: str, update_function):
+    """
+    The function `update_manifest` applies a change to the manifest of a job
+    and writes it back atomically, so a worker killed midway never leaves a
+    truncated checkpoint behind. The read-modify-write holds a file lock in
+    the job directory, as the API process, the Celery workers and the stage
+    heartbeats all update the same manifest.
+
+    :param update_function: function receiving the manifest dictionary and
+    changing it in place
+    :return: the updated manifest.
+    """
+    manifest_path = get_manifest_path(job_dir)
+    with manifest_lock, entry_lock(job_dir, CHECKPOINT_FILE):
+        manifest = read_manifest(job_dir)
+        update_function(manifest)
+        with open(f'{manifest_path}.tmp', 'w') as manifest_file:
+            json.dump(manifest, manifest_file, default=str)
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+    return manifest
+
+
+def start_job_manifest(job_dir: str, job_data: dict):
+    """
+    The function `start_job_manifest` creates the checkpoint manifest of a new
+    job with everything needed to resubmit it, such as the input file and the
+    email data.
+    """
+    return update_manifest(
+        job_dir,
+        lambda manifest: manifest.update(
+            {**job_data, 'created_at': time.time(), 'stages': {}}
+        ),
+    )
+
+
+def get_stage_error(output):
+    if isinstance(output, (list, tuple)) and output:
+        return output[-1]
+    return False
+
+
+def get_current_task_id():
+    request = getattr(current_task, 'request', None)
+    return getattr(request, 'id', None)
+
+
+def record_stage_start(job_dir: str, stage: str):
+    """
+    The function `record_stage_start` marks a stage as running, with its start
+    time and the id of the Celery task running it.
+    """
+
+    def set_stage(manifest):
+        started_at = time.time()
+        manifest['heartbeat_at'] = started_at
+        manifest.setdefault('stages', {})[stage] = {
+            'status': 'running',
+            'started_at': started_at,
+            'heartbeat_at': started_at,
+            'task_id': get_current_task_id(),
+        }
+
+    return update_manifest(job_dir, set_stage)
+
+
+def record_stage_output(
+    job_dir: str, stage: str, output, metrics: dict = None
+):
+    """
+    The function `record_stage_output` stores the output of a finished stage,
+    its end time, duration and metrics, such as how many sequences it kept.
+    """
+
+    def set_stage(manifest):
+        error = get_stage_error(output)
+        stage_checkpoint = manifest.setdefault('stages', {}).setdefault(
+            stage, {}
+        )
+        finished_at = time.time()
+        manifest['heartbeat_at'] = finished_at
+        stage_checkpoint.update(
+            {
+                'status': 'failed' if error else 'completed',
+                'output': output,
+                'error': error,
+                'finished_at': finished_at,
+                'duration': finished_at
+                - stage_checkpoint.get('started_at', finished_at),
+                'metrics': metrics or {},
+            }
+        )
+
+    return update_manifest(job_dir, set_stage)
+
+
+def count_kept_sequences(stage_output):
+    return {'sequences': len(get_kept_protein_ids(stage_output[0]))}
+
+
+def get_stage_metrics(get_metrics, output):
+    if not get_metrics or get_stage_error(output):
+        return {}
+    try:
+        return get_metrics(output)
+    except Exception:
+        return {}
+
+
+def get_completed_output(job_dir: str, stage: str):
+    """
+    The function `get_completed_output` returns the stored output of a stage
+    that already completed in a previous run of the job.
+
+    :return: the stage output, or `None` when the stage must run.
+    """
+    stage_checkpoint = read_manifest(job_dir).get('stages', {}).get(stage)
+    if stage_checkpoint and stage_checkpoint['status'] == 'completed':
+        return stage_checkpoint['output']
+    return None
+
+
+def get_first_pending_stage(job_dir: str):
+    """
+    The function `get_first_pending_stage` finds where a resumed job restarts.
+
+    :return: a tuple with the index of the first stage not completed (the
+    number of stages when all of them completed) and the output of the stage
+    before it, or `None` when the job restarts from the beginning.
+    """
+    previous_output = None
+    for index, stage in enumerate(PIPELINE_STAGES):
+        output = get_completed_output(job_dir, stage)
+        if output is None:
+            return index, previous_output
+        previous_output = output
+    return len(PIPELINE_STAGES), previous_output
+
+
+def get_heartbeat_interval():
+    return max(get_int_env('STAGE_HEARTBEAT_SECONDS', 60), 1)
+
+
+@contextmanager
+def stage_heartbeat(job_dir: str, stage: str):
+    """
+    The function `stage_heartbeat` refreshes the heartbeat of a running stage
+    in the job manifest every `STAGE_HEARTBEAT_SECONDS`, so a stage whose
+    worker died can be told apart from a long one.
+    """
+    stop = threading.Event()
+
+    def set_heartbeat(manifest):
+        heartbeat_at = time.time()
+        manifest['heartbeat_at'] = heartbeat_at
+        manifest.get('stages', {}).get(stage, {})[
+            'heartbeat_at'
+        ] = heartbeat_at
+
+    def beat():
+        while not stop.wait(get_heartbeat_interval()):
+            try:
+                update_manifest(job_dir, set_heartbeat)
+            except OSError:
+                return
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def is_job_active(job_dir: str):
+    """
+    The function `is_job_active` tells whether a job may still be running: it
+    has not finished nor failed, and its manifest was updated by a stage or a
+    resume less than `JOB_STALE_SECONDS` ago.
+    """
+    manifest = read_manifest(job_dir)
+    if manifest.get('finished_at'):
+        return False
+    if any(
+        stage_checkpoint.get('status') == 'failed'
+        for stage_checkpoint in manifest.get('stages', {}).values()
+    ):
+        return False
+    last_activity = manifest.get('heartbeat_at') or manifest.get(
+        'created_at', 0
+    )
+    stale_after = max(
+        get_int_env('JOB_STALE_SECONDS', 10 * 60), 3 * get_heartbeat_interval()
+    )
+    return time.time() - last_activity < stale_after
+
+
+def record_reference_fingerprint(job_dir: str, stage: str, fingerprint: str):
+    """
+    The function `record_reference_fingerprint` records which plasticome
+    metadata snapshot a stage read its enzymes and plastics from.
+    """
+    if not os.path.isdir(job_dir):
+        return None
+    return update_manifest(
+        job_dir,
+        lambda manifest: manifest.setdefault(
+            'reference_fingerprints', {}
+        ).update({stage: fingerprint}),
+    )
+
+
+def get_reference_fingerprint(job_dir: str):
+    """
+    The function `get_reference_fingerprint` returns the metadata snapshot a
+    whole job was computed against.
+
+    :return: the snapshot fingerprint, or `None` when a stage of
+    `REFERENCE_DATA_STAGES` did not record one or the stages used different
+    snapshots.
+    """
+    fingerprints = read_manifest(job_dir).get('reference_fingerprints', {})
+    stage_fingerprints = {
+        fingerprints.get(stage) for stage in REFERENCE_DATA_STAGES
+    }
+    if len(stage_fingerprints) != 1 or None in stage_fingerprints:
+        return None
+    return stage_fingerprints.pop()
+
+
+def record_job_resume(job_dir: str):
+    def set_resume(manifest):
+        resumed_at = time.time()
+        manifest['heartbeat_at'] = resumed_at
+        manifest['resumed_at'] = resumed_at
+
+    return update_manifest(job_dir, set_resume)
+
+
+def checkpointed(stage: str, get_job_dir, get_metrics=None):
+    """
+    The function `checkpointed` decorates a pipeline stage so that its output,
+    timings and metrics are recorded in the job manifest, and a stage that
+    already completed returns the recorded output instead of running again
+    when the job is resumed.
+
+    :param stage: the stage name, one of `PIPELINE_STAGES`
+    :type stage: str
+    :param get_job_dir: function receiving the stage input and returning the
+    job directory, or a falsy value when the input carries an error
+    :param get_metrics: function receiving a successful stage output and
+    returning a dictionary of metrics, such as the number of kept sequences
+    :return: the decorator.
+    """
+
+    def decorator(stage_function):
+        @wraps(stage_function)
+        def wrapper(stage_input, *args, **kwargs):
+            try:
+                job_dir = get_job_dir(stage_input)
+            except Exception:
+                job_dir = None
+            if not job_dir or not os.path.isdir(job_dir):
+                return stage_function(stage_input, *args, **kwargs)
+
+            completed_output = get_completed_output(job_dir, stage)
+            if completed_output is not None:
+                return completed_output
+
+            record_stage_start(job_dir, stage)
+            try:
+                with stage_heartbeat(job_dir, stage):
+                    output = stage_function(stage_input, *args, **kwargs)
+            except Exception as e:
+                record_stage_output(job_dir, stage, (False, str(e)))
+                raise
+            record_stage_output(
+                job_dir, stage, output, get_stage_metrics(get_metrics, output)
+            )
+            return output
+
+        return wrapper
+
+    return decorator
+
+
+def get_completed_work_units(job_dir: str, stage: str):
+    stage_units = read_manifest(job_dir).get('work_units', {})
+    return set(stage_units.get(stage, []))
+
+
+def record_completed_work_unit(job_dir: str, stage: str, work_unit: str):
+    """
+    The function `record_completed_work_unit` records a finished part of a
+    long stage, such as one BLAST work unit, so a resumed stage only runs the
+    parts that did not finish.
+    """
+
+    def add_work_unit(manifest):
+        stage_units = manifest.setdefault('work_units', {})
+        stage_units.setdefault(stage, [])
+        if work_unit not in stage_units[stage]:
+            stage_units[stage].append(work_unit)
+
+    return update_manifest(job_dir, add_work_unit)
+
+
+def get_job_history_root():
+    return get_cache_root('JOB_HISTORY_DIR', 'job_history')
+
+
+def archive_job_manifest(job_dir: str):
+    """
+    The function `archive_job_manifest` marks a job as finished and keeps a
+    copy of its manifest in `JOB_HISTORY_DIR`, so the job status can still be
+    read after its scratch directory is removed. Archived manifests older than
+    30 days are removed.
+
+    :return: the archived manifest path, or `None` when the job has none.
+    """
+    manifest = read_manifest(job_dir)
+    if not manifest.get('job_id'):
+        return None
+    manifest = update_manifest(
+        job_dir, lambda manifest: manifest.update(finished_at=time.time())
+    )
+
+    history_root = get_job_history_root()
+    history_path = os.path.join(history_root, f'{manifest["job_id"]}.json')
+    with open(f'{history_path}.tmp', 'w') as history_file:
+        json.dump(manifest, history_file, default=str)
+    os.replace(f'{history_path}.tmp', history_path)
+
+    now = time.time()
+    for file_name in os.listdir(history_root):
+        file_path = os.path.join(history_root, file_name)
+        try:
+            if now - os.path.getmtime(file_path) > JOB_HISTORY_MAX_AGE:
+                os.remove(file_path)
+        except OSError:
+            continue
+    return history_path
+
+
+def read_archived_manifest(job_id: str):
+    history_path = os.path.join(get_job_history_root(), f'{job_id}.json')
+    if not os.path.exists(history_path):
+        return {}
+    with open(history_path) as history_file:
+        return json.load(history_file)
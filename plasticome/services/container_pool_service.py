@@ -0,0 +1,305 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from plasticome.services.Helpers import get_int_env
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+load_dotenv(override=True)
+
+POOL_LABEL = 'plasticome.pool'
+POOL_MOUNT_DIR = 'plasticome_jobs'
+CONTAINER_WORKDIR = '/app'
+IDLE_COMMAND = ['tail', '-f', '/dev/null']
+SLOT_WAIT_SECONDS = 1
+
+
+def get_container_limits(prefix: str):
+    """
+    The function `get_container_limits` reads the CPU and memory limits of the
+    tool containers from `<prefix>_CPUS` (a fraction of cores, such as `1.5`)
+    and `<prefix>_MEMORY` (a docker size, such as `4g`).
+
+    :return: the `containers.run` arguments for the limits that are set.
+    """
+    container_options = {}
+    try:
+        cpus = float(os.getenv(f'{prefix}_CPUS', 0))
+    except ValueError:
+        cpus = 0
+    if cpus > 0:
+        container_options['nano_cpus'] = int(cpus * 1e9)
+    if os.getenv(f'{prefix}_MEMORY'):
+        container_options['mem_limit'] = os.getenv(f'{prefix}_MEMORY')
+    return container_options
+
+
+def get_shard_count(
+    env_var: str, sequences_count: int, sequences_per_shard: int = 1
+):
+    """
+    The function `get_shard_count` reads in how many shards a container stage
+    is split. In `auto` mode there is one shard for every `sequences_per_shard`
+    sequences, up to one shard per core. The count never exceeds the number of
+    sequences.
+
+    :param env_var: the environment variable holding a number or `auto`
+    :type env_var: str
+    :param sequences_count: the number of sequences to split
+    :type sequences_count: int
+    :param sequences_per_shard: sequences per shard in `auto` mode
+    :type sequences_per_shard: int
+    :return: the number of shards, `1` meaning the stage is not split.
+    """
+    shard_count = os.getenv(env_var, '1').strip().lower()
+    if shard_count == 'auto':
+        shard_count = min(
+            os.cpu_count() or 1,
+            -(-sequences_count // max(sequences_per_shard, 1)),
+        )
+    else:
+        try:
+            shard_count = int(shard_count)
+        except ValueError:
+            shard_count = 1
+    return max(min(shard_count, sequences_count), 1)
+
+
+def get_pool_size():
+    """
+    The function `get_pool_size` reads how many idle containers are kept per
+    image, from `CONTAINER_POOL_SIZE`. The pool saves the container creation,
+    start and removal of each run, not the tool start-up, such as the ECPred
+    JVM and models, which is paid on every run;
+    `benchmarks/container_pool_benchmark.py` measures both.
+
+    :return: the pool size, `0` meaning one container is run per job.
+    """
+    return max(get_int_env('CONTAINER_POOL_SIZE', 0), 0)
+
+
+def get_container_name(image: str, slot: int):
+    image_name = image.split('/')[-1].split(':')[0]
+    return f'plasticome-{image_name}-{slot}'
+
+
+def get_container_age(container):
+    started_at = container.attrs['State'].get('StartedAt', '')
+    try:
+        started = datetime.fromisoformat(started_at[:26].rstrip('Z'))
+    except ValueError:
+        return 0
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (now - started).total_seconds()
+
+
+def get_image_entrypoint(client, image: str):
+    """
+    The function `get_image_entrypoint` reads the entrypoint of an image, which
+    the warm containers replace with an idle command and every `exec_run` has
+    to call explicitly.
+
+    :return: the entrypoint as a list, empty when the image has none.
+    """
+    entrypoint = client.images.get(image).attrs['Config'].get('Entrypoint')
+    if isinstance(entrypoint, str):
+        return [entrypoint]
+    return list(entrypoint or [])
+
+
+def is_container_healthy(container, max_age: int):
+    """
+    The function `is_container_healthy` checks a warm container is running,
+    answers an exec and is younger than `max_age` seconds, so long-lived
+    containers are recycled before they accumulate state.
+    """
+    import docker
+
+    try:
+        container.reload()
+        if container.status != 'running':
+            return False
+        if max_age and get_container_age(container) > max_age:
+            return False
+        exit_code, _ = container.exec_run(['true'])
+        return exit_code == 0
+    except docker.errors.APIError:
+        return False
+
+
+def remove_container(container):
+    import docker
+
+    try:
+        container.remove(force=True)
+    except docker.errors.APIError:
+        pass
+
+
+def start_pool_container(
+    client, image: str, name: str, jobs_root: str, container_options: dict
+):
+    """
+    The function `start_pool_container` starts a long-lived container of the
+    image, idle, with the whole jobs directory mounted, so any job can be run
+    inside it with `exec_run`.
+
+    :param container_options: extra `containers.run` arguments, such as CPU
+    and memory limits
+    :type container_options: dict
+    :return: the running container.
+    """
+    return client.containers.run(
+        image,
+        name=name,
+        entrypoint=IDLE_COMMAND[:1],
+        command=IDLE_COMMAND[1:],
+        volumes={
+            jobs_root: {
+                'bind': f'{CONTAINER_WORKDIR}/{POOL_MOUNT_DIR}',
+                'mode': 'rw',
+            }
+        },
+        working_dir=CONTAINER_WORKDIR,
+        labels={POOL_LABEL: image},
+        detach=True,
+        **container_options,
+    )
+
+
+def get_pool_container(
+    client, image: str, slot: int, jobs_root: str, container_options: dict
+):
+    """
+    The function `get_pool_container` returns the warm container of a pool
+    slot, recycling it when it is unhealthy, too old or mounts another jobs
+    directory, and starting it when it does not exist.
+    """
+    import docker
+
+    name = get_container_name(image, slot)
+    max_age = get_int_env('CONTAINER_MAX_AGE_HOURS', 24) * 60 * 60
+    try:
+        container = client.containers.get(name)
+        mounts = [mount['Source'] for mount in container.attrs['Mounts']]
+        if jobs_root in mounts and is_container_healthy(container, max_age):
+            return container
+        remove_container(container)
+    except docker.errors.NotFound:
+        pass
+    return start_pool_container(
+        client, image, name, jobs_root, container_options
+    )
+
+
+def try_lock_slot(lock_file):
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def acquire_pool_slot(image: str, jobs_root: str):
+    """
+    The function `acquire_pool_slot` reserves a free slot of the image pool
+    for the duration of a job. Slots are locked with `fcntl` on files inside
+    the jobs directory, so every worker process of the machine shares the same
+    pool and a container never runs two jobs at once.
+
+    :return: the reserved slot number.
+    """
+    pool_size = get_pool_size()
+    lock_dir = os.path.join(jobs_root, '.container_pool')
+    os.makedirs(lock_dir, exist_ok=True)
+    if fcntl is None:
+        yield 0
+        return
+
+    while True:
+        for slot in range(pool_size):
+            lock_path = os.path.join(
+                lock_dir, f'{get_container_name(image, slot)}.lock'
+            )
+            lock_file = open(lock_path, 'w')
+            if try_lock_slot(lock_file):
+                try:
+                    yield slot
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+                return
+            lock_file.close()
+        time.sleep(SLOT_WAIT_SECONDS)
+
+
+def run_tool_container(
+    image: str,
+    local_mount_dir: str,
+    build_command,
+    container_options: dict = None,
+):
+    """
+    The function `run_tool_container` runs a bioinformatics tool over a job
+    directory. With `CONTAINER_POOL_SIZE` set, the command is executed inside
+    an idle container of the image, skipping only the container creation,
+    start and removal: the tool is not kept resident and still starts on every
+    run. Otherwise a new container is run for the job and removed afterwards.
+
+    :param image: the tool image
+    :type image: str
+    :param local_mount_dir: the job directory on the host
+    :type local_mount_dir: str
+    :param build_command: function receiving the job directory path as seen
+    from the container working directory and returning the tool arguments
+    :param container_options: extra `containers.run` arguments, such as CPU
+    and memory limits, applied when a container is created
+    :type container_options: dict
+    :return: `None`, raising an exception when the tool fails.
+    """
+    import docker
+
+    client = docker.from_env()
+    job_dir_name = os.path.basename(local_mount_dir)
+    container_options = container_options or {}
+
+    if not get_pool_size():
+        client.containers.run(
+            image,
+            command=build_command(f'./{job_dir_name}'),
+            volumes={
+                local_mount_dir: {
+                    'bind': f'{CONTAINER_WORKDIR}/{job_dir_name}',
+                    'mode': 'rw',
+                }
+            },
+            working_dir=CONTAINER_WORKDIR,
+            remove=True,
+            **container_options,
+        )
+        return
+
+    jobs_root = os.path.dirname(local_mount_dir)
+    command = get_image_entrypoint(client, image) + build_command(
+        f'./{POOL_MOUNT_DIR}/{job_dir_name}'
+    )
+    with acquire_pool_slot(image, jobs_root) as slot:
+        container = get_pool_container(
+            client, image, slot, jobs_root, container_options
+        )
+        exit_code, output = container.exec_run(
+            command, workdir=CONTAINER_WORKDIR
+        )
+    if exit_code != 0:
+        output_tail = output.decode('utf-8', errors='replace')[-2000:]
+        raise RuntimeError(
+            f'{image} exited with status {exit_code}: {output_tail}'
+        )
@@ -1,114 +1,126 @@
+from __future__ import annotations
+
 import os
-import re
+from typing import TYPE_CHECKING
 
-import pandas as pd
-from Bio import SeqIO
 from dotenv import load_dotenv
 
 from plasticome.config.celery_config import celery_app
-from plasticome.services.plasticome_metadata_service import get_all_enzymes
+from plasticome.services.checkpoint_service import (
+    checkpointed,
+    count_kept_sequences,
+    record_reference_fingerprint,
+)
+from plasticome.services.proteome_store_service import (
+    materialize_proteome,
+    narrow_proteome,
+)
+from plasticome.services.reference_data_service import get_reference_data
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 load_dotenv(override=True)
 
 
-def get_cazy_info():
-    """
-    The function `get_cazy_info` retrieves information about enzymes and returns a
-    set of CAZy family names.
-    :return: a set of cazy_family values extracted from the database.
-    """
-    enzymes_info, error = get_all_enzymes(
-        os.getenv('PLASTICOME_USER'), os.getenv('PLASTICOME_PASSWORD')
-    )
-    if error:
-        return set()
-    return set(item['cazy_family'] for item in enzymes_info)
+CAZY_TOOLS = ['HMMER', 'eCAMI', 'DIAMOND']
+FILTERED_OVERVIEW_FILE = 'overview_filtered.txt'
 
 
-def get_ec_numbers_info():
+def get_first_match(
+    values: pd.Series,
+    separator: str,
+    reference_set: set,
+    strip_pattern: str = None,
+):
     """
-    The function `get_ec_numbers_info` retrieves information about enzymes and
-    returns a set of their EC numbers.
-    :return: a set of EC numbers.
+    The function `get_first_match` finds, for every cell of a column holding
+    several annotations joined by `separator`, the first annotation present in
+    the reference set. Only the distinct cells are checked: they are split and
+    exploded into one annotation per row, so the membership test is a single
+    vectorized `isin`, and the matches are mapped back to the column.
+
+    :param values: the column to check
+    :type values: pd.Series
+    :param separator: the annotations separator, such as `+` or `|`
+    :type separator: str
+    :param reference_set: the annotations of the plasticome metadata
+    :type reference_set: set
+    :param strip_pattern: regex removed from the cells before they are split,
+    such as the domain boundaries dbCAN appends to CAZy families
+    :type strip_pattern: str
+    :return: a series aligned with `values`, with the first matching
+    annotation or `NaN` when none matches.
     """
-    enzymes_info, error = get_all_enzymes(
-        os.getenv('PLASTICOME_USER'), os.getenv('PLASTICOME_PASSWORD')
+    import pandas as pd
+
+    cells = values.astype(str)
+    unique_cells = pd.Series(cells.unique())
+    annotations = unique_cells
+    if strip_pattern:
+        annotations = annotations.str.replace(strip_pattern, '', regex=True)
+    annotations = annotations.str.split(separator, regex=False).explode()
+    matches = annotations[annotations.isin(reference_set)]
+    matches = matches.groupby(level=0).first()
+    return cells.map(
+        pd.Series(matches.values, index=unique_cells[matches.index])
     )
-    if error:
-        return set()
-    return set(item['ec_number'] for item in enzymes_info)
-
-
-cazy_info_set = get_cazy_info()
-ec_info_set = get_ec_numbers_info()
 
 
-def check_ec_numbers(ec_numbers: str):
+def filter_overview(
+    enzymes: pd.DataFrame, cazy_families: set, ec_numbers: set
+):
     """
-    The function checks if any of the EC numbers in a given string are present in a
-    set, and returns the first matching number or False if none are found.
-
-    :param ec_numbers: The `ec_numbers` parameter is a string that contains EC
-    numbers separated by '|'
-    :type ec_numbers: str
-    :return: either True, a specific EC number, or False.
+    The function `filter_overview` keeps, for every protein of the dbCAN
+    `overview.txt`, the first CAZy family found by HMMER, then eCAMI, then
+    DIAMOND that is present in the plasticome metadata, and the first of its
+    EC numbers present there, `False` standing for no match.
+
+    :param enzymes: the dbCAN overview table
+    :type enzymes: pd.DataFrame
+    :param cazy_families: the CAZy families of the plasticome metadata
+    :type cazy_families: set
+    :param ec_numbers: the EC numbers of the plasticome metadata
+    :type ec_numbers: set
+    :return: a tuple with the filtered overview table and the list of gene
+    ids with a matching CAZy family.
     """
-    if len(ec_info_set) < 1:
-        return True
-
-    for number in str(ec_numbers).split('|'):
-        if number in ec_info_set:
-            return number
-    return False
-
-
-def check_cazy(families: str):
-    """
-    The function "check_cazy" checks if any of the families in the input string are
-    present in a set called "cazy_info_set".
-
-    :param families: A string representing a list of families. Each family is
-    separated by a "+" sign
-    :type families: str
-    :return: a boolean value. It returns True if any of the families in the input
-    string are present in the cazy_info_set, and False otherwise.
-    """
-    if len(cazy_info_set) < 1:
-        return True
-
-    for family in str(families).split('+'):
-        family = re.sub(r'\(.*\)', '', family)
-        if family in cazy_info_set:
-            return family
-    return False
-
-
-def get_first_non_false(row):
-    """
-    The function returns the first non-false value from a given row, prioritizing
-    the 'HMMER' value, then 'eCAMI', then 'DIAMOND', and returning False if all
-    values are false.
-
-    :param row: The parameter `row` is expected to be a dictionary-like object that
-    contains the keys `'HMMER'`, `'eCAMI'`, and `'DIAMOND'`. Each of these keys is
-    expected to have a corresponding value that can be evaluated as a boolean
-    (e.g., `True
-    :return: the value of the first non-false element in the row. If none of the
-    elements are non-false, it will return False.
-    """
-    if row['HMMER'] != False:
-        return row['HMMER']
-    elif row['eCAMI'] != False:
-        return row['eCAMI']
-    elif row['DIAMOND'] != False:
-        return row['DIAMOND']
-    else:
-        return False
+    enzymes = enzymes.reset_index(drop=True)
+    tools_matches = [
+        get_first_match(enzymes[tool], '+', cazy_families, r'\([^+]*\)')
+        for tool in CAZY_TOOLS
+    ]
+    plasticome_cazyme = tools_matches[0]
+    for tool_matches in tools_matches[1:]:
+        plasticome_cazyme = plasticome_cazyme.fillna(tool_matches)
+    in_db = plasticome_cazyme.notna() & (plasticome_cazyme != '')
+    gene_ids_to_keep = enzymes.loc[in_db, 'Gene ID'].tolist()
+
+    enzymes['plasticome_cazyme'] = plasticome_cazyme.astype(object).where(
+        plasticome_cazyme.notna(), False
+    )
+    ec_matches = get_first_match(enzymes['EC#'], '|', ec_numbers)
+    enzymes['EC#'] = ec_matches.astype(object).where(ec_matches.notna(), False)
+    enzymes = enzymes.drop(columns=['#ofTools', *CAZY_TOOLS])
+    return enzymes, gene_ids_to_keep
 
 
 @celery_app.task
+@checkpointed(
+    'dbcan_result_filter',
+    lambda dbcan_result: dbcan_result[0],
+    count_kept_sequences,
+)
 def dbcan_result_filter(dbcan_result: tuple):
-    absolute_dir, _ = dbcan_result
+    absolute_dir, error = dbcan_result
+    if error:
+        return False, error
+    reference_data, error = get_reference_data()
+    if error:
+        return False, f'[CAZY FILTER] plasticome metadata error: {error}'
+    record_reference_fingerprint(
+        absolute_dir, 'dbcan_result_filter', reference_data.get_fingerprint()
+    )
     dbcan_files_to_delete = [
         'diamond.out',
         'hmmer.out',
@@ -126,33 +138,23 @@ def dbcan_result_filter(dbcan_result: tuple):
                 if os.path.isfile(file_path):
                     os.remove(file_path)
 
+        import pandas as pd
+
         enzymes = pd.read_csv(
             os.path.join(absolute_dir, 'overview.txt'), sep='\t'
         )
-        enzymes[['HMMER', 'eCAMI', 'DIAMOND']] = enzymes[
-            ['HMMER', 'eCAMI', 'DIAMOND']
-        ].map(check_cazy)
-        enzymes['plasticome_cazyme'] = enzymes.apply(
-            get_first_non_false, axis=1
-        )
-        enzymes['in_db'] = enzymes['plasticome_cazyme'].apply(
-            lambda cazy: True if cazy else False
-        )
-        gene_ids_to_keep = enzymes.loc[enzymes['in_db'], 'Gene ID'].tolist()
-
-        enzymes['EC#'] = enzymes['EC#'].map(check_ec_numbers)
-
-        enzymes = enzymes.drop(
-            columns=['#ofTools', 'HMMER', 'eCAMI', 'DIAMOND', 'in_db']
+        enzymes, gene_ids_to_keep = filter_overview(
+            enzymes, reference_data.cazy_families, reference_data.ec_numbers
         )
-        enzymes.to_csv(
-            os.path.join(absolute_dir, 'overview.txt'), sep='\t', index=False
+        # dbCAN's overview.txt is left untouched, so a filter interrupted
+        # before its checkpoint is recorded can simply run again
+        filtered_overview_path = os.path.join(
+            absolute_dir, FILTERED_OVERVIEW_FILE
         )
-        fasta_sequences = SeqIO.parse(open(protein_file_path), 'fasta')
-        filtered_sequences = [
-            seq for seq in fasta_sequences if seq.id in gene_ids_to_keep
-        ]
-        SeqIO.write(filtered_sequences, open(protein_file_path, 'w'), 'fasta')
-        return protein_file_path
+        enzymes.to_csv(f'{filtered_overview_path}.tmp', sep='\t', index=False)
+        os.replace(f'{filtered_overview_path}.tmp', filtered_overview_path)
+        narrow_proteome(protein_file_path, gene_ids_to_keep)
+        materialize_proteome(protein_file_path)
+        return protein_file_path, False
     except Exception as e:
-        return f'[CAZY FILTER] error: {str(e)}'
+        return False, f'[CAZY FILTER] error: {str(e)}'
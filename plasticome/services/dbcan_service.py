@@ -1,19 +1,114 @@
 import os
-
-import docker
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from plasticome.config.celery_config import celery_app
+from plasticome.services.checkpoint_service import checkpointed
+from plasticome.services.container_pool_service import (
+    get_container_limits,
+    get_shard_count,
+    run_tool_container,
+)
+from plasticome.services.Helpers import get_int_env
+from plasticome.services.proteome_store_service import (
+    get_kept_protein_ids,
+    merge_shard_tables,
+    write_proteome_shards,
+)
+
+DBCAN_IMAGE = 'haidyi/run_dbcan:latest'
+DBCAN_OVERVIEW_FILE = 'overview.txt'
+DBCAN_OVERVIEW_COLUMNS = [
+    'Gene ID',
+    'EC#',
+    'HMMER',
+    'eCAMI',
+    'DIAMOND',
+    '#ofTools',
+]
+DBCAN_SHARDS_DIR = 'dbcan_shards'
+
+
+def build_dbcan_command(input_path: str, output_dir: str):
+    """
+    The function `build_dbcan_command` builds the run_dbcan arguments, adding
+    the DIAMOND and HMMER thread counts when `DBCAN_THREADS` is set.
+    """
+    command = [input_path, 'protein', '--out_dir', output_dir]
+    threads = get_int_env('DBCAN_THREADS', 0)
+    if threads > 0:
+        command += ['--dia_cpu', str(threads), '--hmm_cpu', str(threads)]
+    return command
+
+
+def run_dbcan_shards(absolute_mount_dir: str, shard_count: int):
+    """
+    The function `run_dbcan_shards` splits the proteome into shards of
+    balanced residue length, runs one dbCAN container per shard at the same
+    time, each limited by `DBCAN_CPUS` and `DBCAN_MEMORY`, and merges their
+    `overview.txt` into the job directory, with the proteins in proteome
+    order.
+
+    :param absolute_mount_dir: the `.faa` file of the job
+    :type absolute_mount_dir: str
+    :param shard_count: the maximum number of shards
+    :type shard_count: int
+    """
+    local_mount_dir = os.path.dirname(absolute_mount_dir)
+    shards_dir = os.path.join(local_mount_dir, DBCAN_SHARDS_DIR)
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    shard_paths = write_proteome_shards(
+        absolute_mount_dir, shard_count, shards_dir
+    )
+    shard_names = [
+        os.path.splitext(os.path.basename(shard_path))[0]
+        for shard_path in shard_paths
+    ]
+    for shard_name in shard_names:
+        os.makedirs(os.path.join(shards_dir, shard_name))
+    container_options = get_container_limits('DBCAN')
+
+    def run_shard(shard_name: str):
+        run_tool_container(
+            DBCAN_IMAGE,
+            local_mount_dir,
+            lambda docker_mount: build_dbcan_command(
+                f'{docker_mount}/{DBCAN_SHARDS_DIR}/{shard_name}.faa',
+                f'{docker_mount}/{DBCAN_SHARDS_DIR}/{shard_name}',
+            ),
+            container_options,
+        )
+
+    with ThreadPoolExecutor(max_workers=len(shard_names)) as executor:
+        list(executor.map(run_shard, shard_names))
+
+    merge_shard_tables(
+        [
+            os.path.join(shards_dir, shard_name, DBCAN_OVERVIEW_FILE)
+            for shard_name in shard_names
+        ],
+        os.path.join(local_mount_dir, DBCAN_OVERVIEW_FILE),
+        get_kept_protein_ids(absolute_mount_dir),
+        DBCAN_OVERVIEW_COLUMNS,
+    )
+    shutil.rmtree(shards_dir, ignore_errors=True)
 
 
 @celery_app.task
-def run_dbcan_container(absolute_mount_dir):
+@checkpointed(
+    'run_dbcan_container',
+    lambda download_output: os.path.dirname(download_output[0]),
+)
+def run_dbcan_container(download_output: tuple):
     """
     The function `run_dbcan_container` runs a Docker container with the dbcan
     image and parameters to analyze genome proteins, and returns the output folder path and an error message
-    if any.
+    if any. With `DBCAN_SHARDS` above one, or `auto` for one shard every
+    `DBCAN_SEQUENCES_PER_SHARD` proteins, the proteome is split among that many
+    containers running in parallel.
 
-    :param absolute_mount_dir: The absolute path of the directory where the input
-    file is located
+    :param download_output: The `download_genome` output, a tuple with the
+    absolute path of the input file and an error message, or `False`
     :return: The function `run_dbcan_container` returns a tuple containing the
     `output_folder` and a boolean value indicating whether the execution was
     successful. If the execution is successful, the boolean value is `False`. If
@@ -21,28 +116,30 @@ def run_dbcan_container(absolute_mount_dir):
     returned as a string.
     """
 
+    absolute_mount_dir, error = download_output
+    if error:
+        return False, error
+
     input_file = os.path.basename(absolute_mount_dir)
     local_mount_dir = os.path.dirname(absolute_mount_dir)
-    docker_mount = os.path.basename(local_mount_dir)
-
-    client = docker.from_env()
-
-    container_params = {
-        'image': 'haidyi/run_dbcan:latest',
-        'volumes': {
-            local_mount_dir: {'bind': f'/app/{docker_mount}', 'mode': 'rw'}
-        },
-        'working_dir': '/app',
-        'command': [
-            f'./{docker_mount}/{input_file}',
-            'protein',
-            '--out_dir',
-            f'./{docker_mount}',
-        ],
-        'remove': True,
-    }
+
     try:
-        client.containers.run(**container_params)
+        shard_count = get_shard_count(
+            'DBCAN_SHARDS',
+            len(get_kept_protein_ids(absolute_mount_dir)),
+            get_int_env('DBCAN_SEQUENCES_PER_SHARD', 2000),
+        )
+        if shard_count > 1:
+            run_dbcan_shards(absolute_mount_dir, shard_count)
+        else:
+            run_tool_container(
+                DBCAN_IMAGE,
+                local_mount_dir,
+                lambda docker_mount: build_dbcan_command(
+                    f'{docker_mount}/{input_file}', docker_mount
+                ),
+                get_container_limits('DBCAN'),
+            )
         return local_mount_dir, False
     except Exception as e:
         return False, f'[DBCAN STEP] - Unexpected error: {str(e)}'
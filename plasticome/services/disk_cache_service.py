@@ -0,0 +1,192 @@
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STAGING_PREFIX = '.staging-'
+LOCK_PREFIX = '.lock-'
+STAGING_MAX_AGE = 24 * 60 * 60
+
+
+def get_cache_root(env_var: str, default_dir: str):
+    """
+    The function `get_cache_root` resolves the root directory of an on-disk
+    cache, reading it from an environment variable and falling back to a folder
+    inside the current working directory.
+
+    :param env_var: name of the environment variable holding the cache path
+    :type env_var: str
+    :param default_dir: folder name used when the variable is not set
+    :type default_dir: str
+    :return: the absolute path of the (existing) cache root directory.
+    """
+    cache_root = os.getenv(env_var) or os.path.join(os.getcwd(), default_dir)
+    os.makedirs(cache_root, exist_ok=True)
+    return os.path.abspath(cache_root)
+
+
+def get_cache_max_bytes(env_var: str, default_mb: int):
+    """
+    The function `get_cache_max_bytes` reads a cache size limit, expressed in
+    megabytes, from an environment variable.
+
+    :return: the limit in bytes, `0` meaning the cache is unbounded.
+    """
+    try:
+        max_mb = float(os.getenv(env_var, default_mb))
+    except ValueError:
+        max_mb = default_mb
+    return int(max_mb * 1024 * 1024)
+
+
+def directory_size(path: str):
+    total = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                continue
+    return total
+
+
+def lookup_entry(cache_root: str, key: str):
+    """
+    The function `lookup_entry` looks for a published cache entry and, when it
+    exists, refreshes its modification time so the LRU eviction keeps it.
+
+    :return: the entry directory path or `None` on a cache miss.
+    """
+    entry_path = os.path.join(cache_root, key)
+    if not os.path.isdir(entry_path):
+        return None
+    try:
+        os.utime(entry_path)
+    except OSError:
+        return None
+    return entry_path
+
+
+def get_lock_path(cache_root: str, key: str):
+    return os.path.join(cache_root, f'{LOCK_PREFIX}{key}')
+
+
+@contextmanager
+def entry_lock(cache_root: str, key: str, shared: bool = False):
+    """
+    The function `entry_lock` holds an exclusive lock on a cache key while an
+    entry is built, so concurrent workers wait for it instead of building the
+    same entry twice. A `shared` lock is held instead while an entry is being
+    read, such as a BLAST database during blastp; many readers can hold it at
+    once and the eviction leaves the entry alone. On systems without `fcntl`
+    it does nothing, and the atomic publication still keeps the cache
+    consistent.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(get_lock_path(cache_root, key), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def new_staging_dir(cache_root: str):
+    """
+    The function `new_staging_dir` creates a private directory inside the cache
+    root where a new entry can be built before being published. Living on the
+    same filesystem as the cache is what makes the publication atomic.
+    """
+    staging_dir = os.path.join(
+        cache_root, f'{STAGING_PREFIX}{uuid.uuid4().hex}'
+    )
+    os.makedirs(staging_dir)
+    return staging_dir
+
+
+def publish_entry(staging_dir: str, cache_root: str, key: str):
+    """
+    The function `publish_entry` atomically renames a fully built staging
+    directory to its final cache key. If another worker published the same key
+    first, the staging copy is discarded and the existing entry is used.
+
+    :return: the path of the published entry.
+    """
+    entry_path = os.path.join(cache_root, key)
+    try:
+        os.rename(staging_dir, entry_path)
+    except OSError:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    os.utime(entry_path)
+    return entry_path
+
+
+def evict_entry(cache_root: str, key: str):
+    """
+    The function `evict_entry` removes a cache entry unless a worker holds its
+    lock, which means the entry is being read or rebuilt.
+
+    :return: `True` when the entry was removed.
+    """
+    with open(get_lock_path(cache_root, key), 'w') as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+        shutil.rmtree(os.path.join(cache_root, key), ignore_errors=True)
+    return True
+
+
+def evict_lru_entries(cache_root: str, max_bytes: int, grace_seconds=600):
+    """
+    The function `evict_lru_entries` removes the least recently used entries of
+    a cache until its total size fits the given limit. Entries used in the last
+    `grace_seconds` or locked by a worker reading them are never evicted, and
+    staging directories abandoned for a day are cleaned up as well.
+
+    :param cache_root: the cache root directory
+    :type cache_root: str
+    :param max_bytes: maximum cache size, `0` disables the eviction
+    :type max_bytes: int
+    :return: the list of evicted entry names.
+    """
+    if max_bytes <= 0:
+        return []
+
+    now = time.time()
+    entries = []
+    for name in os.listdir(cache_root):
+        entry_path = os.path.join(cache_root, name)
+        if not os.path.isdir(entry_path):
+            continue
+        try:
+            last_used = os.path.getmtime(entry_path)
+        except OSError:
+            continue
+        if name.startswith(STAGING_PREFIX):
+            if now - last_used > STAGING_MAX_AGE:
+                shutil.rmtree(entry_path, ignore_errors=True)
+            continue
+        entries.append((last_used, name, directory_size(entry_path)))
+
+    total_size = sum(size for _, _, size in entries)
+    evicted = []
+    for last_used, name, size in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        if now - last_used < grace_seconds:
+            continue
+        if not evict_entry(cache_root, name):
+            continue
+        total_size -= size
+        evicted.append(name)
+    return evicted
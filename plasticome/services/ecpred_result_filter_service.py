@@ -1,36 +1,20 @@
 import os
 
-import pandas as pd
-from Bio import SeqIO
 from dotenv import load_dotenv
 
 from plasticome.config.celery_config import celery_app
-from plasticome.services.plasticome_metadata_service import get_all_enzymes
+from plasticome.services.checkpoint_service import (
+    checkpointed,
+    count_kept_sequences,
+    record_reference_fingerprint,
+)
+from plasticome.services.proteome_store_service import narrow_proteome
+from plasticome.services.reference_data_service import get_reference_data
 
 load_dotenv(override=True)
 
 
-def get_ec_numbers_info():
-    """
-    The function `get_ec_numbers_info` retrieves information about enzymes and
-    returns a set of their EC numbers.
-    :return: a set of EC numbers.
-    """
-    enzymes_info, error = get_all_enzymes(
-        os.getenv('PLASTICOME_USER'), os.getenv('PLASTICOME_PASSWORD')
-    )
-    if error:
-        return set()
-    return set(item['ec_number'] for item in enzymes_info)
-
-
-ec_info_set = get_ec_numbers_info()
-
-
-def check_ec_numbers(ec_number: str):
-
-    if len(ec_info_set) < 1:
-        return True
+def check_ec_numbers(ec_number: str, ec_info_set: set):
 
     if ec_number in ec_info_set:
         return ec_number
@@ -38,8 +22,27 @@ def check_ec_numbers(ec_number: str):
 
 
 @celery_app.task
+@checkpointed(
+    'ecpred_result_filter',
+    lambda ec_pred_output: ec_pred_output[0],
+    count_kept_sequences,
+)
 def ecpred_result_filter(ec_pred_output: tuple):
-    absolute_result_dir, _ = ec_pred_output
+    absolute_result_dir, error = ec_pred_output
+    if error:
+        return False, False, error
+    reference_data, error = get_reference_data()
+    if error:
+        return (
+            False,
+            False,
+            f'[EC PRED FILTER] plasticome metadata error: {error}',
+        )
+    record_reference_fingerprint(
+        absolute_result_dir,
+        'ecpred_result_filter',
+        reference_data.get_fingerprint(),
+    )
 
     try:
         for filename in os.listdir(absolute_result_dir):
@@ -49,10 +52,14 @@ def ecpred_result_filter(ec_pred_output: tuple):
             if filename.endswith('.faa'):
                 protein_file_path = os.path.join(absolute_result_dir, filename)
 
+        import pandas as pd
+
         predicted_ecs = pd.read_csv(ec_pred_file_path, sep='\t')
 
         predicted_ecs['EC Number'] = predicted_ecs['EC Number'].map(
-            check_ec_numbers
+            lambda ec_number: check_ec_numbers(
+                ec_number, reference_data.ec_numbers
+            )
         )
         predicted_ecs['in_db'] = predicted_ecs['EC Number'].apply(
             lambda ec: True if ec else False
@@ -62,12 +69,9 @@ def ecpred_result_filter(ec_pred_output: tuple):
             predicted_ecs['in_db'], 'Protein ID'
         ].tolist()
 
-        gene_ids_to_keep = [gene.split()[0] for gene in gene_ids_to_keep]
-        fasta_sequences = SeqIO.parse(open(protein_file_path), 'fasta')
-        filtered_sequences = [
-            seq for seq in fasta_sequences if seq.id in gene_ids_to_keep
-        ]
-        SeqIO.write(filtered_sequences, open(protein_file_path, 'w'), 'fasta')
+        narrow_proteome(
+            protein_file_path, [gene.split()[0] for gene in gene_ids_to_keep]
+        )
         return protein_file_path, ec_pred_file_path, False
     except Exception as e:
         return False, False, f'[EC PRED FILTER] error: {str(e)}'
@@ -1,20 +1,116 @@
 import os
-
-import docker
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 from plasticome.config.celery_config import celery_app
+from plasticome.services.checkpoint_service import checkpointed
+from plasticome.services.container_pool_service import (
+    get_container_limits,
+    get_shard_count,
+    run_tool_container,
+)
+from plasticome.services.proteome_store_service import (
+    get_kept_protein_ids,
+    merge_shard_tables,
+    write_proteome_shards,
+)
+
+ECPRED_IMAGE = 'blueevee/ecpred:latest'
+ECPRED_RESULT_FILE = 'ec_pred_results.tsv'
+ECPRED_RESULT_COLUMNS = [
+    'Protein ID',
+    'EC Number',
+    'Confidence Score(max 1.0)',
+]
+ECPRED_SHARDS_DIR = 'ecpred_shards'
+ECPRED_TEMP_DIR = 'ecpred_temp'
+
+
+def build_ecpred_command(input_path: str, output_path: str, temp_path: str):
+    return ['spmap', input_path, './', temp_path, output_path]
+
+
+def create_ecpred_temp_dir(local_mount_dir: str, run_name: str):
+    """
+    The function `create_ecpred_temp_dir` creates an empty ECPred temporary
+    directory for one run inside the job directory. A pooled container is
+    shared by many jobs, so ECPred must not use a fixed path of the container
+    such as `/temp`.
+
+    :return: the directory path relative to the job directory.
+    """
+    temp_dir = os.path.join(local_mount_dir, ECPRED_TEMP_DIR, run_name)
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    return f'{ECPRED_TEMP_DIR}/{run_name}'
+
+
+def run_ecpred_shards(absolute_mount_dir: str, shard_count: int):
+    """
+    The function `run_ecpred_shards` splits the filtered proteome into shards
+    of balanced residue length, runs one ECPred container per shard at the
+    same time, each limited by `ECPRED_CPUS` and `ECPRED_MEMORY`, and merges
+    their tables into `ec_pred_results.tsv`.
+
+    :param absolute_mount_dir: the filtered `.faa` file of the job
+    :type absolute_mount_dir: str
+    :param shard_count: the maximum number of shards
+    :type shard_count: int
+    """
+    local_mount_dir = os.path.dirname(absolute_mount_dir)
+    shards_dir = os.path.join(local_mount_dir, ECPRED_SHARDS_DIR)
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    shard_paths = write_proteome_shards(
+        absolute_mount_dir, shard_count, shards_dir
+    )
+    shard_names = [
+        os.path.splitext(os.path.basename(shard_path))[0]
+        for shard_path in shard_paths
+    ]
+    container_options = get_container_limits('ECPRED')
+
+    def run_shard(shard_name: str):
+        temp_dir = create_ecpred_temp_dir(local_mount_dir, shard_name)
+        run_tool_container(
+            ECPRED_IMAGE,
+            local_mount_dir,
+            lambda docker_mount: build_ecpred_command(
+                f'{docker_mount}/{ECPRED_SHARDS_DIR}/{shard_name}.faa',
+                f'{docker_mount}/{ECPRED_SHARDS_DIR}/{shard_name}.tsv',
+                f'{docker_mount}/{temp_dir}',
+            ),
+            container_options,
+        )
+
+    with ThreadPoolExecutor(max_workers=len(shard_names)) as executor:
+        list(executor.map(run_shard, shard_names))
+
+    merge_shard_tables(
+        [
+            os.path.join(shards_dir, f'{shard_name}.tsv')
+            for shard_name in shard_names
+        ],
+        os.path.join(local_mount_dir, ECPRED_RESULT_FILE),
+        get_kept_protein_ids(absolute_mount_dir),
+        ECPRED_RESULT_COLUMNS,
+    )
+    shutil.rmtree(shards_dir, ignore_errors=True)
 
 
 @celery_app.task
-def run_ecpred_container(absolute_mount_dir):
+@checkpointed(
+    'run_ecpred_container', lambda cazy_filter: os.path.dirname(cazy_filter[0])
+)
+def run_ecpred_container(cazy_filter_result: tuple):
     """
     The function `run_ecpred_container` runs a Docker container with the image
     `blueevee/ecpred:latest` and mounts a directory to the container, then executes
     a command within the container and returns the path to the output file with the
-    ec numbers predicted to the enzymes.
+    ec numbers predicted to the enzymes. With `ECPRED_SHARDS` above one, the
+    proteins are split among that many containers running in parallel.
 
-    :param absolute_mount_dir: The absolute path of the directory where the input
-    file is located
+    :param cazy_filter_result: The `dbcan_result_filter` output, a tuple with the
+    absolute path of the filtered input file and an error message, or `False`
     :return: The function `run_ecpred_container` returns a tuple containing two
     values. The first value is `output_file_path`, which is the path to the output
     file generated by the container. The second value is a boolean `False` if the
@@ -22,29 +118,34 @@ def run_ecpred_container(absolute_mount_dir):
     exception occurs during the container execution.
     """
 
+    absolute_mount_dir, error = cazy_filter_result
+    if error:
+        return False, error
+
     input_file = os.path.basename(absolute_mount_dir)
     local_mount_dir = os.path.dirname(absolute_mount_dir)
-    docker_mount = os.path.basename(local_mount_dir)
-
-    client = docker.from_env()
-
-    container_params = {
-        'image': 'blueevee/ecpred:latest',
-        'volumes': {
-            local_mount_dir: {'bind': f'/app/{docker_mount}', 'mode': 'rw'}
-        },
-        'working_dir': '/app',
-        'command': [
-            'spmap',
-            f'./{docker_mount}/{input_file}',
-            './',
-            '/temp',
-            f'./{docker_mount}/ec_pred_results.tsv',
-        ],
-        'remove': True,
-    }
+
     try:
-        client.containers.run(**container_params)
+        shard_count = get_shard_count(
+            'ECPRED_SHARDS', len(get_kept_protein_ids(absolute_mount_dir))
+        )
+        if shard_count > 1:
+            run_ecpred_shards(absolute_mount_dir, shard_count)
+        else:
+            temp_dir = create_ecpred_temp_dir(local_mount_dir, 'proteome')
+            run_tool_container(
+                ECPRED_IMAGE,
+                local_mount_dir,
+                lambda docker_mount: build_ecpred_command(
+                    f'{docker_mount}/{input_file}',
+                    f'{docker_mount}/{ECPRED_RESULT_FILE}',
+                    f'{docker_mount}/{temp_dir}',
+                ),
+                get_container_limits('ECPRED'),
+            )
+        shutil.rmtree(
+            os.path.join(local_mount_dir, ECPRED_TEMP_DIR), ignore_errors=True
+        )
         return local_mount_dir, False
     except Exception as e:
         return False, f'[ECPRED STEP] - Unexpected error: {str(e)}'
@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 import smtplib
 from email import encoders
@@ -10,10 +11,33 @@ from email.mime.text import MIMEText
 from dotenv import load_dotenv
 
 from plasticome.config.celery_config import celery_app
+from plasticome.services.checkpoint_service import (
+    archive_job_manifest,
+    read_manifest,
+)
+from plasticome.services.genbank_service import DOWNLOAD_ERROR_PREFIX
 
 load_dotenv(override=True)
 
 
+def get_graphic_result_files(results_path: str):
+    """
+    The function `get_graphic_result_files` lists the pages of the result
+    graphic, in page order.
+    """
+    graphic_pages = {}
+    for file_name in os.listdir(results_path):
+        page = re.fullmatch(
+            r'plasticome_result(?:_(\d+))?\.(?:png|svg)', file_name
+        )
+        if page:
+            graphic_pages[file_name] = int(page.group(1) or 1)
+    return [
+        os.path.join(results_path, file_name)
+        for file_name in sorted(graphic_pages, key=graphic_pages.get)
+    ]
+
+
 @celery_app.task
 def send_email_with_results(results: tuple, user_data: dict):
 
@@ -30,18 +54,33 @@ def send_email_with_results(results: tuple, user_data: dict):
     ] = '[🍄 PLASTICOME]: Resultados da Análise de Enzimas para Degradação de Plásticos'
 
     results_path, negative_result, error = results
-    if error:
+    if error and not error.startswith(DOWNLOAD_ERROR_PREFIX):
         return False, error
 
-    body = f'Olá {user_data.get("user_name", "Usuário plasticome")},\n Seguem informações referentes à análise do fungo: {user_data.get("organism_name", "<Erro ao buscar nome do fungo>")}-{user_data.get("genbank_id", "Genbank id não disponível")}\n'
-    if negative_result:
+    organism_name = user_data.get('organism_name')
+    if not organism_name and user_data.get('job_dir'):
+        organism_name = read_manifest(user_data['job_dir']).get(
+            'organism_name'
+        )
+
+    body = f'Olá {user_data.get("user_name", "Usuário plasticome")},\n Seguem informações referentes à análise do fungo: {organism_name or "<Erro ao buscar nome do fungo>"}-{user_data.get("genbank_id", "Genbank id não disponível")}\n'
+    if error:
+        body = f'{body}\nNão foi possível baixar o proteoma deste fungo no NCBI, confira o número de acesso e envie a análise novamente.\n{error}\n\n[🍄 PLASTICOME by G2BC]'
+    elif negative_result:
         body = f'{body}\n{negative_result}\n\n[🍄 PLASTICOME by G2BC]'
     else:
-        graphic_result = os.path.join(results_path, 'plasticome_result.png')
         blast_align_result = os.path.join(results_path, 'blast_align.csv')
 
-        with open(graphic_result, 'rb') as image_file:
-            result_image = MIMEImage(image_file.read())
+        for graphic_result in get_graphic_result_files(results_path):
+            with open(graphic_result, 'rb') as image_file:
+                result_image = MIMEImage(
+                    image_file.read(),
+                    'svg+xml' if graphic_result.endswith('.svg') else None,
+                )
+            result_image.add_header(
+                'Content-Disposition',
+                f'attachment; filename="{os.path.basename(graphic_result)}"',
+            )
             msg.attach(result_image)
 
         with open(blast_align_result, 'rb') as csv_file:
@@ -79,8 +118,13 @@ def send_email_with_results(results: tuple, user_data: dict):
             smtp_sender, user_data.get('user_email', False), msg.as_string()
         )
         server.quit()
-        absolute_dir = os.path.dirname(results_path)
-        shutil.rmtree(absolute_dir)
+        absolute_dir = user_data.get('job_dir') or os.path.dirname(
+            results_path
+        )
+        archive_job_manifest(absolute_dir)
+        shutil.rmtree(absolute_dir, ignore_errors=True)
+        if error:
+            return False, error
         return True, False
     except Exception as e:
         return False, f'Erro ao enviar e-mail: {str(e)}'
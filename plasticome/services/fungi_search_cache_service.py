@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from contextlib import closing
+
+from dotenv import load_dotenv
+
+from plasticome.services.genbank_service import search_fungi_id_by_name
+from plasticome.services.Helpers import get_int_env
+
+load_dotenv(override=True)
+
+NOT_FOUND = (None, None)
+
+fungi_searches = OrderedDict()
+pending_searches = {}
+fungi_cache_metrics = Counter()
+fungi_cache_lock = threading.Lock()
+
+
+def get_fungi_cache_key(fungi_name: str):
+    return ' '.join(fungi_name.split()).casefold()
+
+
+def get_fungi_cache_path():
+    cache_path = os.getenv('FUNGI_CACHE_PATH') or os.path.join(
+        os.getcwd(), 'cache', 'fungi_searches.sqlite3'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    return cache_path
+
+
+def connect_fungi_cache(cache_path: str = None):
+    connection = sqlite3.connect(
+        cache_path or get_fungi_cache_path(), timeout=30
+    )
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS fungi_searches ('
+        'name_key TEXT PRIMARY KEY, genbank_accession TEXT, '
+        'refseq_accession TEXT, expires_at REAL NOT NULL)'
+    )
+    return connection
+
+
+def get_fungi_search_ttl(accessions: tuple):
+    """
+    The function `get_fungi_search_ttl` reads how long, in seconds, a search
+    stays cached: `FUNGI_CACHE_TTL_SECONDS`, or `FUNGI_NOT_FOUND_TTL_SECONDS`
+    when no genome was found.
+    """
+    if accessions == NOT_FOUND:
+        return get_int_env('FUNGI_NOT_FOUND_TTL_SECONDS', 60 * 60)
+    return get_int_env('FUNGI_CACHE_TTL_SECONDS', 24 * 60 * 60)
+
+
+def read_shared_fungi_search(cache_key: str, cache_path: str = None):
+    """
+    The function `read_shared_fungi_search` looks up a search in the sqlite
+    cache shared by every server process.
+
+    :param cache_key: the normalized fungi name
+    :type cache_key: str
+    :param cache_path: optional sqlite file, defaults to `FUNGI_CACHE_PATH`
+    :type cache_path: str
+    :return: a tuple with the expiration time and the accessions, or `None`
+    when the name is not cached or has expired.
+    """
+    with closing(connect_fungi_cache(cache_path)) as connection:
+        row = connection.execute(
+            'SELECT expires_at, genbank_accession, refseq_accession '
+            'FROM fungi_searches WHERE name_key = ? AND expires_at > ?',
+            (cache_key, time.time()),
+        ).fetchone()
+    return (row[0], (row[1], row[2])) if row else None
+
+
+def write_shared_fungi_search(
+    cache_key: str,
+    accessions: tuple,
+    expires_at: float,
+    cache_path: str = None,
+):
+    with closing(connect_fungi_cache(cache_path)) as connection:
+        with connection:
+            connection.execute(
+                'DELETE FROM fungi_searches WHERE expires_at <= ?',
+                (time.time(),),
+            )
+            connection.execute(
+                'INSERT OR REPLACE INTO fungi_searches (name_key, '
+                'genbank_accession, refseq_accession, expires_at) '
+                'VALUES (?, ?, ?, ?)',
+                (cache_key, *accessions, expires_at),
+            )
+
+
+def store_fungi_search(cache_key: str, accessions: tuple, expires_at: float):
+    """
+    The function `store_fungi_search` keeps the accessions found for a name in
+    the memory of this process until `expires_at`, dropping the least recently
+    used names beyond `FUNGI_CACHE_MAX_ENTRIES`. Must be called holding
+    `fungi_cache_lock`.
+    """
+    fungi_searches[cache_key] = (expires_at, accessions)
+    fungi_searches.move_to_end(cache_key)
+    max_entries = max(get_int_env('FUNGI_CACHE_MAX_ENTRIES', 1024), 1)
+    while len(fungi_searches) > max_entries:
+        fungi_searches.popitem(last=False)
+        fungi_cache_metrics['evicted'] += 1
+
+
+def search_fungi_id_cached(fungi_name: str):
+    """
+    The function `search_fungi_id_cached` answers `search_fungi_id_by_name`
+    from an in-memory LRU cache with expiration, which also remembers the
+    names without a genome. Names missing from memory are read from the sqlite
+    cache at `FUNGI_CACHE_PATH`, shared by every gunicorn worker, before
+    Entrez is queried. Concurrent searches for the same name in one process
+    wait for a single request instead of sending one each; workers do not
+    coalesce with each other. Failed requests are not cached.
+
+    :param fungi_name: the name of the fungi species
+    :type fungi_name: str
+    :return: a tuple with the GenBank and RefSeq assembly accessions, both
+    `None` when the genome was not found.
+    """
+    cache_key = get_fungi_cache_key(fungi_name)
+    with fungi_cache_lock:
+        cached_search = fungi_searches.get(cache_key)
+        if cached_search and cached_search[0] > time.time():
+            fungi_searches.move_to_end(cache_key)
+            fungi_cache_metrics[
+                'not_found_hits' if cached_search[1] == NOT_FOUND else 'hits'
+            ] += 1
+            return cached_search[1]
+        fungi_searches.pop(cache_key, None)
+
+        pending_search = pending_searches.get(cache_key)
+        waits_for_search = pending_search is not None
+        if waits_for_search:
+            fungi_cache_metrics['coalesced'] += 1
+        else:
+            pending_search = pending_searches[cache_key] = Future()
+            fungi_cache_metrics['misses'] += 1
+
+    if waits_for_search:
+        return pending_search.result()
+
+    try:
+        shared_search = read_shared_fungi_search(cache_key)
+        if shared_search:
+            expires_at, accessions = shared_search
+        else:
+            accessions = search_fungi_id_by_name(fungi_name)
+            expires_at = time.time() + get_fungi_search_ttl(accessions)
+            if expires_at > time.time():
+                write_shared_fungi_search(cache_key, accessions, expires_at)
+    except Exception as error:
+        with fungi_cache_lock:
+            pending_searches.pop(cache_key, None)
+            fungi_cache_metrics['errors'] += 1
+        pending_search.set_exception(error)
+        raise
+
+    with fungi_cache_lock:
+        if shared_search:
+            fungi_cache_metrics['shared_hits'] += 1
+        if expires_at > time.time():
+            store_fungi_search(cache_key, accessions, expires_at)
+        pending_searches.pop(cache_key, None)
+    pending_search.set_result(accessions)
+    return accessions
+
+
+def get_fungi_cache_stats():
+    """
+    The function `get_fungi_cache_stats` reports the fungi search cache
+    metrics of this server process: hits, hits of names without a genome,
+    misses, misses answered by the cache shared with the other processes,
+    searches that waited for one already running, failed searches, evictions,
+    the hit rate and how many names this process holds in memory.
+    """
+    with fungi_cache_lock:
+        metrics = dict(fungi_cache_metrics)
+        entries = len(fungi_searches)
+    hits = (
+        metrics.get('hits', 0)
+        + metrics.get('not_found_hits', 0)
+        + metrics.get('coalesced', 0)
+        + metrics.get('shared_hits', 0)
+    )
+    lookups = hits + metrics.get('misses', 0) - metrics.get('shared_hits', 0)
+    return {
+        'hits': metrics.get('hits', 0),
+        'not_found_hits': metrics.get('not_found_hits', 0),
+        'coalesced': metrics.get('coalesced', 0),
+        'misses': metrics.get('misses', 0),
+        'shared_hits': metrics.get('shared_hits', 0),
+        'errors': metrics.get('errors', 0),
+        'evicted': metrics.get('evicted', 0),
+        'hit_rate': hits / lookups if lookups else 0,
+        'entries': entries,
+    }
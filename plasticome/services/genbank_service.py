@@ -1,17 +1,37 @@
-import gzip
+import glob
 import os
-import shutil
-import urllib.request
-from ftplib import FTP
+import re
+import time
+import zlib
 from urllib.parse import urlparse
 
-from Bio import Entrez, SeqIO
+import requests
+from Bio import Entrez
 from dotenv import load_dotenv
 
+from plasticome.config.celery_config import celery_app
+from plasticome.services.checkpoint_service import (
+    checkpointed,
+    count_kept_sequences,
+    update_manifest,
+)
+from plasticome.services.genome_cache_service import (
+    get_cached_genome,
+    link_cached_genome,
+)
+from plasticome.services.Helpers import get_int_env, validate_accession
+from plasticome.services.protein_name_cache_service import (
+    read_cached_protein_names,
+    write_cached_protein_names,
+)
+from plasticome.services.proteome_store_service import create_proteome_store
+
 load_dotenv(override=True)
 
 Entrez.email = os.getenv('ENTREZ_EMAIL')
 
+DOWNLOAD_ERROR_PREFIX = '[FILE ERROR]'
+
 
 def search_fungi_id_by_name(especie: str):
     """
@@ -49,125 +69,394 @@ def search_fungi_id_by_name(especie: str):
         return None, None
 
 
-def check_ftp_file_existence(ftp_url: str, file_name: str):
+def get_https_url(ftp_url: str):
     """
-    The function `check_ftp_file_existence` checks if a file exists on an FTP
-    server given the FTP URL and file name.
-
-    :param ftp_url: The `ftp_url` parameter is a string that represents the URL of
-    the FTP server. It should follow the format
-    `ftp://<server_address>/<file_path>`, where `<server_address>` is the address
-    of the FTP server and `<file_path>` is the path to the directory where the file
-    :param file_name: The name of the file you want to check for existence on the
-    FTP server
-    :return: a boolean value indicating whether the specified file exists on the
-    FTP server.
+    The function `get_https_url` converts an NCBI FTP url to the HTTPS mirror
+    of the same path, which supports HEAD requests and byte ranges.
     """
     url_parts = urlparse(ftp_url)
-    server_address = url_parts.netloc
-    file_path = url_parts.path
-    try:
-        ftp = FTP(server_address)
-        ftp.login()
+    if url_parts.scheme == 'ftp':
+        return url_parts._replace(scheme='https').geturl()
+    return ftp_url
 
-        ftp.cwd(file_path)
-        file_list = ftp.nlst()
-        file_exists = file_name in file_list
 
-        ftp.quit()
+def probe_remote_file_size(file_url: str):
+    """
+    The function `probe_remote_file_size` checks if a remote file exists with a
+    single HEAD request, instead of opening an FTP session and listing the
+    whole assembly directory.
+
+    :param file_url: the HTTPS url of the file
+    :type file_url: str
+    :return: the file size in bytes, `0` when the server does not report it,
+    or `None` when the file does not exist.
+    """
+    response = requests.head(file_url, allow_redirects=True, timeout=30)
+    if response.status_code != 200:
+        return None
+    return int(response.headers.get('Content-Length', 0))
 
-        return file_exists
 
-    except Exception as e:
-        print(f'Error checking FTP file existence: {str(e)}')
-        return False
+def decompress_gzip_members(decompressor, data: bytes):
+    """
+    The function `decompress_gzip_members` decompresses a chunk of a gzip
+    stream that may hold several concatenated members, as a `.gz` file is
+    allowed to. When a member ends, the bytes left after it start a new
+    decompressor; zero padding between members is skipped.
+
+    :param decompressor: the `zlib` decompressor of the current member
+    :param data: the next compressed chunk
+    :type data: bytes
+    :return: a tuple with the decompressor of the current member and the
+    decompressed bytes.
+    """
+    output = []
+    while data:
+        if decompressor.eof:
+            output.append(decompressor.flush())
+            data = data.lstrip(b'\x00')
+            if not data:
+                break
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        output.append(decompressor.decompress(data))
+        data = decompressor.unused_data if decompressor.eof else b''
+    return decompressor, b''.join(output)
+
+
+def stream_gzip_to_file(
+    file_url: str, output_path: str, expected_size=0, max_retries=5
+):
+    """
+    The function `stream_gzip_to_file` downloads a gzip file and decompresses
+    it on the fly, so the compressed copy never touches the disk. When the
+    connection drops, the download is resumed with an HTTP range request from
+    the last byte received, feeding the same decompressor. Every member of
+    a multi-member gzip file is decompressed. The output is written to a
+    `.part` file and renamed only when complete.
+
+    :param file_url: the HTTPS url of the `.gz` file
+    :type file_url: str
+    :param output_path: where the decompressed content is written
+    :type output_path: str
+    :param expected_size: compressed size reported by the server, used to
+    check the download is complete
+    :type expected_size: int
+    :param max_retries: how many times an interrupted download is resumed
+    :type max_retries: int
+    :return: the output path.
+    """
+    partial_path = f'{output_path}.part'
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = 0
+    retries = 0
+
+    with open(partial_path, 'wb') as output_file:
+        while not decompressor.eof:
+            headers = {'Range': f'bytes={received}-'} if received else {}
+            try:
+                with requests.get(
+                    file_url, headers=headers, stream=True, timeout=60
+                ) as response:
+                    response.raise_for_status()
+                    if received and response.status_code != 206:
+                        raise ValueError(
+                            f'Server does not support resuming {file_url}'
+                        )
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        received += len(chunk)
+                        decompressor, output = decompress_gzip_members(
+                            decompressor, chunk
+                        )
+                        output_file.write(output)
+                if not decompressor.eof:
+                    raise requests.ConnectionError(
+                        f'Incomplete download of {file_url}'
+                    )
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ) as error:
+                retries += 1
+                if retries > max_retries:
+                    os.remove(partial_path)
+                    raise error
+                time.sleep(min(2**retries, 30))
+        output_file.write(decompressor.flush())
+
+    if expected_size and received != expected_size:
+        os.remove(partial_path)
+        raise ValueError(
+            f'Downloaded {received} of {expected_size} bytes from {file_url}'
+        )
+    os.replace(partial_path, output_path)
+    return output_path
 
 
-def download_fasta_sequence_by_id(acession_number: str):
+def get_job_dir(acession_number: str, job_id: str):
     """
-    The function `download_fasta_sequence_by_id` downloads a FASTA sequence file
-    from an FTP server using an accession number and returns the file path,
-    organism name, and any errors encountered.
+    The function `get_job_dir` returns the scratch directory of an analysis,
+    which is removed once its result is sent.
+    """
+    if not validate_accession(acession_number):
+        raise ValueError(f'invalid assembly accession: {acession_number}')
+    return os.path.join(
+        os.getcwd(), 'temp_genomes', f'results_{acession_number}_{job_id}'
+    )
 
-    :param acession_number: The `acession_number` parameter is a string that
-    represents the accession number of a genome assembly. It is used to search for
-    and download the FASTA sequence file for that specific assembly
-    :return: The function `download_fasta_sequence_by_id` returns three values:
-    1. `fasta_output_path`: The path to the downloaded FASTA file.
-    2. `full_organism_name`: The full name of the organism associated with the
-    accession number.
-    3. `False`: A boolean value indicating whether the download was successful or
-    not.
+
+def find_job_dir(job_id: str):
     """
-    try:
-        temp_genomes_path = os.path.join(
-            os.getcwd(), 'temp_genomes', f'results_{acession_number}'
-        )
+    The function `find_job_dir` finds the scratch directory of an analysis
+    from its job identifier.
+
+    :return: the job directory path, or `None` when it does not exist.
+    """
+    if not re.fullmatch(r'[0-9a-f]+', str(job_id)):
+        return None
+    job_dirs = glob.glob(
+        os.path.join(os.getcwd(), 'temp_genomes', f'results_*_{job_id}')
+    )
+    return job_dirs[0] if job_dirs else None
 
-        if not os.path.exists(temp_genomes_path):
-            os.makedirs(temp_genomes_path)
 
-        handle = Entrez.esearch(
-            db='assembly',
-            term=f'{acession_number}[Assembly Accession]',
-            retmax=1,
+def download_proteome(fasta_url: str, output_path: str):
+    """
+    The function `download_proteome` checks that an assembly protein FASTA
+    exists on the NCBI server and streams it, decompressed, to `output_path`.
+    """
+    fasta_url = get_https_url(fasta_url)
+    fasta_size = probe_remote_file_size(fasta_url)
+    if fasta_size is None:
+        raise ValueError(
+            f'File {os.path.basename(fasta_url)} not found on the NCBI server.'
         )
+    return stream_gzip_to_file(fasta_url, output_path, fasta_size)
 
-        record = Entrez.read(handle)
-        handle.close()
-        if not record['IdList']:
-            raise ValueError(
-                'Assembly not found for the given accession number.'
-            )
 
-        assembly_id = record['IdList'][0]
+def fetch_proteome(acession_number: str, job_dir: str):
+    """
+    The function `fetch_proteome` resolves an assembly accession on NCBI and
+    places its proteome in the job directory, downloading it only when it is
+    not in the shared genome cache yet.
+
+    :param acession_number: the genome assembly accession
+    :type acession_number: str
+    :param job_dir: the job scratch directory
+    :type job_dir: str
+    :return: a tuple with the `.faa` path and the organism name. A
+    `ValueError` is raised when the assembly or its files do not exist, and
+    other exceptions for failures that may succeed on a new attempt.
+    """
+    os.makedirs(job_dir, exist_ok=True)
 
-        handle = Entrez.esummary(db='assembly', id=assembly_id)
-        record = Entrez.read(handle)
-        handle.close()
+    handle = Entrez.esearch(
+        db='assembly',
+        term=f'{acession_number}[Assembly Accession]',
+        retmax=1,
+    )
+
+    record = Entrez.read(handle)
+    handle.close()
+    if not record['IdList']:
+        raise ValueError('Assembly not found for the given accession number.')
+
+    assembly_id = record['IdList'][0]
+
+    handle = Entrez.esummary(db='assembly', id=assembly_id)
+    record = Entrez.read(handle)
+    handle.close()
 
-        full_organism_name = record['DocumentSummarySet']['DocumentSummary'][
-            0
-        ]['SpeciesName']
+    full_organism_name = record['DocumentSummarySet']['DocumentSummary'][0][
+        'SpeciesName'
+    ]
 
+    ftp_url = record['DocumentSummarySet']['DocumentSummary'][0].get(
+        'FtpPath_RefSeq'
+    )
+    if not ftp_url:
         ftp_url = record['DocumentSummarySet']['DocumentSummary'][0].get(
-            'FtpPath_RefSeq'
+            'FtpPath_GenBank'
         )
         if not ftp_url:
-            ftp_url = record['DocumentSummarySet']['DocumentSummary'][0].get(
-                'FtpPath_GenBank'
+            raise ValueError(
+                'No FTP path found for the given accession number.'
             )
-            if not ftp_url:
-                raise ValueError(
-                    'No FTP path found for the given accession number.'
-                )
 
-        fasta_file = ftp_url.split('/')[-1] + '_protein.faa.gz'
-        fasta_url = ftp_url + '/' + fasta_file
+    fasta_file = ftp_url.split('/')[-1] + '_protein.faa.gz'
+    fasta_url = ftp_url + '/' + fasta_file
+
+    fasta_output_path = os.path.join(job_dir, f'{acession_number}.faa')
+    cache_entry = get_cached_genome(
+        ftp_url.split('/')[-1],
+        lambda store_path: download_proteome(fasta_url, store_path),
+        {
+            'accession': acession_number,
+            'organism_name': full_organism_name,
+            'fasta_url': fasta_url,
+        },
+    )
+    link_cached_genome(cache_entry, fasta_output_path)
+    create_proteome_store(fasta_output_path)
+    return fasta_output_path, full_organism_name
 
-        if not check_ftp_file_existence(ftp_url=ftp_url, file_name=fasta_file):
-            raise ValueError(f'File {fasta_file} not found on the FTP server.')
 
-        fasta_folder_path = os.path.join(
-            temp_genomes_path, f'{acession_number}.fasta.gz'
-        )
+def download_fasta_sequence_by_id(
+    acession_number: str, job_dir: str, max_attempts: int = 3
+):
+    """
+    The function `download_fasta_sequence_by_id` downloads a FASTA sequence file
+    from an FTP server using an accession number and returns the file path,
+    organism name, and any errors encountered. Failures other than a missing
+    assembly are retried with exponential backoff.
 
-        if not os.path.exists(fasta_folder_path):
-            urllib.request.urlretrieve(fasta_url, fasta_folder_path)
+    :param acession_number: The `acession_number` parameter is a string that
+    represents the accession number of a genome assembly. It is used to search for
+    and download the FASTA sequence file for that specific assembly
+    :param job_dir: the job scratch directory. The proteome itself comes from
+    the shared genome cache and is only downloaded on a cache miss.
+    :param max_attempts: how many times a transient failure is tried, at least
+    once
+    :return: The function `download_fasta_sequence_by_id` returns three values:
+    1. `fasta_output_path`: The path to the downloaded FASTA file.
+    2. `full_organism_name`: The full name of the organism associated with the
+    accession number.
+    3. `False`: A boolean value indicating whether the download was successful or
+    not.
+    """
+    max_attempts = max(max_attempts, 1)
+    for attempt in range(1, max_attempts + 1):
+        try:
+            fasta_output_path, full_organism_name = fetch_proteome(
+                acession_number, job_dir
+            )
+            return fasta_output_path, full_organism_name, False
+        except ValueError as error:
+            return False, False, str(error)
+        except Exception as error:
+            if attempt == max_attempts:
+                return False, False, str(error)
+            time.sleep(2**attempt)
+
+
+@celery_app.task
+@checkpointed('download_genome', lambda job_dir: job_dir, count_kept_sequences)
+def download_genome(job_dir: str, acession_number: str):
+    """
+    The function `download_genome` is the first stage of the analysis: it
+    fetches the proteome of the assembly into the job directory and records
+    the organism name in the job manifest for the result email.
+
+    :param job_dir: the job scratch directory
+    :type job_dir: str
+    :param acession_number: the genome assembly accession
+    :type acession_number: str
+    :return: a tuple with the `.faa` path and an error message, `False` when
+    the download succeeded. The error starts with `DOWNLOAD_ERROR_PREFIX`, so
+    the email stage can tell the user that the genome could not be fetched.
+    """
+    (
+        fasta_output_path,
+        full_organism_name,
+        error,
+    ) = download_fasta_sequence_by_id(
+        acession_number,
+        job_dir,
+        get_int_env('DOWNLOAD_MAX_ATTEMPTS', 3),
+    )
+    if error:
+        return False, f'{DOWNLOAD_ERROR_PREFIX}: {error}'
+    update_manifest(
+        job_dir,
+        lambda manifest: manifest.update(organism_name=full_organism_name),
+    )
+    return fasta_output_path, False
 
-        fasta_output_path = os.path.join(
-            temp_genomes_path, f'{acession_number}.faa'
-        )
 
-        with gzip.open(fasta_folder_path, 'rb') as f_in:
-            with open(fasta_output_path, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
+def get_docsum_accessions(docsum: dict):
+    """
+    The function `get_docsum_accessions` lists the identifiers a protein
+    document summary can be matched by: its accession (`Caption`), the
+    versioned accession and the gi number.
+    """
+    accessions = {str(docsum.get('Caption', '')), str(docsum.get('Id', ''))}
+    accessions.update(str(docsum.get('AccessionVersion', '')).split('|'))
+    accessions.update(str(docsum.get('Extra', '')).split('|'))
+    accessions.discard('')
+    return accessions
 
 
-        return fasta_output_path, full_organism_name, False
+def fetch_protein_names(genbank_ids: list, entrez=Entrez, batch_size=200):
+    """
+    The function `fetch_protein_names` resolves protein names from NCBI with
+    batched `esummary` calls, which only return the document summaries instead
+    of the full GenBank records.
+
+    :param genbank_ids: unique GenBank protein ids to resolve
+    :type genbank_ids: list
+    :param entrez: the Entrez module, or a stand-in with the same `esummary`
+    and `read` functions
+    :param batch_size: how many ids are sent in each request
+    :type batch_size: int
+    :return: a dictionary with the resolved ids and their names. Ids unknown
+    to NCBI are left out; a batch rejected because of an invalid id is split
+    until the invalid id is isolated.
+    """
+    protein_names = {}
+    for start in range(0, len(genbank_ids), batch_size):
+        batch = genbank_ids[start : start + batch_size]
+        handle = entrez.esummary(db='protein', id=','.join(batch))
+        try:
+            docsums = entrez.read(handle)
+        except RuntimeError:
+            if len(batch) > 1:
+                protein_names.update(
+                    fetch_protein_names(batch, entrez, len(batch) // 2)
+                )
+            continue
+        finally:
+            handle.close()
+
+        titles = {}
+        for docsum in docsums:
+            for accession in get_docsum_accessions(docsum):
+                titles[accession] = str(docsum['Title'])
+        for genbank_id in batch:
+            title = titles.get(genbank_id) or titles.get(
+                genbank_id.split('.')[0]
+            )
+            if title:
+                protein_names[genbank_id] = title
+    return protein_names
+
+
+def get_protein_names(genbank_ids, entrez=Entrez, cache_path: str = None):
+    """
+    The function `get_protein_names` retrieves the protein names of many
+    GenBank IDs at once. Repeated ids are resolved once, names still inside the
+    local cache TTL are not requested again, and the remaining ones are fetched
+    in batches and stored in the cache.
+
+    :param genbank_ids: an iterable with GenBank protein ids, possibly repeated
+    :param entrez: the Entrez module, or a stand-in with the same `esummary`
+    and `read` functions
+    :param cache_path: optional sqlite cache file, defaults to
+    `PROTEIN_NAME_CACHE_PATH`
+    :type cache_path: str
+    :return: a dictionary with the resolved ids and their protein names.
+    """
+    unique_ids = list(dict.fromkeys(str(gene_id) for gene_id in genbank_ids))
+    protein_names = read_cached_protein_names(unique_ids, cache_path)
+
+    missing_ids = [
+        gene_id for gene_id in unique_ids if gene_id not in protein_names
+    ]
+    if missing_ids:
+        fetched_names = fetch_protein_names(missing_ids, entrez)
+        write_cached_protein_names(fetched_names, cache_path)
+        protein_names.update(fetched_names)
+    return protein_names
 
-    except Exception as error:
-        return False, False, str(error)
 
 def get_protein_name(genbank_id: str):
     """
@@ -178,11 +467,4 @@ def get_protein_name(genbank_id: str):
     :type genbank_id: str
     :return: the protein name associated with the given GenBank ID.
     """
-
-    handle = Entrez.efetch(
-        db='protein', id=genbank_id, rettype='gb', retmode='text'
-    )
-    record = SeqIO.read(handle, 'genbank')
-    handle.close()
-    protein_name = record.description
-    return protein_name
+    return get_protein_names([genbank_id]).get(genbank_id, '')
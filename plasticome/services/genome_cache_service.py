@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import time
+
+from plasticome.services.disk_cache_service import (
+    entry_lock,
+    evict_lru_entries,
+    get_cache_max_bytes,
+    get_cache_root,
+    lookup_entry,
+    new_staging_dir,
+    publish_entry,
+)
+from plasticome.services.proteome_store_service import (
+    build_proteome_index,
+    get_store_paths,
+)
+
+GENOME_STORE_FILE = 'proteome.fasta'
+GENOME_INDEX_FILE = 'proteome.idx'
+GENOME_METADATA_FILE = 'metadata.json'
+
+
+def get_cached_genome(assembly_name: str, download_proteome, metadata: dict):
+    """
+    The function `get_cached_genome` returns the shared cache entry of an
+    assembly proteome, downloading it only on a cache miss. The cache is keyed
+    by the NCBI assembly name (`<accession>.<version>_<name>`), so a new
+    assembly version is a new entry. Workers missing the same assembly wait on
+    a lock instead of downloading it twice, and the least recently used
+    assemblies are evicted past `GENOME_CACHE_MAX_MB`.
+
+    :param assembly_name: the NCBI assembly name, last part of its FTP path
+    :type assembly_name: str
+    :param download_proteome: function receiving the path where the
+    decompressed proteome FASTA must be written
+    :param metadata: information stored along the proteome, such as the
+    organism name
+    :type metadata: dict
+    :return: the cache entry directory path.
+    """
+    cache_root = get_cache_root('GENOME_CACHE_DIR', 'genome_cache')
+    cache_entry = lookup_entry(cache_root, assembly_name)
+    if cache_entry:
+        return cache_entry
+
+    with entry_lock(cache_root, assembly_name):
+        cache_entry = lookup_entry(cache_root, assembly_name)
+        if cache_entry:
+            return cache_entry
+
+        staging_dir = new_staging_dir(cache_root)
+        try:
+            store_path = os.path.join(staging_dir, GENOME_STORE_FILE)
+            download_proteome(store_path)
+            build_proteome_index(
+                store_path, os.path.join(staging_dir, GENOME_INDEX_FILE)
+            )
+            with open(
+                os.path.join(staging_dir, GENOME_METADATA_FILE), 'w'
+            ) as metadata_file:
+                json.dump(
+                    {**metadata, 'cached_at': time.time()}, metadata_file
+                )
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        cache_entry = publish_entry(staging_dir, cache_root, assembly_name)
+
+    evict_lru_entries(
+        cache_root, get_cache_max_bytes('GENOME_CACHE_MAX_MB', 10240)
+    )
+    return cache_entry
+
+
+def read_cached_genome_metadata(cache_entry: str):
+    with open(os.path.join(cache_entry, GENOME_METADATA_FILE)) as metadata:
+        return json.load(metadata)
+
+
+def link_cached_genome(cache_entry: str, protein_file_path: str):
+    """
+    The function `link_cached_genome` exposes a cached proteome as the store
+    of a job scratch directory. Files are hard linked when possible, so an
+    eviction never removes the files a running job uses, and copied otherwise.
+    The job never writes to them, since the proteome store views are always
+    written to new files.
+
+    :param cache_entry: the genome cache entry
+    :type cache_entry: str
+    :param protein_file_path: the job `.faa` file
+    :type protein_file_path: str
+    :return: the job store path.
+    """
+    store_path, index_path, _ = get_store_paths(protein_file_path)
+    for cached_file, job_file in (
+        (GENOME_STORE_FILE, store_path),
+        (GENOME_INDEX_FILE, index_path),
+    ):
+        if os.path.exists(job_file):
+            os.remove(job_file)
+        try:
+            os.link(os.path.join(cache_entry, cached_file), job_file)
+        except OSError:
+            shutil.copyfile(os.path.join(cache_entry, cached_file), job_file)
+    return store_path
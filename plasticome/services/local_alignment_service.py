@@ -0,0 +1,243 @@
+import math
+import threading
+from functools import lru_cache
+
+import numpy as np
+from Bio.Align import substitution_matrices
+
+from plasticome.services.Helpers import get_int_env
+
+GAP_OPEN = 11
+GAP_EXTEND = 1
+BLOSUM62_LAMBDA = 0.267
+BLOSUM62_K = 0.041
+MAX_EVALUE = 10
+# H, E and F plus the substitution profile take 16 bytes per cell, so an
+# alignment at the limit holds about 64 MB
+MAX_MATRIX_CELLS = 4_000_000
+
+
+@lru_cache(maxsize=1)
+def get_blosum62_table():
+    """
+    The function `get_blosum62_table` loads the BLOSUM62 matrix as a numpy
+    array, together with a lookup table that encodes ASCII residues as matrix
+    indexes. Unknown residues are scored as `X`.
+
+    :return: a tuple with the residue codes table and the score matrix.
+    """
+    blosum62 = substitution_matrices.load('BLOSUM62')
+    alphabet = blosum62.alphabet
+    residue_codes = np.full(256, alphabet.index('X'), dtype=np.intp)
+    for index, residue in enumerate(alphabet):
+        residue_codes[ord(residue)] = index
+        residue_codes[ord(residue.lower())] = index
+    return residue_codes, np.array(blosum62, dtype=np.int32)
+
+
+@lru_cache(maxsize=1)
+def get_alignment_slots():
+    """
+    The function `get_alignment_slots` bounds how many in-process alignments
+    of a worker hold their score matrices at the same time, independently of
+    the `BLAST_MAX_WORKERS` threads, with `LOCAL_ALIGNMENT_MAX_PARALLEL`
+    (default 2).
+    """
+    return threading.BoundedSemaphore(
+        max(get_int_env('LOCAL_ALIGNMENT_MAX_PARALLEL', 2), 1)
+    )
+
+
+def encode_sequence(sequence: str):
+    residue_codes, _ = get_blosum62_table()
+    raw_sequence = np.frombuffer(
+        str(sequence).encode('ascii', 'replace'), dtype=np.uint8
+    )
+    return residue_codes[raw_sequence]
+
+
+def fill_score_matrices(query: str, subject: str):
+    """
+    The function `fill_score_matrices` fills the Smith-Waterman matrices with
+    affine gaps (Gotoh), vectorizing each query row with numpy. Vertical gaps
+    only depend on the previous row, and horizontal gaps are solved for the whole
+    row at once with a running maximum, which is exact because opening a gap
+    never costs less than extending one.
+
+    :return: a tuple with the `H` (best score), `E` (gap in the query) and `F`
+    (gap in the subject) matrices and the substitution profile.
+    """
+    _, scores = get_blosum62_table()
+    encoded_query = encode_sequence(query)
+    encoded_subject = encode_sequence(subject)
+    rows, columns = len(encoded_query), len(encoded_subject)
+
+    profile = scores[encoded_query][:, encoded_subject]
+    first_gap = GAP_OPEN + GAP_EXTEND
+    gap_steps = GAP_EXTEND * np.arange(columns, dtype=np.int32)
+    empty_column = np.zeros(1, dtype=np.int32)
+
+    h_matrix = np.zeros((rows + 1, columns + 1), dtype=np.int32)
+    e_matrix = np.full((rows + 1, columns + 1), -first_gap, dtype=np.int32)
+    f_matrix = np.full((rows + 1, columns + 1), -first_gap, dtype=np.int32)
+
+    for row in range(1, rows + 1):
+        previous_row = h_matrix[row - 1]
+        f_matrix[row, 1:] = np.maximum(
+            previous_row[1:] - first_gap, f_matrix[row - 1, 1:] - GAP_EXTEND
+        )
+        partial_row = np.maximum(
+            np.maximum(previous_row[:-1] + profile[row - 1], 0),
+            f_matrix[row, 1:],
+        )
+        gap_origins = np.concatenate((empty_column, partial_row[:-1]))
+        e_matrix[row, 1:] = (
+            np.maximum.accumulate(gap_origins + gap_steps)
+            - first_gap
+            - gap_steps
+        )
+        h_matrix[row, 1:] = np.maximum(partial_row, e_matrix[row, 1:])
+
+    return h_matrix, e_matrix, f_matrix, profile
+
+
+def smith_waterman(query: str, subject: str):
+    """
+    The function `smith_waterman` computes the best local alignment between two
+    protein sequences with BLOSUM62 and BLAST default gap costs (existence 11,
+    extension 1), and traces it back to get the same statistics blastp reports
+    in its tabular output.
+
+    :param query: the query protein sequence
+    :type query: str
+    :param subject: the reference protein sequence
+    :type subject: str
+    :return: a dictionary with the raw score, alignment length, identities,
+    mismatches, gap opens and the 1-based alignment coordinates, or `None` when
+    the sequences have no positive scoring local alignment.
+    """
+    h_matrix, e_matrix, f_matrix, profile = fill_score_matrices(query, subject)
+    row, column = np.unravel_index(np.argmax(h_matrix), h_matrix.shape)
+    score = int(h_matrix[row, column])
+    if score <= 0:
+        return None
+
+    query, subject = str(query).upper(), str(subject).upper()
+    first_gap = GAP_OPEN + GAP_EXTEND
+    query_end, subject_end = int(row), int(column)
+    length = identities = mismatches = gap_opens = 0
+    state = 'H'
+    while row > 0 and column > 0:
+        if state == 'H':
+            if h_matrix[row, column] == 0:
+                break
+            if (
+                h_matrix[row, column]
+                == h_matrix[row - 1, column - 1] + profile[row - 1, column - 1]
+            ):
+                if query[row - 1] == subject[column - 1]:
+                    identities += 1
+                else:
+                    mismatches += 1
+                length += 1
+                row, column = row - 1, column - 1
+                continue
+            state = (
+                'F' if h_matrix[row, column] == f_matrix[row, column] else 'E'
+            )
+            gap_opens += 1
+        elif state == 'F':
+            length += 1
+            if f_matrix[row, column] == h_matrix[row - 1, column] - first_gap:
+                state = 'H'
+            row -= 1
+        else:
+            length += 1
+            if e_matrix[row, column] == h_matrix[row, column - 1] - first_gap:
+                state = 'H'
+            column -= 1
+
+    return {
+        'score': score,
+        'length': length,
+        'identities': identities,
+        'mismatches': mismatches,
+        'gap_opens': gap_opens,
+        'query_start': int(row) + 1,
+        'query_end': query_end,
+        'subject_start': int(column) + 1,
+        'subject_end': subject_end,
+    }
+
+
+def get_bit_score(raw_score: int):
+    return (BLOSUM62_LAMBDA * raw_score - math.log(BLOSUM62_K)) / math.log(2)
+
+
+def get_evalue(raw_score: int, query_length: int, database_length: int):
+    return (
+        BLOSUM62_K
+        * query_length
+        * database_length
+        * math.exp(-BLOSUM62_LAMBDA * raw_score)
+    )
+
+
+def fits_local_alignment(queries: list, references: list):
+    """
+    The function `fits_local_alignment` checks that every query and reference
+    pair fits the memory budget of the in-process score matrices.
+    """
+    longest_query = max((len(sequence) for _, sequence in queries), default=0)
+    longest_reference = max(
+        (len(sequence) for _, sequence in references), default=0
+    )
+    return longest_query * longest_reference <= MAX_MATRIX_CELLS
+
+
+def align_against_references(queries: list, references: list):
+    """
+    The function `align_against_references` aligns every query protein against
+    a small reference set in-process, as a substitute for `makeblastdb` and
+    `blastp` when the reference set has only a handful of enzymes.
+
+    :param queries: list of `(protein_id, sequence)` tuples
+    :type queries: list
+    :param references: list of `(reference_id, sequence)` tuples
+    :type references: list
+    :return: a list of rows with the same twelve fields, in the same order, as
+    the blastp tabular output (`outfmt 10`). Hits with an e-value above the
+    blastp default threshold are discarded.
+    """
+    database_length = sum(len(sequence) for _, sequence in references)
+    hits = []
+    for query_id, query_sequence in queries:
+        for reference_id, reference_sequence in references:
+            with get_alignment_slots():
+                alignment = smith_waterman(query_sequence, reference_sequence)
+            if not alignment:
+                continue
+            evalue = get_evalue(
+                alignment['score'], len(query_sequence), database_length
+            )
+            if evalue > MAX_EVALUE:
+                continue
+            hits.append(
+                [
+                    query_id,
+                    reference_id,
+                    round(
+                        100 * alignment['identities'] / alignment['length'], 3
+                    ),
+                    alignment['length'],
+                    alignment['mismatches'],
+                    alignment['gap_opens'],
+                    alignment['query_start'],
+                    alignment['query_end'],
+                    alignment['subject_start'],
+                    alignment['subject_end'],
+                    float(f'{evalue:.2e}'),
+                    round(get_bit_score(alignment['score']), 1),
+                ]
+            )
+    return hits
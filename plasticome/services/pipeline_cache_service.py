@@ -0,0 +1,235 @@
+import json
+import os
+import shutil
+
+from dotenv import load_dotenv
+
+from plasticome.config.celery_config import celery_app
+from plasticome.services.checkpoint_service import (
+    get_reference_fingerprint,
+    read_manifest,
+)
+from plasticome.services.disk_cache_service import (
+    entry_lock,
+    evict_lru_entries,
+    get_cache_max_bytes,
+    get_cache_root,
+    lookup_entry,
+    new_staging_dir,
+    publish_entry,
+)
+from plasticome.services.Helpers import validate_accession
+from plasticome.services.reference_data_service import get_reference_data
+
+load_dotenv(override=True)
+
+CACHED_RESULT_FILE = 'result.json'
+CACHED_INTERMEDIATE_FILES = ['overview_filtered.txt', 'ec_pred_results.tsv']
+METRICS_FILE = 'metrics.json'
+
+
+def get_pipeline_cache_root():
+    return get_cache_root('PIPELINE_CACHE_DIR', 'pipeline_cache')
+
+
+def get_metadata_fingerprint():
+    """
+    The function `get_metadata_fingerprint` hashes the plasticome metadata
+    snapshot the analysis depends on: every enzyme (CAZy family, EC number and
+    reference sequence) and every plastic relation.
+
+    :return: a short hexadecimal digest, or `None` when the metadata could not
+    be read, in which case the result cache must not be used.
+    """
+    reference_data, error = get_reference_data()
+    if error:
+        return None
+    return reference_data.get_fingerprint()
+
+
+def get_pipeline_cache_key(accession: str, fingerprint: str):
+    if not validate_accession(accession):
+        raise ValueError(f'invalid assembly accession: {accession}')
+    return f'{accession}_{fingerprint}'
+
+
+def record_cache_metric(metric: str, amount=1):
+    cache_root = get_pipeline_cache_root()
+    with entry_lock(cache_root, METRICS_FILE):
+        metrics = read_cache_metrics()
+        metrics[metric] = metrics.get(metric, 0) + amount
+        metrics_path = os.path.join(cache_root, METRICS_FILE)
+        with open(f'{metrics_path}.tmp', 'w') as metrics_file:
+            json.dump(metrics, metrics_file)
+        os.replace(f'{metrics_path}.tmp', metrics_path)
+
+
+def read_cache_metrics():
+    metrics_path = os.path.join(get_pipeline_cache_root(), METRICS_FILE)
+    if not os.path.exists(metrics_path):
+        return {}
+    with open(metrics_path) as metrics_file:
+        return json.load(metrics_file)
+
+
+def get_cache_stats():
+    """
+    The function `get_cache_stats` reports the pipeline result cache metrics:
+    hits, misses, stored and invalidated results, the hit rate and how many
+    results are cached right now.
+    """
+    metrics = read_cache_metrics()
+    lookups = metrics.get('hits', 0) + metrics.get('misses', 0)
+    cache_root = get_pipeline_cache_root()
+    return {
+        'hits': metrics.get('hits', 0),
+        'misses': metrics.get('misses', 0),
+        'stored': metrics.get('stored', 0),
+        'invalidated': metrics.get('invalidated', 0),
+        'hit_rate': metrics.get('hits', 0) / lookups if lookups else 0,
+        'entries': sum(
+            os.path.isdir(os.path.join(cache_root, name))
+            and not name.startswith('.')
+            for name in os.listdir(cache_root)
+        ),
+    }
+
+
+def lookup_pipeline_result(cache_key: str):
+    """
+    The function `lookup_pipeline_result` looks for the result of a previous
+    analysis of the same genome against the same metadata snapshot, counting
+    the lookup as a hit or a miss.
+
+    :return: the cache entry path or `None`.
+    """
+    cache_entry = lookup_entry(get_pipeline_cache_root(), cache_key)
+    record_cache_metric('hits' if cache_entry else 'misses')
+    return cache_entry
+
+
+def read_cached_organism_name(cache_entry: str):
+    with open(os.path.join(cache_entry, CACHED_RESULT_FILE)) as result_file:
+        return json.load(result_file).get('organism_name')
+
+
+def invalidate_pipeline_results(accession: str = None):
+    """
+    The function `invalidate_pipeline_results` removes the cached results of
+    an assembly accession, for every metadata snapshot, or the whole cache when
+    no accession is given.
+
+    :return: the number of removed results.
+    """
+    if accession and not validate_accession(accession):
+        raise ValueError(f'invalid assembly accession: {accession}')
+    cache_root = get_pipeline_cache_root()
+    removed = 0
+    for name in os.listdir(cache_root):
+        entry_path = os.path.join(cache_root, name)
+        if name.startswith('.') or not os.path.isdir(entry_path):
+            continue
+        if accession and name.rsplit('_', 1)[0] != accession:
+            continue
+        shutil.rmtree(entry_path, ignore_errors=True)
+        removed += 1
+    if removed:
+        record_cache_metric('invalidated', removed)
+    return removed
+
+
+@celery_app.task
+def store_pipeline_result(
+    results: tuple, cache_key: str, job_dir: str, organism_name: str = None
+):
+    """
+    The function `store_pipeline_result` saves the final analysis result, the
+    figure and similarity table or the negative result message, together with
+    the dbCAN and ECPred tables, under the cache key. Failed analyses are not
+    cached, and neither are analyses whose reference stages did not all read
+    the metadata snapshot the cache key was computed from. The results are
+    passed on unchanged to the next task.
+
+    :param results: the `create_result` output
+    :type results: tuple
+    :param cache_key: the key from `get_pipeline_cache_key`
+    :type cache_key: str
+    :param job_dir: the job scratch directory
+    :type job_dir: str
+    :param organism_name: the fungus name, used when a cached result is sent,
+    read from the job manifest when not given
+    :type organism_name: str
+    :return: the same `results` tuple.
+    """
+    final_result_dir, negative_result, error = results
+    if error or not cache_key:
+        return results
+    if get_reference_fingerprint(job_dir) != cache_key.rsplit('_', 1)[1]:
+        return results
+
+    organism_name = organism_name or read_manifest(job_dir).get(
+        'organism_name'
+    )
+    cache_root = get_pipeline_cache_root()
+    staging_dir = new_staging_dir(cache_root)
+    try:
+        if final_result_dir:
+            shutil.copytree(
+                final_result_dir, os.path.join(staging_dir, 'final_results')
+            )
+        for file_name in CACHED_INTERMEDIATE_FILES:
+            file_path = os.path.join(job_dir, file_name)
+            if os.path.exists(file_path):
+                shutil.copy2(file_path, staging_dir)
+        with open(
+            os.path.join(staging_dir, CACHED_RESULT_FILE), 'w'
+        ) as result_file:
+            json.dump(
+                {
+                    'negative_result': negative_result,
+                    'organism_name': organism_name,
+                },
+                result_file,
+            )
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return results
+
+    publish_entry(staging_dir, cache_root, cache_key)
+    record_cache_metric('stored')
+    evict_lru_entries(
+        cache_root, get_cache_max_bytes('PIPELINE_CACHE_MAX_MB', 1024)
+    )
+    return results
+
+
+@celery_app.task
+def restore_pipeline_result(cache_key: str, job_dir: str):
+    """
+    The function `restore_pipeline_result` copies a cached analysis result into
+    a new job scratch directory, so it can be sent exactly as a freshly
+    computed one. The entry is locked while it is copied, so the eviction
+    leaves it alone.
+
+    :return: a tuple in the `create_result` format: the final results
+    directory, the negative result message and an error message, with `False`
+    for the values that do not apply.
+    """
+    cache_root = get_pipeline_cache_root()
+    try:
+        with entry_lock(cache_root, cache_key, shared=True):
+            cache_entry = lookup_entry(cache_root, cache_key)
+            if not cache_entry:
+                return (
+                    False,
+                    False,
+                    f'[RESULT CACHE] - {cache_key} was evicted',
+                )
+            shutil.copytree(cache_entry, job_dir, dirs_exist_ok=True)
+        with open(os.path.join(job_dir, CACHED_RESULT_FILE)) as result_file:
+            negative_result = json.load(result_file)['negative_result']
+        if negative_result:
+            return False, negative_result, False
+        return os.path.join(job_dir, 'final_results'), False, False
+    except Exception as e:
+        return False, False, f'[RESULT CACHE] - {str(e)}'
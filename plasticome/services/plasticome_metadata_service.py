@@ -1,83 +1,178 @@
+import base64
+import json
 import os
+import threading
+import time
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from plasticome.services.auth_user_service import authenticate_user
 
 load_dotenv(override=True)
 
-
-def get_all_enzymes(username: str, secret: str):
-
-    token, error = authenticate_user(username, secret)
-    if error:
-        return False, True
-
-    headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(
-        f'{os.getenv("PLASTICOME_METADATA_URL")}/enzyme_find',
-        headers=headers,
-    )
-
-    data = response.json()
-    if response.status_code == 200:
-        return data, False
-    return False, data
-
-
-def get_all_enzymes_by_ec_number(username: str, secret: str, ec_number: str):
-
-    token, error = authenticate_user(username, secret)
-    if error:
-        return False, True
-
-    headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(
-        f'{os.getenv("PLASTICOME_METADATA_URL")}/enzyme_find/ec/{ec_number}',
-        headers=headers,
-    )
-
-    data = response.json()
-    if response.status_code == 200:
-        return data, False
-    return False, data
-
-
-def get_all_plastics_with_enzymes(username: str, secret: str):
-
-    token, error = authenticate_user(username, secret)
-    if error:
-        return False, True
-
-    headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(
-        f'{os.getenv("PLASTICOME_METADATA_URL")}/plastic_enzyme_find',
-        headers=headers,
-    )
-
-    data = response.json()
-    if response.status_code == 200:
-        return data, False
-    return False, data
-
-
-def get_all_plastic_types_by_enzyme(
-    username: str, secret: str, enzyme_id: int
-):
-
-    token, error = authenticate_user(username, secret)
-    if error:
-        return False, True
-
-    headers = {'Authorization': f'Bearer {token}'}
-    response = requests.get(
-        f'{os.getenv("PLASTICOME_METADATA_URL")}/plastic_enzyme_find/{enzyme_id}',
-        headers=headers,
-    )
-
-    data = response.json()
-    if response.status_code == 200:
-        plastic_values = [item['plastic'] for item in data]
-        return plastic_values, False
-    return False, data
+TOKEN_EXPIRY_MARGIN = 60
+DEFAULT_TOKEN_TTL = 15 * 60
+REQUEST_TIMEOUT = 30
+
+
+def get_token_expiration(token: str):
+    """
+    The function `get_token_expiration` reads the `exp` claim of a JWT bearer
+    token, without validating it, to know until when the token can be reused.
+
+    :return: the expiration unix timestamp, or `None` when the token does not
+    carry one.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims['exp'])
+    except Exception:
+        return None
+
+
+class PlasticomeMetadataClient:
+    """
+    The class `PlasticomeMetadataClient` talks to the plasticome metadata API
+    through a single pooled `requests.Session`. The bearer token is requested
+    once and reused until shortly before it expires, a request answered with
+    401 renews it once, and the idempotent GETs are retried with exponential
+    backoff on connection errors and 429/5xx responses.
+    """
+
+    def __init__(
+        self,
+        base_url: str = None,
+        username: str = None,
+        secret: str = None,
+        max_retries: int = 3,
+        pool_size: int = 10,
+    ):
+        self.base_url = base_url or os.getenv('PLASTICOME_METADATA_URL')
+        self.username = username or os.getenv('PLASTICOME_USER')
+        self.secret = secret or os.getenv('PLASTICOME_PASSWORD')
+        self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.token = None
+        self.token_expires_at = 0
+        self.token_lock = threading.Lock()
+
+    def get_token(self, force_refresh: bool = False):
+        """
+        The method `get_token` returns the cached bearer token, authenticating
+        again only when there is none, it is about to expire or a refresh is
+        forced.
+
+        :return: a tuple with the token and an error flag.
+        """
+        with self.token_lock:
+            if (
+                not force_refresh
+                and self.token
+                and time.time() < self.token_expires_at - TOKEN_EXPIRY_MARGIN
+            ):
+                return self.token, False
+
+            try:
+                token, error = authenticate_user(
+                    self.username, self.secret, self.session, self.base_url
+                )
+            except (requests.RequestException, ValueError):
+                token, error = False, True
+            if error:
+                self.token = None
+                return False, True
+            self.token = token
+            self.token_expires_at = get_token_expiration(token) or (
+                time.time() + DEFAULT_TOKEN_TTL
+            )
+            return token, False
+
+    def get(self, path: str):
+        """
+        The method `get` sends an authenticated GET to the metadata API,
+        renewing the token once when the API rejects it.
+
+        :param path: the endpoint path, starting with `/`
+        :type path: str
+        :return: a tuple with the decoded JSON response and an error, `False`
+        when the request succeeded. Connection failures and responses that
+        are not JSON, such as a proxy error page, are returned as errors.
+        """
+        token, error = self.get_token()
+        if error:
+            return False, 'could not authenticate on the metadata API'
+
+        try:
+            for attempt in range(2):
+                response = self.session.get(
+                    f'{self.base_url}{path}',
+                    headers={'Authorization': f'Bearer {token}'},
+                    timeout=REQUEST_TIMEOUT,
+                )
+                if response.status_code != 401 or attempt:
+                    break
+                token, error = self.get_token(force_refresh=True)
+                if error:
+                    return False, 'could not authenticate on the metadata API'
+        except requests.RequestException as e:
+            return False, f'metadata API unreachable: {str(e)}'
+
+        try:
+            data = response.json()
+        except ValueError:
+            return (
+                False,
+                f'metadata API answered {response.status_code} without JSON',
+            )
+        if response.status_code == 200:
+            return data, False
+        return False, data
+
+    def get_all_enzymes(self):
+        return self.get('/enzyme_find')
+
+    def get_all_enzymes_by_ec_number(self, ec_number: str):
+        return self.get(f'/enzyme_find/ec/{ec_number}')
+
+    def get_all_plastics_with_enzymes(self):
+        return self.get('/plastic_enzyme_find')
+
+    def get_all_plastic_types_by_enzyme(self, enzyme_id: int):
+        data, error = self.get(f'/plastic_enzyme_find/{enzyme_id}')
+        if error:
+            return False, error
+        return [item['plastic'] for item in data], False
+
+
+metadata_client = None
+metadata_client_lock = threading.Lock()
+
+
+def get_metadata_client():
+    """
+    The function `get_metadata_client` returns the metadata client shared by
+    the whole process, so every task reuses its connections and token.
+    """
+    global metadata_client
+    with metadata_client_lock:
+        if metadata_client is None:
+            metadata_client = PlasticomeMetadataClient()
+        return metadata_client
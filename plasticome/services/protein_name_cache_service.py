@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+
+def get_protein_name_cache_path():
+    cache_path = os.getenv('PROTEIN_NAME_CACHE_PATH') or os.path.join(
+        os.getcwd(), 'cache', 'protein_names.sqlite3'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    return cache_path
+
+
+def get_protein_name_cache_ttl():
+    """
+    The function `get_protein_name_cache_ttl` reads how long, in seconds, a
+    resolved protein name stays valid. `PROTEIN_NAME_CACHE_TTL_DAYS` defaults to
+    30 days.
+    """
+    try:
+        ttl_days = float(os.getenv('PROTEIN_NAME_CACHE_TTL_DAYS', 30))
+    except ValueError:
+        ttl_days = 30
+    return ttl_days * 24 * 60 * 60
+
+
+def connect_protein_name_cache(cache_path: str = None):
+    connection = sqlite3.connect(
+        cache_path or get_protein_name_cache_path(), timeout=30
+    )
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS protein_names ('
+        'genbank_id TEXT PRIMARY KEY, name TEXT NOT NULL, '
+        'fetched_at REAL NOT NULL)'
+    )
+    return connection
+
+
+def read_cached_protein_names(genbank_ids: list, cache_path: str = None):
+    """
+    The function `read_cached_protein_names` looks up protein names that were
+    resolved before and are still inside the cache TTL.
+
+    :param genbank_ids: the GenBank protein ids to look up
+    :type genbank_ids: list
+    :param cache_path: optional sqlite file, defaults to
+    `PROTEIN_NAME_CACHE_PATH`
+    :type cache_path: str
+    :return: a dictionary with the ids found in the cache and their names.
+    """
+    oldest_valid = time.time() - get_protein_name_cache_ttl()
+    cached_names = {}
+    with closing(connect_protein_name_cache(cache_path)) as connection:
+        for start in range(0, len(genbank_ids), 500):
+            batch = genbank_ids[start : start + 500]
+            rows = connection.execute(
+                'SELECT genbank_id, name FROM protein_names '
+                f'WHERE fetched_at >= ? AND genbank_id IN '
+                f'({",".join("?" * len(batch))})',
+                [oldest_valid, *batch],
+            )
+            cached_names.update(rows.fetchall())
+    return cached_names
+
+
+def write_cached_protein_names(protein_names: dict, cache_path: str = None):
+    fetched_at = time.time()
+    with closing(connect_protein_name_cache(cache_path)) as connection:
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO protein_names '
+                '(genbank_id, name, fetched_at) VALUES (?, ?, ?)',
+                [
+                    (genbank_id, name, fetched_at)
+                    for genbank_id, name in protein_names.items()
+                ],
+            )
@@ -0,0 +1,316 @@
+import csv
+import io
+import os
+import shutil
+
+STORE_SUFFIX = '.proteome.fasta'
+INDEX_SUFFIX = '.proteome.idx'
+KEPT_IDS_SUFFIX = '.proteome.ids'
+
+
+def get_store_paths(protein_file_path: str):
+    """
+    The function `get_store_paths` returns the proteome store files that live
+    next to the `.faa` file of a job: the immutable FASTA store, its offsets
+    index and the set of protein ids kept by the filters so far.
+
+    :param protein_file_path: the `.faa` file handed to the containers
+    :type protein_file_path: str
+    :return: a tuple with the store, index and kept ids paths.
+    """
+    base_path = os.path.splitext(protein_file_path)[0]
+    return (
+        f'{base_path}{STORE_SUFFIX}',
+        f'{base_path}{INDEX_SUFFIX}',
+        f'{base_path}{KEPT_IDS_SUFFIX}',
+    )
+
+
+def get_fasta_header_id(header_line: bytes):
+    return header_line[1:].split(None, 1)[0].decode('utf-8')
+
+
+def build_proteome_index(store_path: str, index_path: str):
+    """
+    The function `build_proteome_index` scans a FASTA file once and writes a
+    faidx-like index with the id, byte offset and byte length of every record,
+    so single records can be read later without parsing the whole file.
+
+    :return: the index path.
+    """
+    records = []
+    offset = 0
+    with open(store_path, 'rb') as store:
+        for line in store:
+            if line.startswith(b'>'):
+                if records:
+                    records[-1][2] = offset - records[-1][1]
+                records.append([get_fasta_header_id(line), offset, 0])
+            offset += len(line)
+    if records:
+        records[-1][2] = offset - records[-1][1]
+
+    with open(f'{index_path}.tmp', 'w') as index_file:
+        for protein_id, record_offset, record_length in records:
+            index_file.write(
+                f'{protein_id}\t{record_offset}\t{record_length}\n'
+            )
+    os.replace(f'{index_path}.tmp', index_path)
+    return index_path
+
+
+def create_proteome_store(protein_file_path: str):
+    """
+    The function `create_proteome_store` turns a freshly downloaded proteome
+    into the job proteome store. The FASTA, either already at the store path
+    or as a `.faa` file, becomes the immutable store, gets indexed when it has
+    no index yet, and the `.faa` is kept as a link to it for the first
+    container. Later views are always written to a new file and renamed over
+    the `.faa`, so the store itself is never rewritten.
+
+    :param protein_file_path: the job `.faa` file
+    :type protein_file_path: str
+    :return: the store path.
+    """
+    store_path, index_path, kept_ids_path = get_store_paths(protein_file_path)
+    if not os.path.exists(store_path):
+        os.replace(protein_file_path, store_path)
+    elif os.path.exists(protein_file_path):
+        os.remove(protein_file_path)
+    if not os.path.exists(index_path):
+        build_proteome_index(store_path, index_path)
+    if os.path.exists(kept_ids_path):
+        os.remove(kept_ids_path)
+    try:
+        os.link(store_path, protein_file_path)
+    except OSError:
+        shutil.copyfile(store_path, protein_file_path)
+    return store_path
+
+
+def load_proteome_index(protein_file_path: str):
+    """
+    The function `load_proteome_index` loads the offsets index of a job
+    proteome, creating the store first for jobs that do not have one yet.
+
+    :return: a dictionary, in file order, mapping protein ids to their
+    `(offset, length)` in the store.
+    """
+    store_path, index_path, _ = get_store_paths(protein_file_path)
+    if not os.path.exists(store_path):
+        shutil.copyfile(protein_file_path, store_path)
+        build_proteome_index(store_path, index_path)
+    elif not os.path.exists(index_path):
+        build_proteome_index(store_path, index_path)
+
+    proteome_index = {}
+    with open(index_path) as index_file:
+        for line in index_file:
+            protein_id, offset, length = line.rstrip('\n').split('\t')
+            proteome_index[protein_id] = (int(offset), int(length))
+    return proteome_index
+
+
+def get_kept_protein_ids(protein_file_path: str):
+    """
+    The function `get_kept_protein_ids` returns the ids of the proteins that
+    passed every filter stage so far, in proteome order.
+    """
+    _, _, kept_ids_path = get_store_paths(protein_file_path)
+    proteome_index = load_proteome_index(protein_file_path)
+    if not os.path.exists(kept_ids_path):
+        return list(proteome_index)
+    with open(kept_ids_path) as kept_ids_file:
+        return [line.strip() for line in kept_ids_file if line.strip()]
+
+
+def narrow_proteome(protein_file_path: str, protein_ids):
+    """
+    The function `narrow_proteome` keeps only the given proteins in the job
+    proteome, without touching any sequence. Ids not present in the previous
+    kept set are ignored, so each filter stage can only narrow it.
+
+    :param protein_file_path: the job `.faa` file
+    :type protein_file_path: str
+    :param protein_ids: iterable with the ids kept by the filter
+    :return: the list of kept ids, in proteome order.
+    """
+    _, _, kept_ids_path = get_store_paths(protein_file_path)
+    protein_ids = set(protein_ids)
+    kept_ids = [
+        protein_id
+        for protein_id in get_kept_protein_ids(protein_file_path)
+        if protein_id in protein_ids
+    ]
+    with open(f'{kept_ids_path}.tmp', 'w') as kept_ids_file:
+        kept_ids_file.writelines(f'{protein_id}\n' for protein_id in kept_ids)
+    os.replace(f'{kept_ids_path}.tmp', kept_ids_path)
+    return kept_ids
+
+
+def read_raw_records(protein_file_path: str, protein_ids: list = None):
+    """
+    The function `read_raw_records` reads FASTA records straight from the
+    proteome store using the offsets index.
+
+    :param protein_ids: the ids to read, defaults to the kept proteins
+    :type protein_ids: list
+    :return: a generator of `(protein_id, record_bytes)` tuples.
+    """
+    store_path, _, _ = get_store_paths(protein_file_path)
+    proteome_index = load_proteome_index(protein_file_path)
+    if protein_ids is None:
+        protein_ids = get_kept_protein_ids(protein_file_path)
+
+    with open(store_path, 'rb') as store:
+        for protein_id in protein_ids:
+            offset, length = proteome_index[protein_id]
+            store.seek(offset)
+            yield protein_id, store.read(length)
+
+
+def iter_proteome_records(protein_file_path: str, protein_ids: list = None):
+    """
+    The function `iter_proteome_records` materializes the kept proteins (or
+    the given ids) as `SeqRecord` objects, parsing only those records.
+    """
+    from Bio import SeqIO
+
+    for _, raw_record in read_raw_records(protein_file_path, protein_ids):
+        yield SeqIO.read(io.StringIO(raw_record.decode('utf-8')), 'fasta')
+
+
+def materialize_proteome(protein_file_path: str, output_path: str = None):
+    """
+    The function `materialize_proteome` writes the kept proteins as a FASTA
+    file for the tools that need one on disk, copying the record bytes from the
+    store without parsing them. The file is replaced atomically.
+
+    :param protein_file_path: the job `.faa` file
+    :type protein_file_path: str
+    :param output_path: where to write, defaults to the `.faa` file itself
+    :type output_path: str
+    :return: the written FASTA path.
+    """
+    output_path = output_path or protein_file_path
+    with open(f'{output_path}.tmp', 'wb') as output_file:
+        for _, raw_record in read_raw_records(protein_file_path):
+            output_file.write(raw_record)
+            if not raw_record.endswith(b'\n'):
+                output_file.write(b'\n')
+    os.replace(f'{output_path}.tmp', output_path)
+    return output_path
+
+
+def get_record_residues(raw_record: bytes):
+    sequence_lines = raw_record.split(b'\n')[1:]
+    return sum(len(line.strip()) for line in sequence_lines)
+
+
+def write_proteome_shards(
+    protein_file_path: str, shard_count: int, output_dir: str
+):
+    """
+    The function `write_proteome_shards` splits the kept proteins into FASTA
+    shards of balanced total residue length, so the shards of a tool whose
+    runtime grows with the sequence length finish at about the same time.
+    Proteins are assigned longest first to the lightest shard, and every shard
+    keeps them in proteome order.
+
+    :param protein_file_path: the job `.faa` file
+    :type protein_file_path: str
+    :param shard_count: maximum number of shards
+    :type shard_count: int
+    :param output_dir: directory where the `shard_<n>.faa` files are written
+    :type output_dir: str
+    :return: the list of written shard paths, without empty shards.
+    """
+    records = list(read_raw_records(protein_file_path))
+    shard_count = max(1, min(shard_count, len(records)))
+    shard_residues = [0] * shard_count
+    record_shards = {}
+    by_length = sorted(
+        range(len(records)),
+        key=lambda position: -get_record_residues(records[position][1]),
+    )
+    for position in by_length:
+        shard = shard_residues.index(min(shard_residues))
+        record_shards[position] = shard
+        shard_residues[shard] += get_record_residues(records[position][1])
+
+    os.makedirs(output_dir, exist_ok=True)
+    shard_paths = [
+        os.path.join(output_dir, f'shard_{shard}.faa')
+        for shard in range(shard_count)
+    ]
+    shard_files = [open(shard_path, 'wb') for shard_path in shard_paths]
+    try:
+        for position, (_, raw_record) in enumerate(records):
+            shard_file = shard_files[record_shards[position]]
+            shard_file.write(raw_record)
+            if not raw_record.endswith(b'\n'):
+                shard_file.write(b'\n')
+    finally:
+        for shard_file in shard_files:
+            shard_file.close()
+    used_shards = set(record_shards.values())
+    for shard, shard_path in enumerate(shard_paths):
+        if shard not in used_shards:
+            os.remove(shard_path)
+    return [
+        shard_path
+        for shard, shard_path in enumerate(shard_paths)
+        if shard in used_shards
+    ]
+
+
+def merge_shard_tables(
+    shard_tables: list, output_path: str, protein_ids, header: list = None
+):
+    """
+    The function `merge_shard_tables` joins the tab separated tables a tool
+    wrote for every shard into one table, keeping the header of the first one
+    and putting the rows back in proteome order by their first column. A shard
+    whose table is missing or empty, as dbCAN and ECPred leave when none of
+    its proteins has a hit, adds no rows. Shards with a different header raise
+    a `ValueError`.
+
+    :param shard_tables: the shard table paths
+    :type shard_tables: list
+    :param output_path: the merged table path
+    :type output_path: str
+    :param protein_ids: the protein ids in proteome order
+    :param header: the columns written when no shard produced a table
+    :type header: list
+    :return: the merged table path.
+    """
+    positions = {
+        protein_id: position for position, protein_id in enumerate(protein_ids)
+    }
+    default_header, header = header, None
+    rows = []
+    for shard_table in shard_tables:
+        if not os.path.exists(shard_table):
+            continue
+        with open(shard_table, newline='', encoding='utf-8') as shard_file:
+            reader = csv.reader(shard_file, delimiter='\t')
+            shard_header = next(reader, None)
+            if header and shard_header and shard_header != header:
+                raise ValueError(f'{shard_table} has a different header')
+            header = header or shard_header
+            rows.extend(row for row in reader if row)
+
+    rows.sort(
+        key=lambda row: positions.get(
+            (row[0].split() or [''])[0], len(positions)
+        )
+    )
+    with open(
+        f'{output_path}.tmp', 'w', newline='', encoding='utf-8'
+    ) as output_file:
+        writer = csv.writer(output_file, delimiter='\t', lineterminator='\n')
+        if header or default_header:
+            writer.writerow(header or default_header)
+        writer.writerows(rows)
+    os.replace(f'{output_path}.tmp', output_path)
+    return output_path
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from dotenv import load_dotenv
+
+from plasticome.services.plasticome_metadata_service import get_metadata_client
+
+load_dotenv(override=True)
+
+
+def get_reference_data_ttl():
+    try:
+        return float(os.getenv('REFERENCE_DATA_TTL_SECONDS', 600))
+    except ValueError:
+        return 600
+
+
+def get_reference_data_retry_delay():
+    try:
+        return float(os.getenv('REFERENCE_DATA_RETRY_SECONDS', 30))
+    except ValueError:
+        return 30
+
+
+def get_relation_enzyme_id(relation: dict):
+    """
+    The function `get_relation_enzyme_id` reads the enzyme id of a plastic
+    relation, either as a flat field or as a nested enzyme object.
+
+    :return: the enzyme id, or `None` when the relation does not carry it.
+    """
+    if 'enzyme_id' in relation:
+        return relation['enzyme_id']
+    if isinstance(relation.get('enzyme'), dict):
+        return relation['enzyme'].get('id')
+    return None
+
+
+def get_relation_plastic(relation: dict):
+    return relation.get('plastic', relation.get('plastic_name'))
+
+
+class ReferenceDataSnapshot:
+    """
+    The class `ReferenceDataSnapshot` holds the plasticome metadata an
+    analysis needs, loaded with one `enzyme_find` and one
+    `plastic_enzyme_find` request, and indexes it in dictionaries so every
+    lookup of the pipeline is answered from memory.
+    """
+
+    def __init__(self, enzymes: list, plastic_relations: list):
+        self.enzymes = enzymes
+        self.plastic_relations = plastic_relations
+        self.loaded_at = time.time()
+        self.cazy_families = set(item['cazy_family'] for item in enzymes)
+        self.ec_numbers = set(item['ec_number'] for item in enzymes)
+        self.plastics = set(item['plastic_name'] for item in plastic_relations)
+
+        self.enzyme_ids_by_ec = {}
+        for item in enzymes:
+            self.enzyme_ids_by_ec.setdefault(item['ec_number'], item['id'])
+
+        self.plastics_by_enzyme_id = None
+        if plastic_relations and all(
+            get_relation_enzyme_id(item) is not None
+            for item in plastic_relations
+        ):
+            self.plastics_by_enzyme_id = {}
+            for item in plastic_relations:
+                self.plastics_by_enzyme_id.setdefault(
+                    get_relation_enzyme_id(item), []
+                ).append(get_relation_plastic(item))
+        self.fetched_plastics = {}
+        self.fetch_lock = threading.Lock()
+        self.fetch_failed_at = 0
+        self.fetch_error = False
+
+    def get_fingerprint(self):
+        """
+        The method `get_fingerprint` hashes the snapshot, so results computed
+        against the same metadata share a cache key.
+
+        :return: a short hexadecimal digest.
+        """
+        snapshot = json.dumps(
+            {'enzymes': self.enzymes, 'plastics': self.plastic_relations},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(snapshot.encode('utf-8')).hexdigest()[:16]
+
+    def get_plastic_types_by_enzyme(self, enzyme_id: int):
+        """
+        The method `get_plastic_types_by_enzyme` returns the plastics an enzyme
+        degrades. When the bulk relations do not identify their enzymes, each
+        enzyme is fetched once and remembered for the life of the snapshot.
+        The request runs outside the lock, and after a failed one the next
+        lookups fail at once until `REFERENCE_DATA_RETRY_SECONDS` has passed,
+        so an outage does not hold every thread in line.
+
+        :return: a tuple with the list of plastic names and an error, `False`
+        when the lookup succeeded. A failed lookup is never reported as an
+        enzyme without plastics.
+        """
+        if self.plastics_by_enzyme_id is not None:
+            return self.plastics_by_enzyme_id.get(enzyme_id, []), False
+
+        with self.fetch_lock:
+            if enzyme_id in self.fetched_plastics:
+                return self.fetched_plastics[enzyme_id], False
+            if (
+                time.time() - self.fetch_failed_at
+                < get_reference_data_retry_delay()
+            ):
+                return False, self.fetch_error
+
+        client = get_metadata_client()
+        plastic_types, error = client.get_all_plastic_types_by_enzyme(
+            enzyme_id
+        )
+        with self.fetch_lock:
+            if error:
+                self.fetch_failed_at = time.time()
+                self.fetch_error = error
+                return False, error
+            self.fetched_plastics[enzyme_id] = plastic_types
+            return plastic_types, False
+
+    def get_plastic_types_by_ec_number(self, ec_number: str):
+        enzyme_id = self.enzyme_ids_by_ec.get(ec_number)
+        if enzyme_id is None:
+            return [], False
+        return self.get_plastic_types_by_enzyme(enzyme_id)
+
+
+reference_data = None
+reference_data_lock = threading.Lock()
+refresh_failed_at = 0
+refresh_error = False
+
+
+def is_reference_data_fresh(snapshot):
+    return (
+        snapshot
+        and time.time() - snapshot.loaded_at < get_reference_data_ttl()
+    )
+
+
+def load_reference_data():
+    """
+    The function `load_reference_data` downloads a new snapshot of the
+    plasticome metadata.
+
+    :return: a tuple with the snapshot and an error, `False` when both
+    requests succeeded. The pipeline stages fail closed on the error.
+    """
+    metadata_client = get_metadata_client()
+    try:
+        enzymes, error = metadata_client.get_all_enzymes()
+        if error:
+            return False, f'could not load the enzymes: {error}'
+        (
+            plastic_relations,
+            error,
+        ) = metadata_client.get_all_plastics_with_enzymes()
+        if error:
+            return False, f'could not load the plastic relations: {error}'
+        return ReferenceDataSnapshot(enzymes, plastic_relations), False
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        return False, f'could not load the plasticome metadata: {str(e)}'
+
+
+def get_reference_data(force_refresh: bool = False):
+    """
+    The function `get_reference_data` returns the snapshot shared by the
+    worker process, loading it again once it is older than
+    `REFERENCE_DATA_TTL_SECONDS`. Only one thread refreshes at a time; the
+    others keep being served the previous snapshot meanwhile, and also when
+    the refresh fails. After a failed refresh, no new one is tried for
+    `REFERENCE_DATA_RETRY_SECONDS`.
+
+    :param force_refresh: load a new snapshot regardless of its age
+    :type force_refresh: bool
+    :return: a tuple with the snapshot and an error, `False` when a snapshot
+    is available.
+    """
+    global reference_data, refresh_failed_at, refresh_error
+    snapshot = reference_data
+    if not force_refresh and is_reference_data_fresh(snapshot):
+        return snapshot, False
+    if time.time() - refresh_failed_at < get_reference_data_retry_delay():
+        return (snapshot, False) if snapshot else (False, refresh_error)
+    if not reference_data_lock.acquire(blocking=not snapshot):
+        return snapshot, False
+
+    try:
+        if reference_data is not snapshot and is_reference_data_fresh(
+            reference_data
+        ):
+            return reference_data, False
+        if time.time() - refresh_failed_at < get_reference_data_retry_delay():
+            return (
+                (reference_data, False)
+                if reference_data
+                else (False, refresh_error)
+            )
+
+        new_snapshot, error = load_reference_data()
+        if error:
+            refresh_failed_at = time.time()
+            refresh_error = error
+            if reference_data:
+                return reference_data, False
+            return False, error
+        reference_data = new_snapshot
+        refresh_failed_at = 0
+        return reference_data, False
+    finally:
+        reference_data_lock.release()
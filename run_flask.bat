@@ -1,3 +1,3 @@
 @echo off
-set FLASK_APP=plasticome.routes.app.py
+set FLASK_APP=plasticome.routes.app:create_app()
 flask run
@@ -1,4 +1,10 @@
 #!/bin/bash
+# Serves the API with gunicorn, configured by the GUNICORN_* variables of the
+# .env file. Set FLASK_DEBUG=1 to use the Flask development server instead.
 
-export FLASK_APP=plasticome.routes.app.py
-flask run
+if [ "${FLASK_DEBUG:-0}" = "1" ]; then
+    exec flask --app "plasticome.routes.app:create_app()" run
+fi
+
+exec gunicorn -c plasticome/config/gunicorn_config.py \
+    "plasticome.routes.app:create_app()"
@@ -1,3 +1,48 @@
 #!/bin/bash
-cd /app/plasticome/config && celery -A celery_config worker -l info --pool=solo &
-cd /app && task run
\ No newline at end of file
+# Starts one celery worker per queue listed in CELERY_WORKER_QUEUES (all of
+# them by default), so each machine can serve only the stages it is sized for.
+# Every queue has its own pool, concurrency and prefetch, which can be changed
+# with CELERY_<QUEUE>_CONCURRENCY and CELERY_<QUEUE>_PREFETCH.
+
+start_worker() {
+    local queue=$1 pool=$2 concurrency=$3 prefetch=$4
+    (cd /app/plasticome/config && celery -A celery_config worker -l info \
+        -Q "$queue" -n "$queue@%h" --pool="$pool" \
+        --concurrency="$concurrency" --prefetch-multiplier="$prefetch") &
+}
+
+CPU_COUNT=$(nproc)
+
+for queue in ${CELERY_WORKER_QUEUES:-containers blast io filters}; do
+    case $queue in
+        # dbCAN and ECPred run in docker, the worker thread only waits on them
+        containers)
+            start_worker containers threads \
+                "${CELERY_CONTAINERS_CONCURRENCY:-2}" \
+                "${CELERY_CONTAINERS_PREFETCH:-1}"
+            ;;
+        # blastp already uses every core through BLAST_MAX_WORKERS
+        blast)
+            start_worker blast prefork \
+                "${CELERY_BLAST_CONCURRENCY:-1}" \
+                "${CELERY_BLAST_PREFETCH:-1}"
+            ;;
+        # NCBI downloads and lookups, result caching and email
+        io)
+            start_worker io threads \
+                "${CELERY_IO_CONCURRENCY:-8}" \
+                "${CELERY_IO_PREFETCH:-4}"
+            ;;
+        # pandas filters over the tool outputs, short and CPU bound
+        filters)
+            start_worker filters prefork \
+                "${CELERY_FILTERS_CONCURRENCY:-$CPU_COUNT}" \
+                "${CELERY_FILTERS_PREFETCH:-4}"
+            ;;
+        *)
+            echo "Unknown celery queue: $queue" >&2
+            ;;
+    esac
+done
+
+cd /app && bash /app/run_flask.sh
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from plasticome.controllers import pipeline_controller
+from plasticome.routes.app import create_app
+from plasticome.services import analysis_pipeline_service
+from plasticome.services.checkpoint_service import (
+    read_manifest,
+    start_job_manifest,
+)
+
+ACCESSION = 'GCA_000002855.2'
+
+
+@pytest.fixture
+def queued_tasks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    queued = []
+    monkeypatch.setattr(
+        pipeline_controller.start_analysis, 'delay', queued.append
+    )
+    return queued
+
+
+def test_analyze_does_not_wait_on_the_metadata_api(queued_tasks, monkeypatch):
+    monkeypatch.setattr(
+        analysis_pipeline_service,
+        'get_metadata_fingerprint',
+        lambda: pytest.fail('the fingerprint was read in the request'),
+    )
+
+    response = (
+        create_app()
+        .test_client()
+        .post(
+            '/analyze',
+            json={
+                'user_email': 'user@example.com',
+                'user_name': 'User',
+                'fungi_id': ACCESSION,
+            },
+        )
+    )
+
+    assert response.status_code == 200
+    assert [job_data['job_id'] for job_data in queued_tasks] == [
+        response.json['job_id']
+    ]
+    assert read_manifest(queued_tasks[0]['job_dir'])['accession'] == ACCESSION
+
+
+@pytest.fixture
+def new_job(tmp_path, monkeypatch):
+    job_dir = str(tmp_path / f'results_{ACCESSION}_abc123abc123')
+    os.makedirs(job_dir)
+    job_data = {
+        'job_id': 'abc123abc123',
+        'accession': ACCESSION,
+        'job_dir': job_dir,
+        'email_data': {'user_email': 'user@example.com', 'job_dir': job_dir},
+    }
+    start_job_manifest(job_dir, job_data)
+    started_chains = []
+    monkeypatch.setattr(
+        analysis_pipeline_service,
+        'build_analysis_chain',
+        lambda job_data: lambda: started_chains.append(job_data),
+    )
+    monkeypatch.setattr(
+        analysis_pipeline_service,
+        'get_metadata_fingerprint',
+        lambda: 'abcdef0123456789',
+    )
+    monkeypatch.setenv('PIPELINE_CACHE_DIR', str(tmp_path / 'pipeline_cache'))
+    return job_data, started_chains
+
+
+def test_cache_miss_runs_the_analysis_with_the_cache_key(new_job):
+    job_data, started_chains = new_job
+
+    cache_key = analysis_pipeline_service.start_analysis.run(job_data)
+
+    assert cache_key == f'{ACCESSION}_abcdef0123456789'
+    assert [job['cache_key'] for job in started_chains] == [cache_key]
+    assert read_manifest(job_data['job_dir'])['cache_key'] == cache_key
+
+
+@pytest.fixture
+def queued_emails(monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        analysis_pipeline_service.send_email_with_results,
+        'delay',
+        lambda results, email_data: queued.append((results, email_data)),
+    )
+    return queued
+
+
+def test_cache_hit_sends_the_cached_result(new_job, queued_emails, tmp_path):
+    job_data, started_chains = new_job
+    cache_entry = tmp_path / 'pipeline_cache' / f'{ACCESSION}_abcdef0123456789'
+    cache_entry.mkdir(parents=True)
+    (cache_entry / 'result.json').write_text(
+        '{"negative_result": "no enzyme found", '
+        '"organism_name": "Aspergillus niger"}'
+    )
+
+    analysis_pipeline_service.start_analysis.run(job_data)
+
+    assert started_chains == []
+    assert [
+        (results, email_data['organism_name'])
+        for results, email_data in queued_emails
+    ] == [((False, 'no enzyme found', False), 'Aspergillus niger')]
+    assert read_manifest(job_data['job_dir'])['cached_result'] is True
+
+
+def test_evicted_cache_entry_runs_the_analysis(
+    new_job, queued_emails, monkeypatch, tmp_path
+):
+    job_data, started_chains = new_job
+    monkeypatch.setattr(
+        analysis_pipeline_service,
+        'lookup_pipeline_result',
+        lambda cache_key: str(tmp_path / 'pipeline_cache' / cache_key),
+    )
+
+    analysis_pipeline_service.start_analysis.run(job_data)
+
+    assert queued_emails == []
+    assert [job['job_id'] for job in started_chains] == ['abc123abc123']
+    assert not read_manifest(job_data['job_dir']).get('cached_result')
@@ -0,0 +1,108 @@
+import csv
+import os
+
+import pytest
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+
+from plasticome.services import blast_service
+
+BLAST_HITS = [
+    'XP_1.1,REF_A,91.2,120,10,0,1,120,1,120,1e-50,210.0',
+    'XP_1.1,REF_A,75.0,40,10,0,130,170,5,45,1e-05,55.1',
+    'XP_1.1,REF_B,40.5,100,50,2,3,100,8,110,2e-10,80.3',
+    'XP_3.1,REF_B,88.8,90,10,1,1,90,1,89,3e-40,170.2',
+    'XP_3.1,REF_C,66.6,60,20,0,10,70,12,72,4e-20,99.9',
+]
+
+REFERENCE_SEQUENCES = [
+    '>REF_A cutinase MKVLAWHERTYPQ',
+    '>REF_B lipase MKVLAHHERTYPQ',
+    '>REF_C esterase MKVLAYHERTYPQ',
+]
+
+
+def fake_run_blastp(query_path, blastdb_path, output_path, num_threads=1):
+    query_ids = {record.id for record in SeqIO.parse(query_path, 'fasta')}
+    with open(output_path, 'w') as output_file:
+        for hit in BLAST_HITS:
+            if hit.split(',')[0] in query_ids:
+                output_file.write(f'{hit}\n')
+    return output_path
+
+
+@pytest.fixture
+def proteins(tmp_path, monkeypatch):
+    monkeypatch.setenv('BLASTDB_CACHE_DIR', str(tmp_path / 'blastdb_cache'))
+    monkeypatch.setattr(blast_service, 'run_blastp', fake_run_blastp)
+    monkeypatch.setattr(
+        blast_service,
+        'get_cached_blastdb',
+        lambda ec_number, protein_sequences: ('blastdb/3_1_1_74', False),
+    )
+    return [
+        (position, SeqRecord(Seq('MKVLAWHERTY'), id=f'XP_{position}.1'))
+        for position in (1, 2, 3)
+    ]
+
+
+def align(proteins, work_dir, results_path):
+    os.makedirs(work_dir)
+    os.makedirs(results_path)
+    return blast_service.align_proteins_group(
+        '3.1.1.74', proteins, REFERENCE_SEQUENCES, work_dir, results_path
+    )
+
+
+def read_files(result_files):
+    contents = {}
+    for result_file in result_files:
+        with open(result_file) as result:
+            contents[os.path.basename(result_file)] = result.read()
+    return contents
+
+
+def test_batched_blastp_splits_like_single_query_runs(proteins, tmp_path):
+    batched_files = align(
+        proteins, tmp_path / 'batched_work', tmp_path / 'batched_results'
+    )
+    single_files = [
+        result_file
+        for index, protein in enumerate(proteins)
+        for result_file in align(
+            [protein],
+            tmp_path / f'single_work_{index}',
+            tmp_path / f'single_results_{index}',
+        )
+    ]
+
+    assert [os.path.basename(path) for path in batched_files] == [
+        'enzyme_1_results.csv',
+        'enzyme_2_results.csv',
+        'enzyme_3_results.csv',
+    ]
+    assert read_files(batched_files) == read_files(single_files)
+
+
+def test_split_keeps_the_best_hit_per_reference(proteins, tmp_path):
+    result_files = align(proteins, tmp_path / 'work', tmp_path / 'results')
+
+    hits = {}
+    for result_file in result_files:
+        with open(result_file, newline='') as result:
+            hits[os.path.basename(result_file)] = [
+                (row['QUERY ID'], row['REF ID'], row['IDENTITY'])
+                for row in csv.DictReader(result)
+            ]
+    assert hits == {
+        'enzyme_1_results.csv': [
+            ('XP_1.1', 'REF_A', '91.2'),
+            ('XP_1.1', 'REF_B', '40.5'),
+        ],
+        'enzyme_2_results.csv': [],
+        'enzyme_3_results.csv': [
+            ('XP_3.1', 'REF_B', '88.8'),
+            ('XP_3.1', 'REF_C', '66.6'),
+        ],
+    }
@@ -0,0 +1,67 @@
+import pytest
+
+from plasticome.routes.app import create_app
+from plasticome.services.pipeline_cache_service import get_pipeline_cache_key
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('PIPELINE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('CACHE_ADMIN_TOKEN', 'admin-token')
+    return create_app().test_client()
+
+
+def test_cache_invalidation_requires_the_admin_token(client):
+    assert client.delete('/cache/results').status_code == 401
+    assert (
+        client.delete(
+            '/cache/results', headers={'Authorization': 'Bearer wrong'}
+        ).status_code
+        == 401
+    )
+    response = client.delete(
+        '/cache/results', headers={'Authorization': 'Bearer admin-token'}
+    )
+    assert response.status_code == 200
+    assert response.json == {'invalidated': 0}
+
+
+def test_cache_invalidation_is_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.delenv('CACHE_ADMIN_TOKEN')
+
+    response = client.delete(
+        '/cache/results/GCA_000002855.2',
+        headers={'Authorization': 'Bearer '},
+    )
+
+    assert response.status_code == 401
+
+
+def test_cache_invalidation_rejects_invalid_accessions(client):
+    response = client.delete(
+        '/cache/results/..',
+        headers={'Authorization': 'Bearer admin-token'},
+    )
+
+    assert response.status_code == 422
+
+
+def test_analyze_rejects_accessions_that_are_not_assemblies(client):
+    response = client.post(
+        '/analyze',
+        json={
+            'user_email': 'user@example.com',
+            'user_name': 'user',
+            'fungi_id': '../../etc',
+        },
+    )
+
+    assert response.status_code == 422
+
+
+def test_cache_key_rejects_path_traversal():
+    assert get_pipeline_cache_key('GCF_000002855.3', 'abc') == (
+        'GCF_000002855.3_abc'
+    )
+    with pytest.raises(ValueError):
+        get_pipeline_cache_key('../GCA_000002855.2', 'abc')
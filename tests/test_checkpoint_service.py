@@ -0,0 +1,41 @@
+import multiprocessing
+
+import pytest
+
+from plasticome.services import disk_cache_service
+from plasticome.services.checkpoint_service import (
+    read_manifest,
+    update_manifest,
+)
+
+UPDATES_PER_PROCESS = 50
+
+
+def increment_counter(job_dir: str):
+    for _ in range(UPDATES_PER_PROCESS):
+        update_manifest(
+            job_dir,
+            lambda manifest: manifest.update(
+                counter=manifest.get('counter', 0) + 1
+            ),
+        )
+
+
+@pytest.mark.skipif(
+    disk_cache_service.fcntl is None
+    or 'fork' not in multiprocessing.get_all_start_methods(),
+    reason='needs fcntl and fork',
+)
+def test_manifest_updates_from_several_processes_are_not_lost(tmp_path):
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=increment_counter, args=(str(tmp_path),))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert read_manifest(str(tmp_path))['counter'] == 4 * UPDATES_PER_PROCESS
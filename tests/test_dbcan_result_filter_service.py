@@ -0,0 +1,91 @@
+import io
+import random
+
+import pandas as pd
+import pytest
+
+from benchmarks.dbcan_filter_benchmark import (
+    build_overview,
+    build_reference_sets,
+    legacy_filter_overview,
+)
+from plasticome.services.dbcan_result_filter_service import filter_overview
+
+OVERVIEW = (
+    'Gene ID\tEC#\tHMMER\teCAMI\tDIAMOND\t#ofTools\n'
+    'XP_1.1\t3.1.1.74|3.1.1.1\tGH5(1-90)+CE5(100-300)\tCE5\tCE5\t3\n'
+    'XP_2.1\t-\tGH51(1-90)\tGH5\t-\t2\n'
+    'XP_3.1\t1.1.1.1|3.1.1.101\t-\t-\tAA3+CE5\t1\n'
+    'XP_4.1\t1.1.1.1\tGH51(3-200)\tGH51\tGH51\t3\n'
+    'XP_5.1\t-\t-\t-\t-\t0\n'
+    'XP_6.1\t3.1.1.74\tGH5(1-90)+GH5(120-400)\tGH5\tGH5\t3\n'
+)
+CAZY_FAMILIES = {'CE5', 'GH5', 'AA9'}
+EC_NUMBERS = {'3.1.1.74', '3.1.1.101'}
+
+
+def read_overview(overview_text: str = OVERVIEW):
+    return pd.read_csv(io.StringIO(overview_text), sep='\t')
+
+
+def filter_to_text(filter_function, overview_text, cazy_families, ec_numbers):
+    enzymes, gene_ids_to_keep = filter_function(
+        read_overview(overview_text), cazy_families, ec_numbers
+    )
+    return enzymes.to_csv(sep='\t', index=False), gene_ids_to_keep
+
+
+def test_filter_keeps_first_matching_family_and_ec_number():
+    enzymes, gene_ids_to_keep = filter_overview(
+        read_overview(), CAZY_FAMILIES, EC_NUMBERS
+    )
+
+    assert gene_ids_to_keep == ['XP_1.1', 'XP_2.1', 'XP_3.1', 'XP_6.1']
+    assert list(enzymes.columns) == ['Gene ID', 'EC#', 'plasticome_cazyme']
+    assert enzymes['plasticome_cazyme'].tolist() == [
+        'GH5',
+        'GH5',
+        'CE5',
+        False,
+        False,
+        'GH5',
+    ]
+    assert enzymes['EC#'].tolist() == [
+        '3.1.1.74',
+        False,
+        '3.1.1.101',
+        False,
+        False,
+        '3.1.1.74',
+    ]
+
+
+def test_filter_writes_the_same_file_as_the_cell_by_cell_filter():
+    assert filter_to_text(
+        filter_overview, OVERVIEW, CAZY_FAMILIES, EC_NUMBERS
+    ) == filter_to_text(
+        legacy_filter_overview, OVERVIEW, CAZY_FAMILIES, EC_NUMBERS
+    )
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_filter_matches_the_cell_by_cell_filter_on_random_overviews(seed):
+    random.seed(seed)
+    overview_text = build_overview(300).to_csv(sep='\t', index=False)
+    cazy_families, ec_numbers = build_reference_sets(40)
+
+    assert filter_to_text(
+        filter_overview, overview_text, cazy_families, ec_numbers
+    ) == filter_to_text(
+        legacy_filter_overview, overview_text, cazy_families, ec_numbers
+    )
+
+
+def test_filter_without_matches_keeps_no_gene():
+    enzymes, gene_ids_to_keep = filter_overview(
+        read_overview(), {'PL1'}, {'9.9.9.9'}
+    )
+
+    assert gene_ids_to_keep == []
+    assert not enzymes['plasticome_cazyme'].any()
+    assert not enzymes['EC#'].any()
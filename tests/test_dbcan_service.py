@@ -0,0 +1,44 @@
+import os
+
+from plasticome.services import dbcan_service
+from plasticome.services.proteome_store_service import create_proteome_store
+
+
+def test_shard_without_overview_adds_no_rows(tmp_path, monkeypatch):
+    protein_file_path = tmp_path / 'GCA_000002855.2.faa'
+    protein_file_path.write_text(
+        '>XP_1.1\nMKVLAWHERT\n>XP_2.1\nMAAAAAAAAAAAA\n>XP_3.1\nMCC\n'
+    )
+    create_proteome_store(str(protein_file_path))
+
+    def fake_run_tool_container(
+        image, local_mount_dir, build_command, container_options
+    ):
+        input_path, _, _, output_dir = build_command('.')[:4]
+        with open(os.path.join(local_mount_dir, input_path)) as shard:
+            protein_ids = [
+                line[1:].split()[0] for line in shard if line.startswith('>')
+            ]
+        if 'XP_2.1' in protein_ids:
+            return
+        with open(
+            os.path.join(local_mount_dir, output_dir, 'overview.txt'), 'w'
+        ) as overview:
+            overview.write('\t'.join(dbcan_service.DBCAN_OVERVIEW_COLUMNS))
+            overview.write('\n')
+            for protein_id in reversed(protein_ids):
+                overview.write(f'{protein_id}\t-\tGH5(1-90)\t-\t-\t1\n')
+
+    monkeypatch.setattr(
+        dbcan_service, 'run_tool_container', fake_run_tool_container
+    )
+
+    dbcan_service.run_dbcan_shards(str(protein_file_path), 2)
+
+    with open(tmp_path / 'overview.txt') as overview:
+        assert [line.split('\t')[0] for line in overview] == [
+            'Gene ID',
+            'XP_1.1',
+            'XP_3.1',
+        ]
+    assert not os.path.exists(tmp_path / dbcan_service.DBCAN_SHARDS_DIR)
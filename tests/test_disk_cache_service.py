@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from plasticome.services import blast_service
+from plasticome.services.disk_cache_service import (
+    entry_lock,
+    evict_lru_entries,
+    lookup_entry,
+    new_staging_dir,
+    publish_entry,
+)
+
+
+def build_entry(cache_root, key, size=1024, last_used=None):
+    staging_dir = new_staging_dir(cache_root)
+    with open(os.path.join(staging_dir, 'data'), 'wb') as data:
+        data.write(b'x' * size)
+    entry_path = publish_entry(staging_dir, cache_root, key)
+    if last_used is not None:
+        os.utime(entry_path, (last_used, last_used))
+    return entry_path
+
+
+def test_published_entry_is_found(tmp_path):
+    cache_root = str(tmp_path)
+
+    assert lookup_entry(cache_root, 'entry') is None
+    entry_path = build_entry(cache_root, 'entry')
+
+    assert lookup_entry(cache_root, 'entry') == entry_path
+    assert [name for name in os.listdir(cache_root)] == ['entry']
+
+
+def test_second_publication_keeps_the_first_entry(tmp_path):
+    cache_root = str(tmp_path)
+    entry_path = build_entry(cache_root, 'entry', size=10)
+
+    build_entry(cache_root, 'entry', size=20)
+
+    assert os.path.getsize(os.path.join(entry_path, 'data')) == 10
+    assert os.listdir(cache_root) == ['entry']
+
+
+def test_lookup_refreshes_the_lru_order(tmp_path):
+    cache_root = str(tmp_path)
+    an_hour_ago = time.time() - 3600
+    build_entry(cache_root, 'old', last_used=an_hour_ago - 60)
+    build_entry(cache_root, 'recent', last_used=an_hour_ago)
+
+    lookup_entry(cache_root, 'old')
+
+    assert evict_lru_entries(cache_root, 1500) == ['recent']
+    assert lookup_entry(cache_root, 'old')
+
+
+def test_eviction_spares_recent_and_locked_entries(tmp_path):
+    cache_root = str(tmp_path)
+    an_hour_ago = time.time() - 3600
+    build_entry(cache_root, 'in_use', last_used=an_hour_ago - 60)
+    build_entry(cache_root, 'idle', last_used=an_hour_ago)
+    build_entry(cache_root, 'fresh')
+
+    with entry_lock(cache_root, 'in_use', shared=True):
+        assert evict_lru_entries(cache_root, 1024) == ['idle']
+    assert sorted(os.listdir(cache_root))[-2:] == ['fresh', 'in_use']
+    assert evict_lru_entries(cache_root, 1024) == ['in_use']
+
+
+def test_unbounded_cache_is_not_evicted(tmp_path):
+    build_entry(str(tmp_path), 'entry', last_used=0)
+
+    assert evict_lru_entries(str(tmp_path), 0) == []
+
+
+@pytest.fixture
+def blastdb_cache(tmp_path, monkeypatch):
+    cache_root = tmp_path / 'blastdb_cache'
+    monkeypatch.setenv('BLASTDB_CACHE_DIR', str(cache_root))
+
+    def fake_make_blastdb(reference_fasta_path):
+        blastdb_path = os.path.join(
+            os.path.dirname(reference_fasta_path), 'plasticome_protein_db'
+        )
+        with open(f'{blastdb_path}.pin', 'wb') as database:
+            database.write(b'x' * 4096)
+        return blastdb_path, None
+
+    monkeypatch.setattr(blast_service, 'make_blastdb', fake_make_blastdb)
+    return str(cache_root)
+
+
+def test_blastdb_in_use_survives_another_job_eviction(
+    blastdb_cache, monkeypatch
+):
+    monkeypatch.setenv('BLASTDB_CACHE_MAX_MB', '0.001')
+
+    with blast_service.use_cached_blastdb('3.1.1.74', ['>A MKVLA']) as (
+        blastdb_path,
+        error,
+    ):
+        entry_path = os.path.dirname(blastdb_path)
+        os.utime(entry_path, (0, 0))
+        blast_service.get_cached_blastdb('3.1.1.1', ['>B MKVLA'])
+        assert error is False
+        assert os.path.exists(f'{blastdb_path}.pin')
+
+    blast_service.get_cached_blastdb('3.1.1.2', ['>C MKVLA'])
+    assert not os.path.exists(entry_path)
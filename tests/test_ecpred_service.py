@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from plasticome.services import ecpred_service
+from plasticome.services.proteome_store_service import create_proteome_store
+
+
+@pytest.fixture
+def filtered_proteome(tmp_path):
+    job_dir = tmp_path / 'results_GCA_000002855.2_abc123abc123'
+    job_dir.mkdir()
+    protein_file_path = job_dir / 'GCA_000002855.2.faa'
+    protein_file_path.write_text(
+        '>XP_1.1\nMKVLA\n>XP_2.1\nMKVLAMKV\n>XP_3.1\nMK\n'
+    )
+    create_proteome_store(str(protein_file_path))
+    return str(protein_file_path)
+
+
+@pytest.fixture
+def ecpred_runs(monkeypatch):
+    runs = []
+
+    def fake_run_tool_container(
+        image, local_mount_dir, build_command, container_options
+    ):
+        command = build_command('.')
+        temp_dir = os.path.join(local_mount_dir, command[3])
+        runs.append((command, os.listdir(temp_dir)))
+        with open(os.path.join(temp_dir, 'leftover'), 'w'):
+            pass
+        with open(os.path.join(local_mount_dir, command[4]), 'w') as table:
+            table.write('Protein ID\tEC Number\n')
+
+    monkeypatch.setattr(
+        ecpred_service, 'run_tool_container', fake_run_tool_container
+    )
+    return runs
+
+
+@pytest.mark.parametrize('shards', ['1', '3'])
+def test_every_ecpred_run_gets_an_empty_temp_dir_in_the_job(
+    filtered_proteome, ecpred_runs, monkeypatch, shards
+):
+    monkeypatch.setenv('ECPRED_SHARDS', shards)
+    run_ecpred_container = ecpred_service.run_ecpred_container.run.__wrapped__
+
+    assert run_ecpred_container((filtered_proteome, False))[1] is False
+    run_ecpred_container((filtered_proteome, False))
+
+    temp_dirs = [command[3] for command, _ in ecpred_runs]
+    assert len(temp_dirs) == 2 * int(shards)
+    assert len(set(temp_dirs)) == int(shards)
+    assert all(
+        temp_dir.startswith(f'./{ecpred_service.ECPRED_TEMP_DIR}/')
+        for temp_dir in temp_dirs
+    )
+    assert all(contents == [] for _, contents in ecpred_runs)
+    assert not os.path.exists(
+        os.path.join(
+            os.path.dirname(filtered_proteome), ecpred_service.ECPRED_TEMP_DIR
+        )
+    )
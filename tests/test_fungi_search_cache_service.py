@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import pytest
+
+from plasticome.services import fungi_search_cache_service
+from plasticome.services.fungi_search_cache_service import (
+    NOT_FOUND,
+    get_fungi_cache_stats,
+    search_fungi_id_cached,
+)
+
+ACCESSIONS = ('GCA_000001.1', 'GCF_000001.1')
+
+
+@pytest.fixture
+def fungi_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('FUNGI_CACHE_PATH', str(tmp_path / 'fungi.sqlite3'))
+    monkeypatch.delenv('FUNGI_CACHE_TTL_SECONDS', raising=False)
+    monkeypatch.delenv('FUNGI_NOT_FOUND_TTL_SECONDS', raising=False)
+    monkeypatch.delenv('FUNGI_CACHE_MAX_ENTRIES', raising=False)
+    reset_process_memory(monkeypatch)
+    searches = []
+
+    def fake_search(fungi_name):
+        searches.append(fungi_name)
+        return NOT_FOUND if 'unknown' in fungi_name else ACCESSIONS
+
+    monkeypatch.setattr(
+        fungi_search_cache_service, 'search_fungi_id_by_name', fake_search
+    )
+    return searches
+
+
+def reset_process_memory(monkeypatch):
+    monkeypatch.setattr(
+        fungi_search_cache_service, 'fungi_searches', OrderedDict()
+    )
+    monkeypatch.setattr(fungi_search_cache_service, 'pending_searches', {})
+    monkeypatch.setattr(
+        fungi_search_cache_service, 'fungi_cache_metrics', Counter()
+    )
+
+
+def expire_after(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(fungi_search_cache_service.time, 'time', lambda: now)
+
+
+def test_repeated_search_is_answered_from_cache(fungi_cache):
+    assert search_fungi_id_cached('Aspergillus niger') == ACCESSIONS
+    assert search_fungi_id_cached('  aspergillus   NIGER ') == ACCESSIONS
+
+    assert fungi_cache == ['Aspergillus niger']
+    assert get_fungi_cache_stats()['hits'] == 1
+
+
+def test_concurrent_searches_send_a_single_request(fungi_cache, monkeypatch):
+    release_search = threading.Event()
+    searches = []
+
+    def slow_search(fungi_name):
+        searches.append(fungi_name)
+        release_search.wait(5)
+        return ACCESSIONS
+
+    monkeypatch.setattr(
+        fungi_search_cache_service, 'search_fungi_id_by_name', slow_search
+    )
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                search_fungi_id_cached('Aspergillus niger')
+            )
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    while get_fungi_cache_stats()['coalesced'] < 3:
+        time.sleep(0.01)
+    release_search.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [ACCESSIONS] * 4
+    assert searches == ['Aspergillus niger']
+
+
+def test_failed_search_is_not_cached(fungi_cache, monkeypatch):
+    def failing_search(fungi_name):
+        raise RuntimeError('Entrez is down')
+
+    monkeypatch.setattr(
+        fungi_search_cache_service, 'search_fungi_id_by_name', failing_search
+    )
+    with pytest.raises(RuntimeError):
+        search_fungi_id_cached('Aspergillus niger')
+
+    assert get_fungi_cache_stats()['errors'] == 1
+    assert (
+        fungi_search_cache_service.read_shared_fungi_search(
+            'aspergillus niger'
+        )
+        is None
+    )
+
+
+def test_cached_search_expires_after_ttl(fungi_cache, monkeypatch):
+    monkeypatch.setenv('FUNGI_CACHE_TTL_SECONDS', '60')
+    search_fungi_id_cached('Aspergillus niger')
+
+    expire_after(monkeypatch, 59)
+    search_fungi_id_cached('Aspergillus niger')
+    assert fungi_cache == ['Aspergillus niger']
+
+    expire_after(monkeypatch, 61)
+    search_fungi_id_cached('Aspergillus niger')
+    assert fungi_cache == ['Aspergillus niger'] * 2
+
+
+def test_names_without_genome_use_their_own_ttl(fungi_cache, monkeypatch):
+    monkeypatch.setenv('FUNGI_NOT_FOUND_TTL_SECONDS', '10')
+
+    assert search_fungi_id_cached('unknown fungi') == NOT_FOUND
+    assert search_fungi_id_cached('unknown fungi') == NOT_FOUND
+    assert fungi_cache == ['unknown fungi']
+    assert get_fungi_cache_stats()['not_found_hits'] == 1
+
+    expire_after(monkeypatch, 11)
+    search_fungi_id_cached('unknown fungi')
+    assert fungi_cache == ['unknown fungi'] * 2
+
+
+def test_names_without_genome_are_not_cached_with_zero_ttl(
+    fungi_cache, monkeypatch
+):
+    monkeypatch.setenv('FUNGI_NOT_FOUND_TTL_SECONDS', '0')
+
+    search_fungi_id_cached('unknown fungi')
+    search_fungi_id_cached('unknown fungi')
+
+    assert fungi_cache == ['unknown fungi'] * 2
+    assert get_fungi_cache_stats()['entries'] == 0
+
+
+def test_other_processes_reuse_the_shared_cache(fungi_cache, monkeypatch):
+    search_fungi_id_cached('Aspergillus niger')
+    search_fungi_id_cached('unknown fungi')
+    reset_process_memory(monkeypatch)
+
+    assert search_fungi_id_cached('Aspergillus niger') == ACCESSIONS
+    assert search_fungi_id_cached('unknown fungi') == NOT_FOUND
+    assert fungi_cache == ['Aspergillus niger', 'unknown fungi']
+    assert get_fungi_cache_stats()['shared_hits'] == 2
+    assert get_fungi_cache_stats()['hit_rate'] == 1
+
+
+def test_least_recently_used_names_leave_process_memory(
+    fungi_cache, monkeypatch
+):
+    monkeypatch.setenv('FUNGI_CACHE_MAX_ENTRIES', '1')
+
+    search_fungi_id_cached('Aspergillus niger')
+    search_fungi_id_cached('Trichoderma reesei')
+
+    assert list(fungi_search_cache_service.fungi_searches) == [
+        'trichoderma reesei'
+    ]
+    assert get_fungi_cache_stats()['evicted'] == 1
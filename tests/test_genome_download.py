@@ -0,0 +1,128 @@
+import gzip
+import os
+
+import pytest
+
+from plasticome.services import email_service, genbank_service
+from plasticome.services.checkpoint_service import start_job_manifest
+
+
+def test_download_is_tried_at_least_once(tmp_path, monkeypatch):
+    attempts = []
+
+    def failing_fetch(acession_number, job_dir):
+        attempts.append(acession_number)
+        raise ConnectionError('NCBI unreachable')
+
+    monkeypatch.setattr(genbank_service, 'fetch_proteome', failing_fetch)
+
+    result = genbank_service.download_fasta_sequence_by_id(
+        'GCA_000002855.2', str(tmp_path), max_attempts=0
+    )
+
+    assert result == (False, False, 'NCBI unreachable')
+    assert attempts == ['GCA_000002855.2']
+
+
+class FakeSMTP:
+    sent_messages = []
+
+    def __init__(self, server, port):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, sender, recipient, message):
+        self.sent_messages.append((recipient, message))
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def failed_download_job(tmp_path, monkeypatch):
+    monkeypatch.setenv('JOB_HISTORY_DIR', str(tmp_path / 'job_history'))
+    monkeypatch.setattr(email_service.smtplib, 'SMTP', FakeSMTP)
+    FakeSMTP.sent_messages = []
+    job_dir = str(tmp_path / 'results_GCA_000002855.2_abc123abc123')
+    os.makedirs(job_dir)
+    start_job_manifest(job_dir, {'job_id': 'abc123abc123'})
+    return job_dir
+
+
+def test_download_failure_is_emailed_and_cleaned_up(failed_download_job):
+    error = f'{genbank_service.DOWNLOAD_ERROR_PREFIX}: Assembly not found'
+
+    result = email_service.send_email_with_results.run(
+        (False, False, error),
+        {'user_email': 'user@example.com', 'job_dir': failed_download_job},
+    )
+
+    assert result == (False, error)
+    assert [recipient for recipient, _ in FakeSMTP.sent_messages] == [
+        'user@example.com'
+    ]
+    assert not os.path.exists(failed_download_job)
+
+
+def test_other_failures_keep_the_job_for_resume(failed_download_job):
+    result = email_service.send_email_with_results.run(
+        (False, False, '[DBCAN STEP] - container exited'),
+        {'user_email': 'user@example.com', 'job_dir': failed_download_job},
+    )
+
+    assert result == (False, '[DBCAN STEP] - container exited')
+    assert FakeSMTP.sent_messages == []
+    assert os.path.isdir(failed_download_job)
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, content, chunk_size):
+        self.chunks = [
+            content[start : start + chunk_size]
+            for start in range(0, len(content), chunk_size)
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+
+@pytest.mark.parametrize('chunk_size', [7, 1 << 20])
+def test_every_gzip_member_is_decompressed(tmp_path, monkeypatch, chunk_size):
+    members = [b'>XP_1.1\nMKVLA\n', b'>XP_2.1\nMKVLAMKV\n', b'>XP_3.1\nMK\n']
+    content = (
+        gzip.compress(members[0])
+        + gzip.compress(members[1])
+        + b'\x00' * 4
+        + gzip.compress(members[2])
+    )
+    monkeypatch.setattr(
+        genbank_service.requests,
+        'get',
+        lambda *args, **kwargs: FakeResponse(content, chunk_size),
+    )
+    output_path = str(tmp_path / 'proteome.faa')
+
+    genbank_service.stream_gzip_to_file(
+        'https://ftp.ncbi.nlm.nih.gov/proteome.faa.gz',
+        output_path,
+        len(content),
+    )
+
+    with open(output_path, 'rb') as output_file:
+        assert output_file.read() == b''.join(members)
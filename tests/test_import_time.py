@@ -0,0 +1,10 @@
+import pytest
+
+from benchmarks.import_time_benchmark import TARGETS, measure_import
+
+
+@pytest.mark.parametrize('target', sorted(TARGETS))
+def test_startup_does_not_import_heavy_modules(target):
+    _, slowest_imports, heavy_modules = measure_import(TARGETS[target])
+
+    assert heavy_modules == [], slowest_imports
@@ -0,0 +1,171 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from plasticome.controllers import pipeline_controller
+from plasticome.routes.app import create_app
+from plasticome.services.checkpoint_service import (
+    PIPELINE_STAGES,
+    archive_job_manifest,
+    record_stage_output,
+    record_stage_start,
+    start_job_manifest,
+    update_manifest,
+)
+from plasticome.services.genbank_service import get_job_dir
+
+JOB_ID = 'abc123abc123'
+ACCESSION = 'GCA_000002855.2'
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('JOB_HISTORY_DIR', str(tmp_path / 'job_history'))
+    monkeypatch.delenv('CELERY_RESULT_BACKEND', raising=False)
+    job_dir = get_job_dir(ACCESSION, JOB_ID)
+    os.makedirs(job_dir)
+    start_job_manifest(
+        job_dir,
+        {'job_id': JOB_ID, 'accession': ACCESSION, 'job_dir': job_dir},
+    )
+    return job_dir
+
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+
+def complete_stages(job_dir: str, stages: list):
+    for stage in stages:
+        record_stage_start(job_dir, stage)
+        record_stage_output(
+            job_dir, stage, (job_dir, False), {'kept_sequences': 10}
+        )
+
+
+def get_summary(client):
+    response = client.get(f'/jobs/{JOB_ID}')
+    assert response.status_code == 200
+    return response.json
+
+
+def test_new_job_is_queued(job_dir, client):
+    summary = get_summary(client)
+
+    assert summary['job_id'] == JOB_ID
+    assert summary['accession'] == ACCESSION
+    assert summary['status'] == 'queued'
+    assert summary['current_stage'] == 'download_genome'
+    assert summary['created_at']
+    assert summary['finished_at'] is None
+    assert [stage['name'] for stage in summary['stages']] == PIPELINE_STAGES
+    assert {stage['status'] for stage in summary['stages']} == {'pending'}
+
+
+def test_running_job_reports_its_current_stage(job_dir, client):
+    complete_stages(job_dir, PIPELINE_STAGES[:2])
+    record_stage_start(job_dir, 'dbcan_result_filter')
+
+    summary = get_summary(client)
+
+    assert summary['status'] == 'running'
+    assert summary['current_stage'] == 'dbcan_result_filter'
+    download, dbcan, dbcan_filter, *pending = summary['stages']
+    assert download['status'] == 'completed'
+    assert download['metrics'] == {'kept_sequences': 10}
+    assert download['duration_seconds'] >= 0
+    assert download['started_at'] and download['finished_at']
+    assert download['error'] is None
+    assert download['celery_state'] is None
+    assert dbcan['status'] == 'completed'
+    assert dbcan_filter['status'] == 'running'
+    assert dbcan_filter['finished_at'] is None
+    assert {stage['status'] for stage in pending} == {'pending'}
+
+
+def test_failed_job_reports_the_failed_stage(job_dir, client):
+    complete_stages(job_dir, PIPELINE_STAGES[:3])
+    record_stage_start(job_dir, 'run_ecpred_container')
+    record_stage_output(
+        job_dir,
+        'run_ecpred_container',
+        (False, '[ECPRED] container error'),
+    )
+
+    summary = get_summary(client)
+
+    assert summary['status'] == 'failed'
+    assert summary['current_stage'] == 'run_ecpred_container'
+    ecpred = summary['stages'][3]
+    assert ecpred['status'] == 'failed'
+    assert ecpred['error'] == '[ECPRED] container error'
+    assert summary['stages'][4]['status'] == 'pending'
+
+
+def test_stalled_job_can_be_resumed_from_its_summary_stage(
+    job_dir, client, monkeypatch
+):
+    complete_stages(job_dir, PIPELINE_STAGES[:4])
+    update_manifest(
+        job_dir,
+        lambda manifest: manifest.update(
+            heartbeat_at=time.time() - 24 * 60 * 60
+        ),
+    )
+    chains = []
+    monkeypatch.setattr(
+        pipeline_controller,
+        'build_analysis_chain',
+        lambda *args: lambda: chains.append(args),
+    )
+
+    summary = get_summary(client)
+    response = client.post(f'/jobs/{JOB_ID}/resume')
+
+    assert summary['status'] == 'running'
+    assert summary['current_stage'] == 'ecpred_result_filter'
+    assert response.status_code == 200
+    assert (
+        response.json['message']
+        == 'Analysis resumed from ecpred_result_filter'
+    )
+    assert chains[0][1] == PIPELINE_STAGES.index('ecpred_result_filter')
+    assert get_summary(client)['current_stage'] == 'ecpred_result_filter'
+
+
+def test_archived_job_is_read_after_its_directory_is_removed(job_dir, client):
+    complete_stages(job_dir, PIPELINE_STAGES)
+    archive_job_manifest(job_dir)
+    shutil.rmtree(job_dir)
+
+    summary = get_summary(client)
+
+    assert summary['status'] == 'completed'
+    assert summary['current_stage'] is None
+    assert summary['finished_at']
+    assert {stage['status'] for stage in summary['stages']} == {'completed'}
+
+
+def test_cached_job_has_no_stages(job_dir, client):
+    update_manifest(
+        job_dir, lambda manifest: manifest.update(cached_result=True)
+    )
+
+    summary = get_summary(client)
+
+    assert summary['status'] == 'running'
+    assert summary['current_stage'] == 'restore_pipeline_result'
+    assert summary['cached_result'] is True
+    assert summary['stages'] == []
+
+
+@pytest.mark.parametrize('job_id', ['ffffffffffff', 'not-a-job'])
+def test_unknown_job_is_not_found(job_dir, client, job_id):
+    response = client.get(f'/jobs/{job_id}')
+
+    assert response.status_code == 404
+    assert response.json == {'error': f'Job {job_id} not found'}
@@ -0,0 +1,131 @@
+import itertools
+import random
+
+import pytest
+from Bio.Align import PairwiseAligner, substitution_matrices
+
+from plasticome.services import local_alignment_service
+from plasticome.services.local_alignment_service import (
+    MAX_MATRIX_CELLS,
+    fits_local_alignment,
+    smith_waterman,
+)
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+@pytest.fixture(scope='module')
+def aligner():
+    return PairwiseAligner(
+        mode='local',
+        substitution_matrix=substitution_matrices.load('BLOSUM62'),
+        open_gap_score=-12,
+        extend_gap_score=-1,
+    )
+
+
+def random_pairs(count):
+    rng = random.Random(42)
+    for index in range(count):
+        query = ''.join(
+            rng.choice(AMINO_ACIDS) for _ in range(rng.randint(1, 80))
+        )
+        subject = ''.join(
+            rng.choice(AMINO_ACIDS) for _ in range(rng.randint(1, 80))
+        )
+        if index % 2:
+            subject = f'{subject[:10]}{query[3:]}{subject[10:]}'
+        yield query, subject
+
+
+def describe(alignment):
+    counts = alignment.counts()
+    return {
+        'length': alignment.shape[1],
+        'identities': counts.identities,
+        'mismatches': counts.mismatches,
+        'query_start': int(alignment.coordinates[0][0]) + 1,
+        'query_end': int(alignment.coordinates[0][-1]),
+        'subject_start': int(alignment.coordinates[1][0]) + 1,
+        'subject_end': int(alignment.coordinates[1][-1]),
+    }
+
+
+@pytest.mark.parametrize('query, subject', list(random_pairs(60)))
+def test_matches_the_biopython_local_alignment(aligner, query, subject):
+    alignment = smith_waterman(query, subject)
+    expected_score = aligner.score(query, subject)
+
+    if not expected_score:
+        assert alignment is None
+        return
+    assert alignment['score'] == expected_score
+    optimal_alignments = [
+        describe(optimal)
+        for optimal in itertools.islice(aligner.align(query, subject), 1000)
+    ]
+    assert {
+        key: value
+        for key, value in alignment.items()
+        if key not in ('score', 'gap_opens')
+    } in optimal_alignments
+
+
+@pytest.mark.parametrize(
+    'query, subject', [('', 'MKVLA'), ('MKVLA', ''), ('', '')]
+)
+def test_empty_sequence_has_no_alignment(query, subject):
+    assert smith_waterman(query, subject) is None
+
+
+def test_all_mismatches_have_no_alignment(aligner):
+    assert aligner.score('WWWW', 'GGGG') == 0
+    assert smith_waterman('WWWW', 'GGGG') is None
+
+
+def test_gaps_are_counted_once_per_opening(aligner):
+    query = 'MKVLAWHERTYCCCCPQRSTNDE'
+    subject = 'MKVLAWHERTYPQRSTNDE'
+
+    alignment = smith_waterman(query, subject)
+
+    assert alignment['score'] == aligner.score(query, subject)
+    assert alignment['gap_opens'] == 1
+    assert alignment['length'] == len(query)
+
+
+def test_matrix_cells_limit_is_inclusive():
+    query = [('query', 'M' * 1000)]
+
+    assert fits_local_alignment(
+        query, [('reference', 'M' * (MAX_MATRIX_CELLS // 1000))]
+    )
+    assert not fits_local_alignment(
+        query, [('reference', 'M' * (MAX_MATRIX_CELLS // 1000 + 1))]
+    )
+
+
+def test_matrices_at_the_limit_stay_within_the_memory_budget():
+    (
+        h_matrix,
+        e_matrix,
+        f_matrix,
+        profile,
+    ) = local_alignment_service.fill_score_matrices('M' * 20, 'M' * 20)
+    bytes_per_cell = sum(
+        matrix.itemsize for matrix in (h_matrix, e_matrix, f_matrix, profile)
+    )
+
+    assert bytes_per_cell * MAX_MATRIX_CELLS <= 64 * 1024 * 1024
+
+
+def test_parallel_alignments_are_bounded(monkeypatch):
+    local_alignment_service.get_alignment_slots.cache_clear()
+    monkeypatch.setenv('LOCAL_ALIGNMENT_MAX_PARALLEL', '0')
+    try:
+        slots = local_alignment_service.get_alignment_slots()
+        assert slots.acquire(blocking=False)
+        assert not slots.acquire(blocking=False)
+        slots.release()
+    finally:
+        local_alignment_service.get_alignment_slots.cache_clear()
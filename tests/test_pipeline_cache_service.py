@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from plasticome.services import pipeline_cache_service
+from plasticome.services.checkpoint_service import (
+    REFERENCE_DATA_STAGES,
+    record_reference_fingerprint,
+    start_job_manifest,
+)
+
+ACCESSION = 'GCA_000002855.2'
+CACHE_KEY = f'{ACCESSION}_abcdef0123456789'
+NEGATIVE_RESULT = (False, 'no enzyme found', False)
+
+
+@pytest.fixture
+def finished_job(tmp_path, monkeypatch):
+    monkeypatch.setenv('PIPELINE_CACHE_DIR', str(tmp_path / 'pipeline_cache'))
+    job_dir = str(tmp_path / f'results_{ACCESSION}_abc123abc123')
+    os.makedirs(job_dir)
+    start_job_manifest(job_dir, {'job_id': 'abc123abc123'})
+    return job_dir
+
+
+def store(job_dir):
+    pipeline_cache_service.store_pipeline_result.run(
+        NEGATIVE_RESULT, CACHE_KEY, job_dir, 'Aspergillus niger'
+    )
+    return pipeline_cache_service.lookup_pipeline_result(CACHE_KEY)
+
+
+def test_result_read_from_the_key_snapshot_is_stored(finished_job):
+    for stage in REFERENCE_DATA_STAGES:
+        record_reference_fingerprint(finished_job, stage, 'abcdef0123456789')
+
+    assert store(finished_job)
+
+
+def test_result_without_every_reference_lookup_is_not_stored(finished_job):
+    record_reference_fingerprint(
+        finished_job, 'dbcan_result_filter', 'abcdef0123456789'
+    )
+    record_reference_fingerprint(
+        finished_job, 'ecpred_result_filter', 'abcdef0123456789'
+    )
+
+    assert store(finished_job) is None
+
+
+def test_result_read_from_another_snapshot_is_not_stored(finished_job):
+    for stage in REFERENCE_DATA_STAGES:
+        record_reference_fingerprint(finished_job, stage, 'abcdef0123456789')
+    record_reference_fingerprint(finished_job, 'create_result', 'ffffffffffff')
+
+    assert store(finished_job) is None
@@ -0,0 +1,108 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from plasticome.controllers import pipeline_controller
+from plasticome.services import dbcan_result_filter_service
+from plasticome.services.checkpoint_service import (
+    read_manifest,
+    start_job_manifest,
+    update_manifest,
+)
+from plasticome.services.proteome_store_service import (
+    create_proteome_store,
+    get_kept_protein_ids,
+)
+
+JOB_ID = 'abc123abc123'
+
+
+@pytest.fixture
+def resumable_job(tmp_path, monkeypatch):
+    job_dir = str(tmp_path / f'results_GCA_1_{JOB_ID}')
+    os.makedirs(job_dir)
+    start_job_manifest(
+        job_dir, {'job_id': JOB_ID, 'accession': 'GCA_1', 'job_dir': job_dir}
+    )
+    chains = []
+    monkeypatch.setattr(
+        pipeline_controller, 'find_job_dir', lambda job_id: job_dir
+    )
+    monkeypatch.setattr(
+        pipeline_controller,
+        'build_analysis_chain',
+        lambda *args: lambda: chains.append(args),
+    )
+    return job_dir, chains
+
+
+def set_heartbeat(job_dir: str, heartbeat_at: float):
+    update_manifest(
+        job_dir, lambda manifest: manifest.update(heartbeat_at=heartbeat_at)
+    )
+
+
+def test_resume_is_refused_while_the_job_is_running(resumable_job):
+    job_dir, chains = resumable_job
+    set_heartbeat(job_dir, time.time())
+
+    _, status = pipeline_controller.resume_pipeline(JOB_ID)
+
+    assert status == 409
+    assert chains == []
+
+
+def test_resume_restarts_a_stalled_job_once(resumable_job):
+    job_dir, chains = resumable_job
+    set_heartbeat(job_dir, time.time() - 24 * 60 * 60)
+
+    _, first_status = pipeline_controller.resume_pipeline(JOB_ID)
+    _, second_status = pipeline_controller.resume_pipeline(JOB_ID)
+
+    assert (first_status, second_status) == (200, 409)
+    assert len(chains) == 1
+    assert read_manifest(job_dir)['resumed_at']
+
+
+class ReferenceData:
+    cazy_families = {'GH5', 'AA9'}
+    ec_numbers = {'3.2.1.4'}
+
+    def get_fingerprint(self):
+        return 'fingerprint'
+
+
+def test_dbcan_filter_can_run_again_after_an_interruption(
+    tmp_path, monkeypatch
+):
+    protein_file_path = str(tmp_path / 'proteome.faa')
+    with open(protein_file_path, 'w') as protein_file:
+        protein_file.write('>P1\nMKV\n>P2\nMAA\n>P3\nMCC\n')
+    create_proteome_store(protein_file_path)
+    pd.DataFrame(
+        {
+            'Gene ID': ['P1', 'P2', 'P3'],
+            'EC#': ['3.2.1.4', '-', '1.1.1.1'],
+            'HMMER': ['GH5(1-90)', '-', 'GT2(3-40)'],
+            'eCAMI': ['-', 'AA9', '-'],
+            'DIAMOND': ['-', '-', '-'],
+            '#ofTools': [1, 1, 1],
+        }
+    ).to_csv(tmp_path / 'overview.txt', sep='\t', index=False)
+    monkeypatch.setattr(
+        dbcan_result_filter_service,
+        'get_reference_data',
+        lambda: (ReferenceData(), False),
+    )
+    run_filter = dbcan_result_filter_service.dbcan_result_filter.run
+    run_filter = run_filter.__wrapped__
+
+    first_output = run_filter((str(tmp_path), False))
+    second_output = run_filter((str(tmp_path), False))
+
+    assert first_output == second_output == (protein_file_path, False)
+    assert get_kept_protein_ids(protein_file_path) == ['P1', 'P2']
+    filtered = pd.read_csv(tmp_path / 'overview_filtered.txt', sep='\t')
+    assert list(filtered['plasticome_cazyme']) == ['GH5', 'AA9', 'False']
@@ -0,0 +1,67 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from plasticome.services.plasticome_metadata_service import (
+    PlasticomeMetadataClient,
+)
+
+
+class ProxyErrorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.dumps({'access_token': 'token'}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        body = b'<html><body>502 Bad Gateway</body></html>'
+        self.send_response(502)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def proxy_error_url():
+    server = HTTPServer(('127.0.0.1', 0), ProxyErrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dead_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+def test_get_returns_error_when_api_is_unreachable(dead_url):
+    client = PlasticomeMetadataClient(dead_url, 'user', 'secret', 0)
+
+    data, error = client.get_all_enzymes()
+
+    assert data is False
+    assert error
+
+
+def test_get_returns_error_on_a_response_without_json(proxy_error_url):
+    client = PlasticomeMetadataClient(proxy_error_url, 'user', 'secret', 0)
+
+    data, error = client.get_all_enzymes()
+
+    assert data is False
+    assert '502' in error
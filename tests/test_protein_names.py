@@ -0,0 +1,110 @@
+import csv
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from plasticome.services import (
+    analysis_result_service,
+    protein_name_cache_service,
+)
+from plasticome.services.genbank_service import (
+    fetch_protein_names,
+    get_protein_names,
+)
+
+
+class FakeEntrez:
+    def __init__(self, titles):
+        self.titles = titles
+        self.requested_batches = []
+
+    def esummary(self, db, id):
+        batch = id.split(',')
+        self.requested_batches.append(batch)
+        return SimpleNamespace(batch=batch, close=lambda: None)
+
+    def read(self, handle):
+        return [
+            {
+                'Caption': genbank_id.split('.')[0],
+                'Title': self.titles[genbank_id],
+            }
+            for genbank_id in handle.batch
+            if genbank_id in self.titles
+        ]
+
+
+@pytest.fixture
+def entrez():
+    return FakeEntrez(
+        {f'XP_{number}.1': f'protein {number}' for number in range(5)}
+    )
+
+
+def test_fetch_protein_names_batches_requests(entrez):
+    genbank_ids = [f'XP_{number}.1' for number in range(5)] + ['XP_9.1']
+
+    protein_names = fetch_protein_names(genbank_ids, entrez, batch_size=2)
+
+    assert entrez.requested_batches == [
+        ['XP_0.1', 'XP_1.1'],
+        ['XP_2.1', 'XP_3.1'],
+        ['XP_4.1', 'XP_9.1'],
+    ]
+    assert protein_names == {
+        f'XP_{number}.1': f'protein {number}' for number in range(5)
+    }
+
+
+def test_get_protein_names_reuses_the_cache(entrez, tmp_path):
+    cache_path = str(tmp_path / 'protein_names.sqlite3')
+
+    first = get_protein_names(
+        ['XP_0.1', 'XP_1.1', 'XP_0.1'], entrez, cache_path
+    )
+    second = get_protein_names(
+        ['XP_0.1', 'XP_1.1', 'XP_2.1'], entrez, cache_path
+    )
+
+    assert first == {'XP_0.1': 'protein 0', 'XP_1.1': 'protein 1'}
+    assert second['XP_2.1'] == 'protein 2'
+    assert entrez.requested_batches == [['XP_0.1', 'XP_1.1'], ['XP_2.1']]
+
+
+def test_get_protein_names_refetches_expired_names(
+    entrez, tmp_path, monkeypatch
+):
+    cache_path = str(tmp_path / 'protein_names.sqlite3')
+    monkeypatch.setenv('PROTEIN_NAME_CACHE_TTL_DAYS', '1')
+    get_protein_names(['XP_0.1'], entrez, cache_path)
+
+    two_days_later = time.time() + 2 * 24 * 60 * 60
+    monkeypatch.setattr(
+        protein_name_cache_service,
+        'time',
+        SimpleNamespace(time=lambda: two_days_later),
+    )
+    get_protein_names(['XP_0.1'], entrez, cache_path)
+
+    assert entrez.requested_batches == [['XP_0.1'], ['XP_0.1']]
+
+
+def test_similarity_results_without_name_have_no_trailing_space(
+    tmp_path, monkeypatch
+):
+    blast_output = tmp_path / 'blast.csv'
+    blast_output.write_text('QUERY ID,REF ID,IDENTITY\nXP_0.1,REF_1,87.5\n')
+    monkeypatch.setattr(
+        analysis_result_service,
+        'get_protein_names',
+        lambda genbank_ids: {'XP_0.1': 'protein 0'},
+    )
+
+    output_path = analysis_result_service.write_similarity_results(
+        str(blast_output), str(tmp_path)
+    )
+
+    with open(output_path, newline='') as output_file:
+        rows = list(csv.reader(output_file))
+    assert rows[1] == ['XP_0.1 protein 0', 'REF_1', '87.5']
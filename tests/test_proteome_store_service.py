@@ -0,0 +1,210 @@
+import pytest
+from Bio import SeqIO
+
+from plasticome.services.proteome_store_service import (
+    create_proteome_store,
+    get_kept_protein_ids,
+    get_store_paths,
+    iter_proteome_records,
+    load_proteome_index,
+    materialize_proteome,
+    merge_shard_tables,
+    narrow_proteome,
+    read_raw_records,
+    write_proteome_shards,
+)
+
+PROTEOME = (
+    '>XP_1.1 cutinase [Aspergillus niger]\nMKVLAWHERT\nYPQRST\n'
+    '>XP_2.1 hypothetical protein\nMAAAAAAAAAAAAAAAAAAA\n'
+    '>XP_3.1\nMCC\n'
+    '>XP_4.1 lipase\nMKKKKKKKK\nLLLLLLLLL\nPP'
+)
+
+
+@pytest.fixture
+def protein_file_path(tmp_path):
+    protein_file_path = tmp_path / 'GCA_000002855.2.faa'
+    protein_file_path.write_text(PROTEOME)
+    original_path = tmp_path / 'original.faa'
+    original_path.write_text(PROTEOME)
+    create_proteome_store(str(protein_file_path))
+    return str(protein_file_path)
+
+
+def parse(fasta_path):
+    return [
+        (record.id, record.description, str(record.seq))
+        for record in SeqIO.parse(fasta_path, 'fasta')
+    ]
+
+
+def test_index_points_at_every_record(protein_file_path, tmp_path):
+    expected_records = parse(tmp_path / 'original.faa')
+
+    assert list(load_proteome_index(protein_file_path)) == [
+        protein_id for protein_id, _, _ in expected_records
+    ]
+    assert [
+        (record.id, record.description, str(record.seq))
+        for record in iter_proteome_records(protein_file_path)
+    ] == expected_records
+
+
+def test_store_keeps_the_original_bytes(protein_file_path):
+    store_path, _, _ = get_store_paths(protein_file_path)
+
+    with open(store_path) as store:
+        assert store.read() == PROTEOME
+    assert (
+        b''.join(
+            raw_record for _, raw_record in read_raw_records(protein_file_path)
+        )
+        == PROTEOME.encode()
+    )
+
+
+def test_narrow_and_materialize_round_trip(protein_file_path, tmp_path):
+    expected_records = {
+        protein_id: record
+        for protein_id, *record in parse(tmp_path / 'original.faa')
+    }
+
+    assert narrow_proteome(
+        protein_file_path, ['XP_4.1', 'XP_1.1', 'XP_3.1', 'XP_9.9']
+    ) == ['XP_1.1', 'XP_3.1', 'XP_4.1']
+    materialize_proteome(protein_file_path)
+
+    assert parse(protein_file_path) == [
+        (protein_id, *expected_records[protein_id])
+        for protein_id in ['XP_1.1', 'XP_3.1', 'XP_4.1']
+    ]
+    store_path, _, _ = get_store_paths(protein_file_path)
+    with open(store_path) as store:
+        assert store.read() == PROTEOME
+
+
+def test_narrowing_never_brings_proteins_back(protein_file_path):
+    narrow_proteome(protein_file_path, ['XP_1.1', 'XP_2.1'])
+
+    assert narrow_proteome(protein_file_path, ['XP_2.1', 'XP_3.1']) == [
+        'XP_2.1'
+    ]
+    assert get_kept_protein_ids(protein_file_path) == ['XP_2.1']
+    assert [
+        record.id for record in iter_proteome_records(protein_file_path)
+    ] == ['XP_2.1']
+
+
+def test_materialize_to_another_path(protein_file_path, tmp_path):
+    narrow_proteome(protein_file_path, ['XP_2.1'])
+    output_path = str(tmp_path / 'kept.faa')
+
+    materialize_proteome(protein_file_path, output_path)
+
+    assert parse(output_path) == [
+        ('XP_2.1', 'XP_2.1 hypothetical protein', 'M' + 'A' * 19)
+    ]
+    assert [record[0] for record in parse(protein_file_path)] == [
+        'XP_1.1',
+        'XP_2.1',
+        'XP_3.1',
+        'XP_4.1',
+    ]
+
+
+def test_store_is_reused_when_created_again(protein_file_path):
+    narrow_proteome(protein_file_path, ['XP_3.1'])
+
+    create_proteome_store(protein_file_path)
+
+    assert get_kept_protein_ids(protein_file_path) == [
+        'XP_1.1',
+        'XP_2.1',
+        'XP_3.1',
+        'XP_4.1',
+    ]
+
+
+def test_shards_balance_residues_and_keep_proteome_order(
+    protein_file_path, tmp_path
+):
+    shards_dir = str(tmp_path / 'shards')
+
+    shard_paths = write_proteome_shards(protein_file_path, 2, shards_dir)
+
+    shards = [parse(shard_path) for shard_path in shard_paths]
+    assert [[record[0] for record in shard] for shard in shards] == [
+        ['XP_1.1', 'XP_2.1'],
+        ['XP_3.1', 'XP_4.1'],
+    ]
+    assert sorted(record for shard in shards for record in shard) == sorted(
+        parse(tmp_path / 'original.faa')
+    )
+
+
+def test_shards_only_hold_kept_proteins(protein_file_path, tmp_path):
+    narrow_proteome(protein_file_path, ['XP_2.1', 'XP_3.1'])
+
+    shard_paths = write_proteome_shards(
+        protein_file_path, 8, str(tmp_path / 'shards')
+    )
+
+    assert [
+        [record[0] for record in parse(shard_path)]
+        for shard_path in shard_paths
+    ] == [['XP_2.1'], ['XP_3.1']]
+
+
+@pytest.fixture
+def shard_tables(tmp_path):
+    tables = {
+        'shard_0.tsv': 'Protein ID\tEC Number\nXP_4.1\t3.1.1.3\nXP_1.1\t3.1.1.74\n',
+        'shard_1.tsv': 'Protein ID\tEC Number\nXP_3.1\t1.1.1.1\n',
+        'shard_2.tsv': '',
+    }
+    for name, content in tables.items():
+        (tmp_path / name).write_text(content)
+    return [str(tmp_path / name) for name in [*tables, 'shard_3.tsv']]
+
+
+def test_merge_restores_proteome_order_and_skips_empty_shards(
+    shard_tables, tmp_path
+):
+    output_path = str(tmp_path / 'merged.tsv')
+
+    merge_shard_tables(
+        shard_tables, output_path, ['XP_1.1', 'XP_2.1', 'XP_3.1', 'XP_4.1']
+    )
+
+    with open(output_path) as merged:
+        assert merged.read().splitlines() == [
+            'Protein ID\tEC Number',
+            'XP_1.1\t3.1.1.74',
+            'XP_3.1\t1.1.1.1',
+            'XP_4.1\t3.1.1.3',
+        ]
+
+
+def test_merge_without_any_shard_output_writes_the_header(tmp_path):
+    output_path = str(tmp_path / 'merged.tsv')
+
+    merge_shard_tables(
+        [str(tmp_path / 'shard_0.tsv')],
+        output_path,
+        ['XP_1.1'],
+        ['Protein ID', 'EC Number'],
+    )
+
+    with open(output_path) as merged:
+        assert merged.read() == 'Protein ID\tEC Number\n'
+
+
+def test_merge_rejects_different_headers(shard_tables, tmp_path):
+    with open(shard_tables[1], 'w') as shard_table:
+        shard_table.write('Gene ID\tEC#\nXP_3.1\t-\n')
+
+    with pytest.raises(ValueError):
+        merge_shard_tables(
+            shard_tables, str(tmp_path / 'merged.tsv'), ['XP_1.1']
+        )
@@ -0,0 +1,137 @@
+import socket
+
+import pytest
+
+from plasticome.services import (
+    plasticome_metadata_service,
+    reference_data_service,
+)
+from plasticome.services.analysis_result_service import create_result
+from plasticome.services.dbcan_result_filter_service import dbcan_result_filter
+from plasticome.services.ecpred_result_filter_service import (
+    ecpred_result_filter,
+)
+from plasticome.services.pipeline_cache_service import get_metadata_fingerprint
+
+
+@pytest.fixture
+def metadata_api_down(monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    client = plasticome_metadata_service.PlasticomeMetadataClient(
+        f'http://127.0.0.1:{port}', 'user', 'secret', 0
+    )
+    monkeypatch.setattr(plasticome_metadata_service, 'metadata_client', client)
+    monkeypatch.setattr(reference_data_service, 'reference_data', None)
+    monkeypatch.setattr(reference_data_service, 'refresh_failed_at', 0)
+
+
+def test_reference_data_returns_error_when_api_is_down(metadata_api_down):
+    reference_data, error = reference_data_service.get_reference_data()
+
+    assert reference_data is False
+    assert error
+
+
+def test_result_cache_is_skipped_when_api_is_down(metadata_api_down):
+    assert get_metadata_fingerprint() is None
+
+
+def test_filters_fail_closed_when_api_is_down(metadata_api_down, tmp_path):
+    result_dir = str(tmp_path)
+
+    dbcan_output, dbcan_error = dbcan_result_filter((result_dir, False))
+    ecpred_output = ecpred_result_filter((result_dir, False))
+
+    assert dbcan_output is False
+    assert 'metadata error' in dbcan_error
+    assert ecpred_output[:2] == (False, False)
+    assert 'metadata error' in ecpred_output[2]
+
+
+def test_failed_plastic_lookup_fails_the_result(metadata_api_down, tmp_path):
+    snapshot = reference_data_service.ReferenceDataSnapshot(
+        [{'id': 7, 'cazy_family': 'AA9', 'ec_number': '3.1.1.74'}],
+        [{'plastic_name': 'PET'}],
+    )
+    reference_data_service.reference_data = snapshot
+    ec_pred_file = tmp_path / 'ec_pred_results.tsv'
+    ec_pred_file.write_text('Protein ID\tEC Number\nXP_1.1\t3.1.1.74\n')
+
+    final_result_dir, negative_result, error = create_result.run.__wrapped__(
+        (str(tmp_path), str(ec_pred_file), False)
+    )
+
+    assert snapshot.get_plastic_types_by_ec_number('3.1.1.74')[0] is False
+    assert (final_result_dir, negative_result) == (False, False)
+    assert 'metadata error' in error
+
+
+@pytest.fixture
+def stale_snapshot(monkeypatch):
+    snapshot = reference_data_service.ReferenceDataSnapshot(
+        [{'id': 7, 'cazy_family': 'AA9', 'ec_number': '3.1.1.74'}],
+        [{'plastic_name': 'PET'}],
+    )
+    snapshot.loaded_at = 0
+    monkeypatch.setattr(reference_data_service, 'reference_data', snapshot)
+    monkeypatch.setattr(reference_data_service, 'refresh_failed_at', 0)
+    return snapshot
+
+
+def test_failed_refresh_is_not_retried_before_the_delay(
+    stale_snapshot, monkeypatch
+):
+    loads = []
+
+    def failing_load():
+        loads.append(True)
+        return False, 'metadata API unreachable'
+
+    monkeypatch.setattr(
+        reference_data_service, 'load_reference_data', failing_load
+    )
+
+    for _ in range(3):
+        assert reference_data_service.get_reference_data() == (
+            stale_snapshot,
+            False,
+        )
+    assert len(loads) == 1
+
+
+def test_stale_snapshot_is_served_while_refreshing(
+    stale_snapshot, monkeypatch
+):
+    monkeypatch.setattr(
+        reference_data_service,
+        'load_reference_data',
+        lambda: pytest.fail('a second refresh was started'),
+    )
+
+    with reference_data_service.reference_data_lock:
+        assert reference_data_service.get_reference_data() == (
+            stale_snapshot,
+            False,
+        )
+
+
+def test_failed_enzyme_lookup_backs_off(stale_snapshot, monkeypatch):
+    requests_sent = []
+
+    class FailingClient:
+        def get_all_plastic_types_by_enzyme(self, enzyme_id):
+            requests_sent.append(enzyme_id)
+            return False, 'metadata API unreachable'
+
+    monkeypatch.setattr(
+        reference_data_service, 'get_metadata_client', FailingClient
+    )
+
+    for _ in range(3):
+        assert stale_snapshot.get_plastic_types_by_enzyme(7) == (
+            False,
+            'metadata API unreachable',
+        )
+    assert requests_sent == [7]